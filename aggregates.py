@@ -0,0 +1,132 @@
+import threading
+from collections import Counter
+from datetime import datetime
+
+import pandas as pd
+
+from config import LOW_STOCK_THRESHOLD, OVERDUE_DAYS
+from ledger import ASSIGNED
+from schema import DATE_FORMAT
+
+
+def _empty_group():
+    return {"products": 0, "units": 0, "value": 0.0}
+
+
+# ---------- DASHBOARD AGGREGATES ----------
+# Counts and totals the dashboard shows, kept up to date by applying each row change
+# (storage.insert_stock / update_stock / delete_stock / apply_changes)
+# instead of regrouping the whole tables on every visit.
+class InventoryAggregates:
+    def __init__(self, threshold=LOW_STOCK_THRESHOLD):
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self.totals = _empty_group()
+        self.by_category = {}
+        self.by_company = {}
+        self.low_stock = {}
+        self.assigned_by_department = Counter()
+        self.assigned_by_role = Counter()
+        self.open_assignments = {}
+
+    @classmethod
+    def from_frames(cls, stock_df, assign_df, threshold=LOW_STOCK_THRESHOLD):
+        agg = cls(threshold)
+        value = stock_df['quantity'] * stock_df['price']
+        agg.totals = {"products": len(stock_df), "units": int(stock_df['quantity'].sum()), "value": float(value.sum())}
+        for column, target in (("category", agg.by_category), ("company", agg.by_company)):
+            grouped = stock_df.assign(value=value).groupby(column, observed=True).agg(
+                products=("id", "size"), units=("quantity", "sum"), value=("value", "sum"))
+            for name, row in grouped.iterrows():
+                target[name] = {"products": int(row['products']), "units": int(row['units']), "value": float(row['value'])}
+        low = stock_df[stock_df['quantity'] < threshold]
+        for row in low[["id", "name", "company", "category", "quantity"]].itertuples(index=False):
+            agg.low_stock[(row.id, row.name, row.company, row.category)] = int(row.quantity)
+        open_df = assign_df[assign_df['status'] == ASSIGNED]
+        agg.assigned_by_department.update(open_df['department'].tolist())
+        agg.assigned_by_role.update(open_df['role'].tolist())
+        agg.open_assignments = dict(zip(open_df.index, open_df['date']))
+        return agg
+
+    # ----- incremental updates -----
+    def _stock_row(self, row, sign):
+        quantity = int(row['quantity'])
+        value = quantity * float(row['price'])
+        for group in (self.totals,
+                      self.by_category.setdefault(row['category'], _empty_group()),
+                      self.by_company.setdefault(row['company'], _empty_group())):
+            group["products"] += sign
+            group["units"] += sign * quantity
+            group["value"] += sign * value
+        for groups, name in ((self.by_category, row['category']), (self.by_company, row['company'])):
+            if groups[name]["products"] <= 0:
+                del groups[name]
+        key = (row['id'], row['name'], row['company'], row['category'])
+        if sign < 0:
+            self.low_stock.pop(key, None)
+        elif quantity < self.threshold:
+            self.low_stock[key] = quantity
+
+    def stock_changed(self, before_rows, after_rows):
+        with self._lock:
+            for row in before_rows:
+                self._stock_row(row, -1)
+            for row in after_rows:
+                self._stock_row(row, +1)
+
+    def _assignment_row(self, key, row, sign):
+        if row is None or row.get('status') != ASSIGNED:
+            return
+        self.assigned_by_department[row.get('department', '')] += sign
+        self.assigned_by_role[row.get('role', '')] += sign
+        for counter in (self.assigned_by_department, self.assigned_by_role):
+            for name in [name for name, count in counter.items() if count <= 0]:
+                del counter[name]
+        if sign > 0:
+            # Rows from writes carry the stored text; frames (schema.py) hold parsed datetimes.
+            self.open_assignments[key] = pd.to_datetime(row.get('date', ''), format=DATE_FORMAT, errors="coerce")
+        else:
+            self.open_assignments.pop(key, None)
+
+    def assignment_changed(self, key, before, after):
+        with self._lock:
+            self._assignment_row(key, before, -1)
+            self._assignment_row(key, after, +1)
+
+    # ----- reads -----
+    def summary(self):
+        with self._lock:
+            return {
+                **self.totals,
+                "low_stock": len(self.low_stock),
+                "assigned": len(self.open_assignments),
+                "threshold": self.threshold,
+            }
+
+    def group_table(self, column):
+        groups = self.by_category if column == "category" else self.by_company
+        with self._lock:
+            return pd.DataFrame.from_dict(groups, orient="index", columns=["products", "units", "value"]).sort_index()
+
+    def assigned_table(self, column):
+        counter = self.assigned_by_department if column == "department" else self.assigned_by_role
+        with self._lock:
+            return pd.Series(dict(counter), name="assigned", dtype=int).sort_index()
+
+    def low_stock_table(self):
+        with self._lock:
+            rows = [(*key, quantity) for key, quantity in self.low_stock.items()]
+        return pd.DataFrame(rows, columns=["id", "name", "company", "category", "quantity"]).sort_values("quantity", kind="stable")
+
+    def open_ages(self, now=None, overdue_days=OVERDUE_DAYS):
+        # Days each open assignment has been out; work is proportional to open items, not history.
+        with self._lock:
+            dates = pd.Series(self.open_assignments, dtype="datetime64[us]")
+        ages = ((now or datetime.now()) - dates).dt.days
+        return {
+            "open": len(ages),
+            "overdue": int((ages > overdue_days).sum()),
+            "median_days": float(ages.median()) if ages.notna().any() else 0.0,
+            "max_days": int(ages.max()) if ages.notna().any() else 0,
+            "ages": ages,
+        }
@@ -0,0 +1,198 @@
+import argparse
+import hmac
+import time
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Route
+
+import metrics
+import services
+from config import API_HOST, API_PORT, API_TOKEN
+from storage import ConflictError, OutOfStockError
+
+# ---------- ERRORS ----------
+# Service exceptions and the status codes clients see.
+ERROR_STATUS = [
+    (services.NotFoundError, 404),
+    (OutOfStockError, 409),
+    (ConflictError, 409),
+    (ValueError, 400),
+]
+
+
+def _error(exc):
+    for exc_type, status in ERROR_STATUS:
+        if isinstance(exc, exc_type):
+            return JSONResponse({"error": str(exc), "type": type(exc).__name__}, status_code=status)
+    raise exc
+
+
+async def _body(request, fields):
+    try:
+        body = await request.json()
+    except ValueError:
+        raise services.ValidationError("Request body must be JSON.") from None
+    if not isinstance(body, dict):
+        raise services.ValidationError("Request body must be a JSON object.")
+    unknown = set(body) - set(fields)
+    if unknown:
+        raise services.ValidationError(f"Unknown field(s): {', '.join(sorted(unknown))}")
+    return body
+
+
+def _authorized(request):
+    if not API_TOKEN:
+        return True
+    header = request.headers.get("authorization", "")
+    return hmac.compare_digest(header, f"Bearer {API_TOKEN}")
+
+
+def endpoint(fields=None):
+    # Wraps a handler with auth, JSON body parsing (fields = accepted keys), error mapping and timing.
+    def wrap(handler):
+        async def route(request):
+            if not _authorized(request):
+                return JSONResponse({"error": "Unauthorized"}, status_code=401)
+            started = time.perf_counter()
+            failed = True
+            try:
+                body = await _body(request, fields) if fields is not None else None
+                response = JSONResponse(await handler(request, body))
+                failed = False
+                return response
+            except (LookupError, ValueError, ConflictError) as e:
+                return _error(e)
+            finally:
+                # Requests interleave on the event loop thread, so they are observed rather than nested timers.
+                metrics.observe(f"api.{handler.__name__}", time.perf_counter() - started, failed)
+        return route
+    return wrap
+
+
+def _run(func, *args, **kwargs):
+    # Service calls block on file/SQLite I/O, so they run in the thread pool; the shared index
+    # and frame cache live in this process and are reused by every request.
+    return run_in_threadpool(func, *args, **kwargs)
+
+
+# ---------- ROUTES ----------
+async def health(request):
+    return JSONResponse({"status": "ok"})
+
+
+async def prometheus(request):
+    # Timings of this API process, in Prometheus text format.
+    if not _authorized(request):
+        return JSONResponse({"error": "Unauthorized"}, status_code=401)
+    return PlainTextResponse(metrics.prometheus_text(), media_type="text/plain; version=0.0.4")
+
+
+@endpoint()
+async def lookup(request, body):
+    return await _run(services.lookup, request.path_params["code"])
+
+
+@endpoint()
+async def stock_levels(request, body):
+    # GET /levels?category=&start=&end=&freq=  (per category) or /stock/{code}/levels?start=&end=&freq=
+    params = request.query_params
+    return await _run(services.stock_history, request.path_params.get("code", ""), params.get("category", ""),
+                      params.get("start", ""), params.get("end", ""), params.get("freq", "D"))
+
+
+@endpoint()
+async def stock_on(request, body):
+    # GET /as-of?date=YYYY-MM-DD
+    return await _run(services.stock_on, request.query_params.get("date", ""))
+
+
+@endpoint()
+async def forecast(request, body):
+    # GET /forecast?category=&due=1
+    params = request.query_params
+    return await _run(services.reorder_forecast, params.get("category", ""), params.get("due", "") in ("1", "true"))
+
+
+@endpoint({"stock_id", "user", "role", "teacher_id", "department", "remarks", "expected_version"})
+async def assign(request, body):
+    stock_id = body.pop("stock_id", "")
+    return {"key": await _run(services.assign, stock_id, **{"user": "", **body})}
+
+
+@endpoint({"stock_id", "expected_version"})
+async def return_item(request, body):
+    stock_id = body.pop("stock_id", "")
+    return {"key": await _run(services.return_, stock_id, **body)}
+
+
+@endpoint({"stock_id", "quantity", "delta", "price", "expected_version"})
+async def adjust(request, body):
+    stock_id = body.pop("stock_id", "")
+    await _run(services.adjust_stock, stock_id, **body)
+    return await _run(services.lookup, stock_id)
+
+
+@endpoint({"scans"})
+async def batch_scan(request, body):
+    scans = body.get("scans")
+    if not isinstance(scans, list) or not all(isinstance(item, dict) for item in scans):
+        raise services.ValidationError('"scans" must be a list of objects.')
+    return {"results": await _run(services.batch_scan, scans)}
+
+
+@endpoint({"action", "scans", "commit", "user", "role", "teacher_id", "department", "remarks"})
+async def batch(request, body):
+    # Preview a batch of {"code", "quantity"} scans, and with "commit": true apply it as one write.
+    scans = body.pop("scans", None)
+    if not isinstance(scans, list) or not all(isinstance(item, dict) for item in scans):
+        raise services.ValidationError('"scans" must be a list of objects.')
+    action = body.pop("action", "")
+    commit = bool(body.pop("commit", False))
+    lines = await _run(services.preview_batch, action, [(item.get("code", ""), item.get("quantity", 1)) for item in scans])
+    keys = await _run(services.commit_batch, action, lines, **body) if commit else []
+    return {"lines": lines, "committed": commit, "keys": keys}
+
+
+@endpoint({"format"})
+async def export(request, body):
+    # Queues an export; GET /jobs/{id} reports it, with the file path once it is written.
+    return {"job": await _run(services.queue_export, body.get("format", "csv"))}
+
+
+@endpoint()
+async def job(request, body):
+    return await _run(services.job_status, request.path_params["job_id"])
+
+
+def make_app():
+    return Starlette(routes=[
+        Route("/health", health),
+        Route("/metrics", prometheus),
+        Route("/stock/{code}", lookup),
+        Route("/stock/{code}/levels", stock_levels),
+        Route("/levels", stock_levels),
+        Route("/as-of", stock_on),
+        Route("/forecast", forecast),
+        Route("/assign", assign, methods=["POST"]),
+        Route("/return", return_item, methods=["POST"]),
+        Route("/adjust", adjust, methods=["POST"]),
+        Route("/scan", batch_scan, methods=["POST"]),
+        Route("/batch", batch, methods=["POST"]),
+        Route("/export", export, methods=["POST"]),
+        Route("/jobs/{job_id:int}", job),
+    ])
+
+
+app = make_app()
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Inventory HTTP API for barcode scanners and integrations")
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    args = parser.parse_args()
+    uvicorn.run(app, host=args.host, port=args.port)
@@ -0,0 +1,122 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from config import ARCHIVE_CACHED_MONTHS, ARCHIVE_FOLDER
+from metrics import count, timed
+from schema import ASSIGNMENT_SCHEMA, as_text, file_signature, read_csv, typed
+
+# Partition files carry each row's assignment key in front of the usual columns.
+ARCHIVE_SCHEMA = {"key": "int", **ASSIGNMENT_SCHEMA}
+PARTITION_NAME = re.compile(r"^assignments-(\d{4}-\d{2}|undated)\.csv\.gz$")
+# Rows whose assignment date cannot be read; only whole-history reads include them.
+UNDATED = "undated"
+# zlib level: 6 writes nearly twice as fast as gzip's default 9 for a file about 1% larger.
+COMPRESS_LEVEL = 6
+
+
+def _empty():
+    return typed(pd.DataFrame(columns=list(ASSIGNMENT_SCHEMA)), ASSIGNMENT_SCHEMA)
+
+
+# ---------- ASSIGNMENT ARCHIVE ----------
+# Returned assignments, one gzip-compressed CSV per month of their assignment date:
+#   assignment_archive/assignments-2024-03.csv.gz
+# A history query for a date range opens only the months that range covers. Partitions are written by
+# the backends' archive step, which holds the hot store's lock, so two archive runs never interleave.
+class AssignmentArchive:
+    def __init__(self, folder=ARCHIVE_FOLDER, cached_months=ARCHIVE_CACHED_MONTHS):
+        self.folder = folder
+        self.cached_months = cached_months
+        self._frames = OrderedDict()
+        self._lock = threading.Lock()
+
+    def path(self, month):
+        return os.path.join(self.folder, f"assignments-{month}.csv.gz")
+
+    def months(self):
+        # "YYYY-MM" of every partition on disk, oldest first ("undated" last).
+        try:
+            names = os.listdir(self.folder)
+        except FileNotFoundError:
+            return []
+        months = sorted(m.group(1) for m in map(PARTITION_NAME.match, names) if m)
+        return [month for month in months if month != UNDATED] + [month for month in months if month == UNDATED]
+
+    def partitions(self, start=None, end=None):
+        # Months that can hold assignments dated start..end (dates, inclusive; None leaves that side open).
+        first = None if start is None else f"{start:%Y-%m}"
+        last = None if end is None else f"{end:%Y-%m}"
+        found = []
+        for month in self.months():
+            if month == UNDATED:
+                if first is None and last is None:
+                    found.append(month)
+            elif (first is None or month >= first) and (last is None or month <= last):
+                found.append(month)
+        return found
+
+    # ----- reads -----
+    def read(self, month):
+        # One typed partition indexed by assignment key; kept parsed until its file changes.
+        path = self.path(month)
+        signature = file_signature(path)
+        if signature is None:
+            return _empty()
+        with self._lock:
+            entry = self._frames.get(path)
+            if entry is not None and entry[0] == signature:
+                self._frames.move_to_end(path)
+                return entry[1]
+        df = read_csv(path, ARCHIVE_SCHEMA).set_index("key")
+        df.index.name = None
+        count("archive_partitions_read")
+        with self._lock:
+            self._frames[path] = (signature, df)
+            while len(self._frames) > self.cached_months:
+                self._frames.popitem(last=False)
+        return df
+
+    @timed("archive.load")
+    def load(self, start=None, end=None):
+        frames = [self.read(month) for month in self.partitions(start, end)]
+        if not frames:
+            return _empty()
+        return typed(pd.concat(frames), ASSIGNMENT_SCHEMA)
+
+    # ----- writes -----
+    @timed("archive.add")
+    def add(self, df):
+        # df: typed assignment rows indexed by key. Each month's partition is rewritten with the new rows
+        # merged in; a key already there is replaced, so re-archiving after an interrupted run is harmless.
+        if df.empty:
+            return []
+        os.makedirs(self.folder, exist_ok=True)
+        months = np.datetime_as_string(df['date'].to_numpy().astype("datetime64[M]"), unit="M")
+        months = np.where(df['date'].isna().to_numpy(), UNDATED, months)
+        for month, rows in df.groupby(months, sort=True):
+            if os.path.exists(self.path(month)):
+                merged = pd.concat([self.read(month), rows])
+                rows = typed(merged[~merged.index.duplicated(keep="last")].sort_index(), ASSIGNMENT_SCHEMA)
+            self._write(month, rows)
+        return sorted(set(months))
+
+    def _write(self, month, df):
+        # The frame just written is what the next read would parse, so it is cached as well.
+        text = as_text(df, ASSIGNMENT_SCHEMA)
+        text.insert(0, "key", df.index)
+        path = self.path(month)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            text.to_csv(f, index=False, compression={"method": "gzip", "compresslevel": COMPRESS_LEVEL})
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._frames[path] = (file_signature(path), df)
+            while len(self._frames) > self.cached_months:
+                self._frames.popitem(last=False)
@@ -0,0 +1,21 @@
+import os
+from functools import lru_cache
+
+# Read once per server process: app.py runs again on every rerun, this module does not.
+ASSET_FOLDER = os.path.dirname(os.path.abspath(__file__))
+STYLESHEET = os.path.join(ASSET_FOLDER, "static", "style.css")
+LOGO_FILE = "logo.png"
+
+
+@lru_cache(maxsize=None)
+def stylesheet():
+    with open(STYLESHEET, encoding="utf-8") as f:
+        return f"<style>\n{f.read()}</style>"
+
+
+@lru_cache(maxsize=None)
+def logo_bytes():
+    # Raw PNG bytes; st.image takes them as they are, so the login screen never imports PIL.
+    path = LOGO_FILE if os.path.exists(LOGO_FILE) else os.path.join(ASSET_FOLDER, LOGO_FILE)
+    with open(path, "rb") as f:
+        return f.read()
@@ -0,0 +1,132 @@
+import argparse
+import io
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+from barcode import Code128
+from barcode.writer import ImageWriter, SVGWriter
+
+from config import BARCODE_FOLDER
+from metrics import count, timed
+
+# Below this many missing images a pool costs more to start than it saves.
+POOL_THRESHOLD = 32
+# A4 at 150 dpi.
+SHEET_SIZE = (1240, 1754)
+SHEET_MARGIN = 40
+
+
+# ---------- SINGLE BARCODES ----------
+# A Code128 image is fully determined by its text, so the file name is the cache key:
+# an existing barcodes/<id>.<ext> is never rendered again.
+def barcode_path(uid, fmt="png"):
+    return os.path.join(BARCODE_FOLDER, f"{uid}.{fmt}")
+
+
+def _writer(fmt):
+    return SVGWriter() if fmt == "svg" else ImageWriter()
+
+
+def _render_to_file(uid, fmt="png"):
+    count("barcodes_rendered")
+    path = barcode_path(uid, fmt)
+    # Rendered beside the final path and moved into place, so a crash never leaves a truncated "cached" image.
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        Code128(str(uid), writer=_writer(fmt)).write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return path
+
+
+@timed()
+def generate_barcode(uid, fmt="png"):
+    path = barcode_path(uid, fmt)
+    if os.path.exists(path):
+        return path
+    os.makedirs(BARCODE_FOLDER, exist_ok=True)
+    return _render_to_file(uid, fmt)
+
+
+@lru_cache(maxsize=512)
+def barcode_bytes(uid, fmt="png"):
+    # In-memory render for previews and downloads; nothing touches disk.
+    buffer = io.BytesIO()
+    Code128(str(uid), writer=_writer(fmt)).write(buffer)
+    return buffer.getvalue()
+
+
+# ---------- BATCHES ----------
+def _render_many(args):
+    return [_render_to_file(uid, fmt) for uid, fmt in args]
+
+
+@timed()
+def generate_barcodes(uids, fmt="png", processes=None):
+    # Returns {uid: path}; only missing images are rendered, across a process pool for big batches.
+    paths = {uid: barcode_path(uid, fmt) for uid in dict.fromkeys(str(u) for u in uids)}
+    missing = [uid for uid, path in paths.items() if not os.path.exists(path)]
+    if not missing:
+        return paths
+    os.makedirs(BARCODE_FOLDER, exist_ok=True)
+    if len(missing) < POOL_THRESHOLD or processes == 1:
+        _render_many([(uid, fmt) for uid in missing])
+        return paths
+    workers = processes or os.cpu_count() or 1
+    size = max(1, len(missing) // (workers * 4))
+    chunks = [[(uid, fmt) for uid in missing[i:i + size]] for i in range(0, len(missing), size)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(_render_many, chunks))
+    return paths
+
+
+# ---------- LABEL SHEETS ----------
+@timed()
+def label_sheet(labels, fmt="pdf", columns=3):
+    # labels: iterable of (stock_id, caption). Returns PDF (one page per sheet) or PNG bytes.
+    from PIL import Image, ImageDraw
+
+    labels = list(labels)
+    cell_w = (SHEET_SIZE[0] - 2 * SHEET_MARGIN) // columns
+    cell_h = cell_w * 2 // 3
+    rows_per_page = (SHEET_SIZE[1] - 2 * SHEET_MARGIN) // cell_h
+    per_page = max(1, rows_per_page * columns)
+    if fmt == "png":
+        # A single long sheet instead of separate pages.
+        rows_per_page = max(1, -(-len(labels) // columns))
+        per_page = max(1, len(labels))
+    pages = []
+    for start in range(0, max(len(labels), 1), per_page):
+        height = SHEET_SIZE[1] if fmt == "pdf" else 2 * SHEET_MARGIN + rows_per_page * cell_h
+        page = Image.new("RGB", (SHEET_SIZE[0], height), "white")
+        draw = ImageDraw.Draw(page)
+        for i, (stock_id, caption) in enumerate(labels[start:start + per_page]):
+            x = SHEET_MARGIN + (i % columns) * cell_w
+            y = SHEET_MARGIN + (i // columns) * cell_h
+            img = Image.open(io.BytesIO(barcode_bytes(str(stock_id)))).convert("RGB")
+            img.thumbnail((cell_w - 20, cell_h - 40))
+            page.paste(img, (x + (cell_w - img.width) // 2, y + 10))
+            draw.text((x + 10, y + cell_h - 28), str(caption)[:40], fill="black")
+        pages.append(page)
+    buffer = io.BytesIO()
+    if fmt == "pdf":
+        pages[0].save(buffer, "PDF", save_all=True, append_images=pages[1:], resolution=150)
+    else:
+        pages[0].save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+if __name__ == "__main__":
+    from storage import load_data
+
+    parser = argparse.ArgumentParser(description="Render missing barcode images for all stock")
+    parser.add_argument("--format", choices=["png", "svg"], default="png")
+    parser.add_argument("--processes", type=int)
+    args = parser.parse_args()
+    ids = load_data()['id'].tolist()
+    before = sum(os.path.exists(barcode_path(uid, args.format)) for uid in ids)
+    generate_barcodes(ids, args.format, args.processes)
+    print(f"{len(ids)} stock IDs, {len(ids) - before} barcodes rendered, {before} already cached")
@@ -0,0 +1,159 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+# Synthetic stock.csv / assignments.csv in the app's own layout, for benchmarks and load testing.
+# Rows are produced and written in chunks, so 10M-row files never sit in memory at once.
+# Usage: python -m benchmarks.generate --stock 100000 --assignments 1000000 --out data/
+CHUNK_ROWS = 500_000
+ID_WIDTH = 8
+ADJECTIVES = ["Pro", "Slim", "Ultra", "Mini", "Max", "Lite", "Plus", "Air", "Smart", "Eco",
+              "Prime", "Elite", "Core", "Flex", "Nano", "Turbo", "Quiet", "Rapid", "Solid", "Wide"]
+PRODUCTS = {
+    "Laptop": ["Notebook", "Ultrabook", "Chromebook", "Workstation"],
+    "Monitor": ["Display", "Screen", "Panel"],
+    "Printer": ["LaserJet", "InkJet", "Plotter"],
+    "Accessory": ["Mouse", "Keyboard", "Headset", "Webcam", "Dock", "Charger", "Cable"],
+    "Furniture": ["Desk", "Chair", "Cabinet", "Shelf"],
+    "Network": ["Router", "Switch", "Access Point"],
+    "Projector": ["Projector", "Beamer"],
+    "Storage": ["SSD", "HDD", "NAS"],
+}
+BASE_COMPANIES = ["HP", "Dell", "Apple", "Lenovo", "Samsung", "Acer", "Asus", "LG", "Canon", "Epson",
+                  "Logitech", "Cisco", "BenQ", "Brother", "Ikea", "Steelcase", "Netgear", "Seagate"]
+DEPARTMENTS = ["CS", "EE", "ME", "Physics", "Maths", "Chemistry", "Biology", "Business", "Law", "Arts"]
+FIRST_NAMES = ["Ali", "Sara", "Omar", "Ayesha", "John", "Maria", "Chen", "Fatima", "Ravi", "Emma",
+               "Hassan", "Zara", "Lucas", "Noor", "Kim", "Usman", "Hina", "David", "Amina", "Leo"]
+CATEGORIES = list(PRODUCTS)
+# KINDS[category index, j] cycles through that category's product kinds.
+KINDS = np.array([[kinds[j % len(kinds)] for j in range(12)] for kinds in PRODUCTS.values()], dtype=object)
+
+
+def _choice(rng, values, size):
+    return np.asarray(values, dtype=object)[rng.integers(0, len(values), size)]
+
+
+def _text(numbers):
+    return pd.Series(numbers).astype(str).to_numpy(dtype=object)
+
+
+def _minutes(timestamps):
+    # DATE_FORMAT ("YYYY-MM-DD HH:MM") without the per-row cost of strftime.
+    text = np.datetime_as_string(timestamps.to_numpy().astype("datetime64[m]"), unit="m")
+    return np.strings.replace(text, "T", " ").astype(object)
+
+
+def stock_ids(numbers):
+    # Zero-padded like the "007" IDs in use; scanners and the Return flow drop the padding.
+    return pd.Series(numbers).astype(str).str.zfill(ID_WIDTH).to_numpy(dtype=object)
+
+
+def products(numbers):
+    # Category and name are a fixed function of the ID number, so assignment rows can name
+    # their product without keeping millions of stock rows in memory.
+    h = (np.asarray(numbers, dtype=np.uint64) * np.uint64(2654435761)) % np.uint64(2 ** 32)
+    category = (h % np.uint64(len(CATEGORIES))).astype(int)
+    kind = KINDS[category, ((h >> np.uint64(4)) % np.uint64(KINDS.shape[1])).astype(int)]
+    adjective = np.asarray(ADJECTIVES, dtype=object)[((h >> np.uint64(9)) % np.uint64(len(ADJECTIVES))).astype(int)]
+    model = _text(100 + (h >> np.uint64(14)) % np.uint64(9900))
+    return np.asarray(CATEGORIES, dtype=object)[category], adjective + " " + kind + " " + model
+
+
+def companies(count):
+    extra = [f"{name} {n}" for n in range(2, count // len(BASE_COMPANIES) + 2) for name in BASE_COMPANIES]
+    return (BASE_COMPANIES + extra)[:max(count, 1)]
+
+
+def stock_chunk(rng, start, stop, n_companies):
+    size = stop - start
+    numbers = np.arange(start, stop)
+    ids = stock_ids(numbers)
+    categories, names = products(numbers)
+    return pd.DataFrame({
+        "id": ids,
+        "name": names,
+        "company": _choice(rng, companies(n_companies), size),
+        "category": categories,
+        "quantity": rng.integers(0, 60, size),
+        "price": np.round(rng.uniform(5, 3000, size), 2),
+        "barcode": "barcodes/" + ids + ".png",
+        "image": "",
+        "version": 0,
+    })
+
+
+def assignment_chunk(rng, start, stop, total, n_stock, start_time, minutes, open_ratio):
+    size = stop - start
+    numbers = rng.integers(0, n_stock, size)
+    ids = stock_ids(numbers)
+    teacher = rng.random(size) < 0.35
+    # Histories run forward in time, a few minutes of jitter apart.
+    offsets = np.arange(start, stop) * minutes // max(total, 1) + rng.integers(0, 60, size)
+    # Nothing is dated after the generation time: the last rows' jitter and return dates stop at "now".
+    now = start_time + pd.Timedelta(minutes=minutes)
+    dates = np.minimum(start_time + pd.to_timedelta(offsets, unit="min"), now)
+    is_open = rng.random(size) < open_ratio
+    returned = np.minimum(dates + pd.to_timedelta(rng.integers(60, 60 * 24 * 120, size), unit="min"), now)
+    # Some rows were typed without the leading zeros, as the original Return flow allows.
+    stripped = rng.random(size) < 0.3
+    return pd.DataFrame({
+        "user": _choice(rng, FIRST_NAMES, size) + " " + _text(rng.integers(1, 5000, size)),
+        "role": np.where(teacher, "Teacher", "Student"),
+        "stock_id": np.where(stripped, _text(numbers), ids),
+        "stock_name": products(numbers)[1],
+        "date": _minutes(dates),
+        "remarks": np.where(rng.random(size) < 0.1, "semester kit", ""),
+        "status": np.where(is_open, "Assigned", "Returned"),
+        "teacher_id": np.where(teacher, "T" + _text(rng.integers(100, 999, size)), ""),
+        "department": np.where(teacher, _choice(rng, DEPARTMENTS, size), ""),
+        "return_date": np.where(is_open, "", _minutes(returned)),
+    })
+
+
+def _write_csv(chunk, path, header):
+    # pyarrow's writer is far faster than to_csv; generated values never contain commas or quotes.
+    try:
+        import pyarrow as pa
+        import pyarrow.csv as pa_csv
+    except ImportError:
+        chunk.to_csv(path, mode="w" if header else "a", header=header, index=False)
+        return
+    if header:
+        chunk.head(0).to_csv(path, index=False)
+    with open(path, "ab") as f:
+        options = pa_csv.WriteOptions(include_header=False, quoting_style="none")
+        pa_csv.write_csv(pa.Table.from_pandas(chunk, preserve_index=False), f, options)
+
+
+def generate(out_dir, n_stock, n_assignments, n_companies=200, open_ratio=0.05, years=5, seed=0):
+    # Writes out_dir/stock.csv and out_dir/assignments.csv; returns their paths.
+    rng = np.random.default_rng(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    stock_path = os.path.join(out_dir, "stock.csv")
+    assignment_path = os.path.join(out_dir, "assignments.csv")
+    for start in range(0, max(n_stock, 1), CHUNK_ROWS):
+        chunk = stock_chunk(rng, start, min(start + CHUNK_ROWS, n_stock), n_companies)
+        _write_csv(chunk, stock_path, header=start == 0)
+    minutes = years * 365 * 24 * 60
+    start_time = pd.Timestamp.now().floor("min") - pd.Timedelta(minutes=minutes)
+    for start in range(0, max(n_assignments, 1), CHUNK_ROWS):
+        chunk = assignment_chunk(rng, start, min(start + CHUNK_ROWS, n_assignments), n_assignments,
+                                 max(n_stock, 1), start_time, minutes, open_ratio)
+        _write_csv(chunk, assignment_path, header=start == 0)
+    return stock_path, assignment_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write synthetic stock.csv / assignments.csv files")
+    parser.add_argument("--stock", type=int, default=10_000, help="stock rows (1k to 10M)")
+    parser.add_argument("--assignments", type=int, help="assignment rows (default 10x stock)")
+    parser.add_argument("--companies", type=int, default=200)
+    parser.add_argument("--open-ratio", type=float, default=0.05, help="share of assignments still open")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=".")
+    args = parser.parse_args()
+    n_assignments = args.stock * 10 if args.assignments is None else args.assignments
+    paths = generate(args.out, args.stock, n_assignments, args.companies, args.open_ratio, seed=args.seed)
+    print(f"wrote {args.stock} stock rows to {paths[0]} and {n_assignments} assignments to {paths[1]}")
@@ -0,0 +1,100 @@
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+# Load time and in-memory size of the stock and assignment tables, read the way storage did before
+# schema.py (every column as text, then cast) against the typed schema with each parser and mirror.
+# Usage: python -m benchmarks.load_formats --stock 100000 --assignments 1000000 [--data dir]
+
+
+def _legacy_stock(path, columns):
+    # The original CSV path: dtype=str for every column, then the numeric casts.
+    df = pd.read_csv(path, dtype=str)
+    df = df[columns].copy()
+    for col in ["id", "name", "company", "category", "barcode", "image"]:
+        df[col] = df[col].fillna("").astype(str)
+    df['quantity'] = pd.to_numeric(df['quantity'], errors="coerce").fillna(0).astype(int)
+    df['price'] = pd.to_numeric(df['price'], errors="coerce").fillna(0.0).astype(float)
+    df['version'] = pd.to_numeric(df['version'], errors="coerce").fillna(0).astype(int)
+    return df
+
+
+def _legacy_assignments(path, columns):
+    return pd.read_csv(path, dtype=str)[columns].fillna("").astype(str)
+
+
+def _timed(func, repeats):
+    times = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        df = func()
+        times.append(time.perf_counter() - started)
+    return statistics.median(times), df
+
+
+def measure(path, table, repeats=3):
+    import schema
+
+    table_schema = schema.STOCK_SCHEMA if table == "stock" else schema.ASSIGNMENT_SCHEMA
+    legacy = _legacy_stock if table == "stock" else _legacy_assignments
+    columns = list(table_schema)
+
+    def typed_with(engine):
+        def load():
+            schema.CSV_ENGINE = engine
+            return schema.read_csv(path, table_schema)
+        return load
+
+    cases = [("csv, all text (before)", lambda: legacy(path, columns)),
+             ("csv, typed, pandas C parser", typed_with("c"))]
+    if schema.pa is not None:
+        cases.append(("csv, typed, pyarrow parser", typed_with("pyarrow")))
+        typed_df = schema.read_csv(path, table_schema)
+        for fmt in ("feather", "parquet"):
+            mirror = schema.FrameMirror(path, fmt=fmt, min_rows=0)
+            mirror.save(typed_df, ("bench",))
+            size = os.path.getsize(mirror.path) / 2 ** 20
+            cases.append((f"{fmt} mirror ({size:.0f} MB on disk)", lambda mirror=mirror: mirror.load(("bench",))))
+    results = []
+    for name, load in cases:
+        seconds, df = _timed(load, repeats)
+        results.append((name, seconds, df.memory_usage(deep=True).sum() / 2 ** 20))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare typed and all-text table loads")
+    parser.add_argument("--stock", type=int, default=100_000)
+    parser.add_argument("--assignments", type=int, default=1_000_000)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--data", help="keep generated files here and reuse them between runs")
+    args = parser.parse_args()
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    from benchmarks.generate import generate
+
+    out = args.data or tempfile.mkdtemp(prefix="bench_formats_")
+    stock_path = os.path.join(out, "stock.csv")
+    assignment_path = os.path.join(out, "assignments.csv")
+    if not os.path.exists(assignment_path):
+        generate(out, args.stock, args.assignments)
+    try:
+        for table, path in (("stock", stock_path), ("assignments", assignment_path)):
+            size = os.path.getsize(path) / 2 ** 20
+            print(f"\n== {table}: {path} ({size:.0f} MB) ==")
+            print(f"{'load path':<36}{'seconds':>9}{'memory MB':>11}")
+            for name, seconds, memory in measure(path, table, args.repeats):
+                print(f"{name:<36}{seconds:>9.3f}{memory:>11.1f}")
+    finally:
+        if not args.data:
+            shutil.rmtree(out, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Times the data operations behind the pages, outside Streamlit, on generated data of several sizes.
+# Every (backend, size) case runs in a fresh process, since storage keeps process-wide caches.
+# Reports calls, latency percentiles, throughput and peak memory per operation; --save writes the
+# results as JSON and --compare flags operations whose median got slower than a saved run.
+# Usage: python -m benchmarks.run --sizes 1000,100000 --backend csv sqlite --save before.json
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+
+
+# ---------- MEASUREMENT ----------
+def peak_memory(func, args=()):
+    # Peak Python/NumPy heap allocated while func runs. Arrow-backed string buffers are not
+    # traced, so each case also reports the process's resident high-water mark.
+    tracemalloc.start()
+    try:
+        func(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def max_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    # ru_maxrss is KiB on Linux, bytes on macOS.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2 ** 20 if sys.platform == "darwin" else 2 ** 10)
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+def measure(name, func, calls, units=1, unit="ops"):
+    # calls: argument tuples, one per timed call; units: rows/items handled per call.
+    latencies = []
+    for args in calls:
+        started = time.perf_counter()
+        func(*args)
+        latencies.append(time.perf_counter() - started)
+    total = sum(latencies)
+    return {
+        "name": name,
+        "calls": len(latencies),
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p95_ms": _percentile(latencies, 95) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+        "throughput": len(latencies) * units / total if total else float("inf"),
+        "unit": f"{unit}/s",
+        "peak_mb": peak_memory(func, calls[0]) / 2 ** 20,
+    }
+
+
+# ---------- SUITE ----------
+def run_suite(n_stock, n_assignments, seed=0):
+    # Runs in the case's own process, with the working directory holding the generated files.
+    import services
+    import storage
+    from aggregates import InventoryAggregates
+    from ledger import AssignmentLedger
+    from stock_index import StockIndex
+    from table_views import STOCK_TABLE_COLUMNS, filter_stock, highlight_low_stock, paginate
+
+    rng = random.Random(seed)
+    today = datetime.date.today()
+    results = []
+    lookups = max(100, min(2000, n_stock))
+    # Stock writes rewrite stock.csv, so keep their count reasonable on big CSV files.
+    writes = max(3, min(50, 2_000_000 // max(n_stock, 1)))
+    repeats = max(3, min(20, 5_000_000 // max(n_stock + n_assignments, 1)))
+    # Opening the backend seeds the CSV assignment ledger once; keep that out of the timings.
+    storage.get_backend()
+
+    def cold_stock():
+        storage._cache.invalidate()
+        return storage.load_data()
+
+    def cold_assignments():
+        storage._cache.invalidate()
+        return storage.load_assignments()
+
+    results.append(measure("load_data (cold)", cold_stock, [()] * repeats, n_stock, "rows"))
+    results.append(measure("load_data (cached)", storage.load_data, [()] * repeats, n_stock, "rows"))
+    results.append(measure("load_assignments (cold)", cold_assignments, [()] * repeats, n_assignments, "rows"))
+    if storage.get_backend().name == "csv":
+        results.append(measure("assignment ledger replay", AssignmentLedger, [("assignment_events.jsonl",)] * repeats,
+                               n_assignments, "rows"))
+    df = storage.load_data()
+    results.append(measure("save_data", storage.save_data, [(df,)] * max(3, writes // 5), n_stock, "rows"))
+    results.append(measure("StockIndex build", StockIndex, [(storage.get_stock_index().df,)] * repeats, n_stock, "rows"))
+
+    index = storage.get_stock_index()
+    ids = index.df['id'].tolist()
+    sample = [ids[rng.randrange(len(ids))] for _ in range(lookups)]
+    # Return lookup as scanned: leading zeros dropped, then the open assignment for the item.
+    results.append(measure("return lookup", lambda code: (index.find(code), storage.open_assignment(code)),
+                           [(stock_id.lstrip("0") or "0",) for stock_id in sample]))
+    rows = index.df[['name', 'company', 'category']].to_numpy().tolist()
+    results.append(measure("add_stock duplicate check", index.match,
+                           [tuple(rows[rng.randrange(len(rows))]) for _ in range(lookups)]))
+    words = [name.split()[rng.randrange(2)][:3] for name, _, _ in rows[:200]]
+    results.append(measure("search", index.search, [(word,) for word in words]))
+
+    assign_df = storage.load_assignments()
+    results.append(measure("dashboard aggregates (rebuild)", InventoryAggregates.from_frames,
+                           [(index.df, assign_df)] * repeats, n_stock + n_assignments, "rows"))
+
+    def dashboard():
+        # The dashboard's data work for one rerun: metrics, charts, low stock and the first table page.
+        aggregates = storage.get_aggregates()
+        aggregates.summary()
+        aggregates.group_table("category")
+        aggregates.group_table("company")
+        aggregates.assigned_table("department")
+        aggregates.low_stock_table()
+        aggregates.open_ages()
+        page, _, _ = paginate(filter_stock(index)[STOCK_TABLE_COLUMNS], 1, 25)
+        page.style.apply(highlight_low_stock, subset=['low_stock']).to_html()
+    results.append(measure("dashboard rerun", dashboard, [()] * repeats))
+
+    def assign_and_return(stock_id):
+        services.assign(stock_id, "bench", "Student")
+        services.return_(stock_id)
+    in_stock = index.df.loc[index.df['quantity'] > 0, 'id'].tolist()
+    results.append(measure("assign + return", assign_and_return,
+                           [(in_stock[rng.randrange(len(in_stock))],) for _ in range(writes)]))
+
+    # Stock journal: a simulated burst of movements, then rebuilding the current state (nearest snapshot plus
+    # the tail after it) and daily levels per category, which replay every movement in the range.
+    journal = storage.get_journal()
+    items = index.df[['id', 'name', 'company', 'category', 'price']].astype({"company": str, "category": str})
+    items = items.to_numpy().tolist()
+    moves = 20 * journal.snapshot_every
+
+    def movement_chunk(size):
+        chunk = []
+        for _ in range(size):
+            stock_id, name, company, category, price = items[rng.randrange(len(items))]
+            chunk.append({"id": stock_id, "name": name, "company": company, "category": category,
+                          "quantity": rng.randrange(50), "price": price, "delta": 0, "deleted": False})
+        return chunk
+    results.append(measure("journal append (1,000 entries)", journal.record,
+                           [(movement_chunk(1000), "bench") for _ in range(moves // 1000)], 1000, "entries"))
+
+    # Both reads are cached by journal version, so each repeat drops the cached result and parsed snapshots.
+    def cold_state():
+        storage._cache.invalidate("stock_as_of")
+        journal._states.clear()
+        return storage.stock_as_of()
+    results.append(measure("stock as of now (cold)", cold_state, [()] * repeats, n_stock, "rows"))
+
+    def cold_levels(start, end, freq, by):
+        storage._cache.invalidate("stock_levels")
+        journal._states.clear()
+        return storage.stock_levels(start, end, freq, by)
+    results.append(measure("stock levels by category, 90 days", cold_levels,
+                           [(today - datetime.timedelta(days=90), today, "D", "category")] * repeats, moves, "entries"))
+
+    # Archival: the hot store keeps only open assignments; history reads open just the months asked for.
+    results.append(measure("archive returned assignments", storage.archive_assignments, [()], n_assignments, "rows"))
+    results.append(measure("load_assignments (cold, after archive)", cold_assignments, [()] * repeats,
+                           len(storage.load_assignments()), "rows"))
+    archive = storage.get_archive()
+
+    def cold_history(start, end):
+        storage._cache.invalidate()
+        archive._frames.clear()
+        return storage.load_assignment_history(start, end)
+    results.append(measure("history, last 30 days (cold)", cold_history,
+                           [(today - datetime.timedelta(days=30), today)] * repeats))
+    results.append(measure("history, whole (cold)", cold_history, [(None, None)] * repeats, n_assignments, "rows"))
+
+    # Reorder forecast: demand rates from the whole (multi-year) history, then the per-item forecast.
+    from forecast import DemandRates
+
+    history = storage.load_assignment_history()
+    results.append(measure("demand rates from history", DemandRates.from_history, [(history,)] * repeats,
+                           len(history), "rows"))
+
+    def cold_forecast():
+        storage._cache.invalidate("stock_forecast")
+        return storage.stock_forecast()
+    results.append(measure("reorder forecast (rates cached)", cold_forecast, [()] * repeats, n_stock, "rows"))
+    return {"results": results, "max_rss_mb": max_rss_mb()}
+
+
+def _run_case(args):
+    backend, n_stock, n_assignments, data_root, repo = args
+    # config and storage read the backend and relative file paths on import.
+    sys.path.insert(0, repo)
+    os.environ["INVENTORY_BACKEND"] = backend
+    work = tempfile.mkdtemp(prefix=f"bench_{backend}_{n_stock}_")
+    source = os.path.join(data_root, f"{n_stock}_{n_assignments}")
+    for name in ("stock.csv", "assignments.csv"):
+        shutil.copy(os.path.join(source, name), work)
+    os.chdir(work)
+    import storage
+
+    if backend == "sqlite":
+        storage.migrate_csv_to_sqlite()
+    try:
+        return run_suite(n_stock, n_assignments)
+    finally:
+        os.chdir(data_root)
+        shutil.rmtree(work, ignore_errors=True)
+
+
+# ---------- REPORTING ----------
+def _print_case(case, report):
+    rss = report["max_rss_mb"]
+    print(f"\n== {case} ==" + ("" if rss is None else f" (process max RSS {rss:.0f} MB)"))
+    print(f"{'operation':<34}{'calls':>7}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}{'throughput':>16}  {'heap MB':>8}")
+    for r in report["results"]:
+        print(f"{r['name']:<34}{r['calls']:>7}{r['p50_ms']:>11.3f}{r['p95_ms']:>11.3f}{r['p99_ms']:>11.3f}"
+              f"{r['throughput']:>12,.0f} {r['unit']:<7}{r['peak_mb']:>7.1f}")
+
+
+def compare(baseline, current, threshold, floor_ms=0.1):
+    # Returns (case, operation, before p50, after p50) for every operation slower than threshold
+    # (0.25 = 25%); differences under floor_ms are timer noise on sub-millisecond lookups.
+    regressions = []
+    for case, report in current.items():
+        before = {r['name']: r for r in baseline.get(case, {}).get("results", [])}
+        for r in report["results"]:
+            old = before.get(r['name'])
+            if old and r['p50_ms'] > old['p50_ms'] * (1 + threshold) and r['p50_ms'] - old['p50_ms'] > floor_ms:
+                regressions.append((case, r['name'], old['p50_ms'], r['p50_ms']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark inventory data operations")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="comma-separated stock row counts")
+    parser.add_argument("--history", type=int, default=10, help="assignment rows per stock row")
+    parser.add_argument("--backend", nargs="+", choices=["csv", "sqlite"], default=["csv"])
+    parser.add_argument("--data", help="keep generated files here and reuse them between runs")
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--compare", help="JSON file from an earlier --save to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="slowdown that counts as a regression")
+    args = parser.parse_args()
+
+    from benchmarks.generate import generate
+
+    repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    data_root = os.path.abspath(args.data or tempfile.mkdtemp(prefix="bench_data_"))
+    sizes = [int(size) for size in args.sizes.split(",")]
+    current = {}
+    # spawn: each case starts with fresh imports, caches and backend singleton.
+    context = multiprocessing.get_context("spawn")
+    for n_stock in sizes:
+        n_assignments = n_stock * args.history
+        source = os.path.join(data_root, f"{n_stock}_{n_assignments}")
+        if not os.path.exists(os.path.join(source, "assignments.csv")):
+            started = time.perf_counter()
+            generate(source, n_stock, n_assignments)
+            print(f"generated {n_stock} stock / {n_assignments} assignment rows in {time.perf_counter() - started:.1f}s")
+        for backend in args.backend:
+            case = f"{backend} {n_stock} stock / {n_assignments} assignments"
+            with context.Pool(1) as pool:
+                current[case] = pool.apply(_run_case, ((backend, n_stock, n_assignments, data_root, repo),))
+            _print_case(case, current[case])
+    if not args.data:
+        shutil.rmtree(data_root, ignore_errors=True)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"python": sys.version.split()[0], "results": current}, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(baseline, current, args.threshold)
+        for case, name, before, after in regressions:
+            print(f"REGRESSION {case}: {name} p50 {before:.3f} ms -> {after:.3f} ms")
+        if regressions:
+            raise SystemExit(1)
+        print(f"no regressions over {args.threshold:.0%} against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Cold start and per-rerun cost of each page, measured through Streamlit's AppTest.
+# Every page runs in a fresh interpreter, so the first run pays for every import the page triggers
+# (what a user waits for after a server restart) and later runs show the steady per-rerun cost.
+# Usage: python -m benchmarks.startup [--app path/to/app.py] [--stock 10000] [--save out.json]
+PAGES = ["Login", "Home", "Add Stock", "Manage Stock", "View Stock", "Assign/Return", "Dashboard", "Import/Export", "Jobs"]
+HEAVY_MODULES = ["pandas", "numpy", "pyarrow", "PIL", "barcode"]
+
+
+def _measure_page(app, page, reruns):
+    # Runs inside the child interpreter, with the working directory holding the data files.
+    from streamlit.testing.v1 import AppTest
+
+    before = set(sys.modules)
+    at = AppTest.from_file(app, default_timeout=120)
+    if page != "Login":
+        at.session_state.logged_in = True
+        at.session_state.username = "admin"
+        at.session_state.page = page
+    started = time.perf_counter()
+    at.run()
+    first = time.perf_counter() - started
+    times = []
+    for _ in range(reruns):
+        started = time.perf_counter()
+        at.run()
+        times.append(time.perf_counter() - started)
+    loaded = set(sys.modules) - before
+    return {
+        "page": page,
+        "first_ms": first * 1000,
+        "rerun_ms": statistics.median(times) * 1000 if times else None,
+        "modules": len(loaded),
+        "heavy": [name for name in HEAVY_MODULES if name in loaded],
+        "error": [str(e.value) for e in at.exception] if at.exception else None,
+    }
+
+
+def _child(app, page, reruns, data):
+    os.chdir(data)
+    sys.path.insert(0, os.path.dirname(app))
+    print(json.dumps(_measure_page(app, page, reruns)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold start and rerun time of each page")
+    parser.add_argument("--app", default=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py"))
+    parser.add_argument("--stock", type=int, default=10_000)
+    parser.add_argument("--reruns", type=int, default=5)
+    parser.add_argument("--pages", default=",".join(PAGES))
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--child", nargs=3, metavar=("PAGE", "RERUNS", "DATA"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    app = os.path.abspath(args.app)
+    if args.child:
+        page, reruns, data = args.child
+        _child(app, page, int(reruns), data)
+        return
+
+    from benchmarks.generate import generate
+
+    data = tempfile.mkdtemp(prefix="bench_startup_")
+    try:
+        generate(data, args.stock, args.stock * 10)
+        shutil.copy(os.path.join(os.path.dirname(app), "logo.png"), data)
+        run = [sys.executable, "-m", "benchmarks.startup", "--app", app, "--child"]
+        repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        # Warm-up: seeds the assignment ledger (and any on-disk mirrors) once, outside the timings.
+        subprocess.run(run + ["Dashboard", "0", data], capture_output=True, check=True, cwd=repo)
+        results = []
+        print(f"{'page':<16}{'cold run ms':>13}{'rerun ms':>10}{'modules':>9}  heavy imports")
+        for page in args.pages.split(","):
+            # A fresh interpreter per page.
+            output = subprocess.run(run + [page, str(args.reruns), data], capture_output=True, text=True, check=True, cwd=repo).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            results.append(result)
+            rerun = "-" if result["rerun_ms"] is None else f"{result['rerun_ms']:.0f}"
+            print(f"{page:<16}{result['first_ms']:>13.0f}{rerun:>10}{result['modules']:>9}  {', '.join(result['heavy']) or '-'}"
+                  + (f"  ERROR {result['error']}" if result["error"] else ""))
+        if args.save:
+            with open(args.save, "w") as f:
+                json.dump({"stock": args.stock, "results": results}, f, indent=2)
+    finally:
+        shutil.rmtree(data, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+# Hammers assign/return from many threads (and optionally processes) against a throwaway
+# data directory, then checks that no unit was lost or double counted:
+#   starting quantity == quantity on the shelf + open assignments, for every item.
+# Usage: python -m benchmarks.stress --backend csv --threads 8 --ops 200 [--processes 2]
+
+
+def _worker(ids, ops, seed, counts, counts_lock):
+    from storage import ConflictError, OutOfStockError, assign_item, get_stock_index, open_assignment, return_item
+
+    rng = random.Random(seed)
+    for _ in range(ops):
+        stock_id = rng.choice(ids)
+        assign = rng.random() < 0.5
+        for _attempt in range(50):
+            product = get_stock_index().get(stock_id)
+            try:
+                if assign:
+                    assign_item(stock_id, {
+                        "user": f"user{seed}", "role": "Student", "stock_id": stock_id, "stock_name": product['name'],
+                        "date": datetime.now().strftime("%Y-%m-%d %H:%M"), "status": "Assigned",
+                    }, expected_version=product['version'])
+                else:
+                    current = open_assignment(stock_id)
+                    if current is None:
+                        outcome = "nothing_open"
+                        break
+                    return_item(current[0], stock_id, datetime.now().strftime("%Y-%m-%d %H:%M"),
+                                expected_version=product['version'])
+                outcome = "assigned" if assign else "returned"
+                break
+            except OutOfStockError:
+                outcome = "out_of_stock"
+                break
+            except ConflictError:
+                with counts_lock:
+                    counts["conflicts"] += 1
+        else:
+            outcome = "gave_up"
+        with counts_lock:
+            counts[outcome] = counts.get(outcome, 0) + 1
+
+
+def run_process(ids, threads, ops, seed):
+    counts = {"conflicts": 0}
+    counts_lock = threading.Lock()
+    workers = [threading.Thread(target=_worker, args=(ids, ops, seed * 1000 + i, counts, counts_lock))
+               for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent assign/return consistency check")
+    parser.add_argument("--backend", choices=["csv", "sqlite"], default="csv")
+    parser.add_argument("--items", type=int, default=5)
+    parser.add_argument("--quantity", type=int, default=10)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=100, help="operations per thread")
+    parser.add_argument("--processes", type=int, default=1)
+    args = parser.parse_args()
+
+    # config reads the backend from the environment and uses paths relative to the working directory.
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    os.environ["INVENTORY_BACKEND"] = args.backend
+    os.chdir(tempfile.mkdtemp(prefix="inventory_stress_"))
+    from storage import get_stock_index, insert_stock, load_assignments
+
+    ids = [f"S{n:03d}" for n in range(args.items)]
+    for stock_id in ids:
+        insert_stock({"id": stock_id, "name": f"Item {stock_id}", "company": "HP", "category": "Laptop",
+                      "quantity": args.quantity, "price": 1.0, "barcode": "", "image": ""})
+
+    started = time.perf_counter()
+    if args.processes > 1:
+        with ProcessPoolExecutor(max_workers=args.processes) as pool:
+            results = list(pool.map(run_process, [ids] * args.processes, [args.threads] * args.processes,
+                                    [args.ops] * args.processes, range(args.processes)))
+    else:
+        results = [run_process(ids, args.threads, args.ops, 0)]
+    elapsed = time.perf_counter() - started
+
+    totals = {}
+    for counts in results:
+        for name, count in counts.items():
+            totals[name] = totals.get(name, 0) + count
+    stock = get_stock_index().df.set_index("id")['quantity']
+    assignments = load_assignments()
+    open_counts = assignments[assignments['status'] == "Assigned"]['stock_id'].value_counts()
+    failures = []
+    for stock_id in ids:
+        on_shelf = int(stock[stock_id])
+        out = int(open_counts.get(stock_id, 0))
+        if on_shelf < 0 or on_shelf + out != args.quantity:
+            failures.append(f"{stock_id}: {on_shelf} on shelf + {out} assigned != {args.quantity}")
+
+    operations = args.processes * args.threads * args.ops
+    print(f"{args.backend}: {operations} operations in {elapsed:.2f}s ({operations / elapsed:.0f} ops/s) in {os.getcwd()}")
+    print(", ".join(f"{name} {count}" for name, count in sorted(totals.items())))
+    if failures:
+        print("INCONSISTENT:\n  " + "\n  ".join(failures))
+        raise SystemExit(1)
+    print(f"consistent: every item balances to {args.quantity}")
+
+
+if __name__ == "__main__":
+    main()
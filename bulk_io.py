@@ -0,0 +1,250 @@
+import argparse
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+from barcode_service import generate_barcodes
+from metrics import timed
+from storage import STOCK_COLUMNS, load_data, load_data_versioned, save_data
+
+PRODUCT_KEY = ["name", "company", "category"]
+REQUIRED_COLUMNS = ["id", "name", "company", "category", "quantity"]
+DEFAULT_CHUNKSIZE = 50_000
+FORMATS = {".csv": "csv", ".xlsx": "xlsx", ".parquet": "parquet"}
+# Row versions are internal to storage; files carry everything else.
+FILE_COLUMNS = [col for col in STOCK_COLUMNS if col != "version"]
+
+
+def detect_format(name):
+    fmt = FORMATS.get(os.path.splitext(str(name))[1].lower())
+    if fmt is None:
+        raise ValueError(f"Unsupported file type for {name!r}; expected one of {sorted(FORMATS)}")
+    return fmt
+
+
+# ---------- READING ----------
+def read_chunks(source, fmt=None, chunksize=DEFAULT_CHUNKSIZE):
+    # source is a path or a file-like object (e.g. a Streamlit upload, which has a .name).
+    fmt = fmt or detect_format(getattr(source, "name", source))
+    if fmt == "csv":
+        yield from pd.read_csv(source, dtype=str, chunksize=chunksize, skipinitialspace=True)
+    elif fmt == "xlsx":
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise ImportError("Excel import needs openpyxl (pip install openpyxl)") from None
+        wb = load_workbook(source, read_only=True, data_only=True)
+        try:
+            rows = wb.active.iter_rows(values_only=True)
+            header = [str(col) for col in next(rows, [])]
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= chunksize:
+                    yield pd.DataFrame(batch, columns=header)
+                    batch = []
+            if batch:
+                yield pd.DataFrame(batch, columns=header)
+        finally:
+            wb.close()
+    elif fmt == "parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet import needs pyarrow (pip install pyarrow)") from None
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+
+
+# ---------- VALIDATION ----------
+def validate_chunk(chunk):
+    # Returns (valid rows typed like the stock table, rejected rows with a "reason" column).
+    chunk = chunk.rename(columns=lambda col: str(col).strip().lower())
+    missing = [col for col in REQUIRED_COLUMNS if col not in chunk.columns]
+    if missing:
+        raise ValueError(f"Missing required column(s): {', '.join(missing)}")
+    for col in FILE_COLUMNS:
+        if col not in chunk.columns:
+            chunk[col] = np.nan if col == "price" else ""
+    chunk = chunk[FILE_COLUMNS].copy()
+    raw = chunk.copy()
+    for col in ["id", "name", "company", "category", "barcode", "image"]:
+        chunk[col] = chunk[col].fillna("").astype(str).str.strip()
+    quantity = pd.to_numeric(chunk['quantity'], errors="coerce")
+    price = pd.to_numeric(chunk['price'], errors="coerce")
+
+    reason = pd.Series("", index=chunk.index, dtype=object)
+    for col in ["id", "name", "company", "category"]:
+        reason = reason.mask((reason == "") & (chunk[col] == ""), f"missing {col}")
+    reason = reason.mask((reason == "") & (quantity.isna() | (quantity < 0) | (quantity % 1 != 0)), "quantity must be a whole number >= 0")
+    bad_price = chunk['price'].notna() & (chunk['price'].astype(str).str.strip() != "") & (price.isna() | (price < 0))
+    reason = reason.mask((reason == "") & bad_price, "price must be a number >= 0")
+
+    ok = reason == ""
+    valid = chunk[ok].copy()
+    valid['quantity'] = quantity[ok].astype(int)
+    valid['price'] = price[ok]
+    rejected = raw[~ok].assign(reason=reason[~ok])
+    return valid, rejected
+
+
+def _aggregate(valid):
+    # One row per product key: first ID, summed quantity, last given price/image.
+    valid = valid.assign(image=valid['image'].replace("", np.nan))
+    return valid.groupby(PRODUCT_KEY, sort=False, as_index=False).agg(
+        id=("id", "first"),
+        quantity=("quantity", "sum"),
+        price=("price", "last"),
+        barcode=("barcode", "first"),
+        image=("image", "last"),
+    )
+
+
+# ---------- MERGE ----------
+def merge_stock(existing, incoming):
+    # add_stock's rule, applied to every incoming product at once: a (name, company, category)
+    # match adds to the quantity (and takes the new price/image), anything else is inserted.
+    # Returns (new stock frame, merged rows, inserted rows, rejected rows).
+    existing = existing.drop(columns=["low_stock"], errors="ignore").reset_index(drop=True)
+    keys = existing[PRODUCT_KEY].assign(_row=existing.index).drop_duplicates(subset=PRODUCT_KEY, keep="first")
+    joined = incoming.merge(keys, on=PRODUCT_KEY, how="left")
+    is_match = joined['_row'].notna()
+
+    matched = joined[is_match]
+    rows = matched['_row'].astype(int).to_numpy()
+    updated = existing.copy()
+    updated.loc[rows, 'quantity'] = updated.loc[rows, 'quantity'].to_numpy() + matched['quantity'].to_numpy()
+    updated.loc[rows, 'price'] = np.where(matched['price'].notna(), matched['price'], updated.loc[rows, 'price'])
+    updated.loc[rows, 'image'] = np.where(matched['image'].notna(), matched['image'], updated.loc[rows, 'image'])
+    updated.loc[rows, 'version'] = updated.loc[rows, 'version'].to_numpy() + 1
+
+    new_rows = joined[~is_match].drop(columns=["_row"])
+    id_taken = new_rows['id'].isin(existing['id']) | new_rows['id'].duplicated(keep="first")
+    rejected = new_rows[id_taken].assign(reason="stock ID already in use")
+    new_rows = new_rows[~id_taken].assign(
+        price=new_rows.loc[~id_taken, 'price'].fillna(0.0),
+        image=new_rows.loc[~id_taken, 'image'].fillna(""),
+        version=0,
+    )
+    result = pd.concat([updated, new_rows[STOCK_COLUMNS]], ignore_index=True)
+    return result, matched.drop(columns=["_row"]), new_rows[STOCK_COLUMNS], rejected
+
+
+@timed()
+def import_stock(source, fmt=None, chunksize=DEFAULT_CHUNKSIZE, dry_run=False, barcodes=True):
+    # Stream, validate and pre-aggregate the file chunk by chunk, then merge and save once.
+    batches = []
+    partials = []
+    rejected = []
+    for number, chunk in enumerate(read_chunks(source, fmt, chunksize), start=1):
+        valid, bad = validate_chunk(chunk)
+        batches.append({"batch": number, "rows": len(chunk), "valid": len(valid), "rejected": len(bad)})
+        if not valid.empty:
+            partials.append(_aggregate(valid))
+        if not bad.empty:
+            rejected.append(bad)
+
+    incoming = _aggregate(pd.concat(partials, ignore_index=True)) if partials else pd.DataFrame(columns=FILE_COLUMNS)
+    token, existing = load_data_versioned()
+    result, merged, inserted, id_rejected = merge_stock(existing, incoming)
+    if not id_rejected.empty:
+        rejected.append(id_rejected)
+    if not dry_run and (len(merged) or len(inserted)):
+        if barcodes and len(inserted):
+            # Render missing barcodes for the new IDs in one pooled batch before the single save.
+            missing = result['barcode'] == ""
+            paths = generate_barcodes(result.loc[missing, 'id'])
+            result.loc[missing, 'barcode'] = result.loc[missing, 'id'].map(paths)
+        # Refused (ConflictError) if anyone changed stock while the file was being processed.
+        save_data(result, expected_version=token)
+    return {
+        "batches": batches,
+        "merged": len(merged),
+        "inserted": len(inserted),
+        "rejected": sum(len(r) for r in rejected),
+        "inserted_rows": inserted,
+        "rejected_rows": pd.concat(rejected, ignore_index=True) if rejected else pd.DataFrame(columns=FILE_COLUMNS + ["reason"]),
+    }
+
+
+# ---------- EXPORT ----------
+@timed()
+def export_stock(target, fmt=None, chunksize=DEFAULT_CHUNKSIZE):
+    # Write the stock table to a path or binary buffer, chunk by chunk.
+    fmt = fmt or detect_format(target)
+    df = load_data()[FILE_COLUMNS]
+    chunks = (df.iloc[start:start + chunksize] for start in range(0, max(len(df), 1), chunksize))
+    if fmt == "csv":
+        owns_file = isinstance(target, (str, os.PathLike))
+        text = open(target, "w", encoding="utf-8", newline="") if owns_file else io.TextIOWrapper(target, encoding="utf-8", newline="")
+        try:
+            for number, chunk in enumerate(chunks):
+                chunk.to_csv(text, index=False, header=number == 0)
+        finally:
+            if owns_file:
+                text.close()
+            else:
+                text.flush()
+                text.detach()
+    elif fmt == "xlsx":
+        try:
+            from openpyxl import Workbook
+        except ImportError:
+            raise ImportError("Excel export needs openpyxl (pip install openpyxl)") from None
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("stock")
+        ws.append(FILE_COLUMNS)
+        for chunk in chunks:
+            for row in chunk.itertuples(index=False, name=None):
+                ws.append(list(row))
+        wb.save(target)
+    elif fmt == "parquet":
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet export needs pyarrow (pip install pyarrow)") from None
+        writer = None
+        try:
+            for chunk in chunks:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(target, table.schema)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+    return len(df)
+
+
+@timed()
+def export_bytes(fmt):
+    buffer = io.BytesIO()
+    export_stock(buffer, fmt)
+    return buffer.getvalue()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk stock import/export")
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", help="Merge a CSV/XLSX/Parquet file into stock")
+    imp.add_argument("path")
+    imp.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    imp.add_argument("--dry-run", action="store_true", help="Validate and report without saving")
+    imp.add_argument("--rejects", help="Write rejected rows (with reasons) to this CSV")
+    imp.add_argument("--no-barcodes", action="store_true", help="Leave barcodes for new rows empty")
+    exp = sub.add_parser("export", help="Write stock to a CSV/XLSX/Parquet file")
+    exp.add_argument("path")
+    exp.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    args = parser.parse_args()
+    if args.command == "import":
+        report = import_stock(args.path, chunksize=args.chunksize, dry_run=args.dry_run, barcodes=not args.no_barcodes)
+        for batch in report["batches"]:
+            print(f"batch {batch['batch']}: {batch['rows']} rows, {batch['valid']} valid, {batch['rejected']} rejected")
+        print(f"inserted {report['inserted']}, merged {report['merged']}, rejected {report['rejected']}")
+        if args.rejects and report["rejected"]:
+            report["rejected_rows"].to_csv(args.rejects, index=False)
+    elif args.command == "export":
+        print(f"exported {export_stock(args.path, chunksize=args.chunksize)} rows to {args.path}")
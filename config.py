@@ -0,0 +1,80 @@
+import os
+
+# ---------- FILES & FOLDERS ----------
+STOCK_FILE = "stock.csv"
+ASSIGNMENT_FILE = "assignments.csv"
+# Append-only assign/return event log used by the CSV backend (seeded from ASSIGNMENT_FILE).
+ASSIGNMENT_LOG_FILE = "assignment_events.jsonl"
+DB_FILE = "inventory.db"
+BARCODE_FOLDER = "barcodes"
+IMAGE_FOLDER = "product_images"
+
+# ---------- STORAGE ----------
+# "csv" keeps the original stock.csv / assignments.csv files,
+# "sqlite" uses DB_FILE (run `python storage.py migrate` once to copy the CSVs over).
+STORAGE_BACKEND = os.environ.get("INVENTORY_BACKEND", "csv").lower()
+
+# ---------- ALERTS ----------
+LOW_STOCK_THRESHOLD = int(os.environ.get("INVENTORY_LOW_STOCK_THRESHOLD", "5"))
+# Open assignments older than this are counted as overdue on the dashboard.
+OVERDUE_DAYS = int(os.environ.get("INVENTORY_OVERDUE_DAYS", "30"))
+
+# ---------- HTTP API ----------
+# `python api.py` serves scanners and integrations; requests must send
+# "Authorization: Bearer <token>" when INVENTORY_API_TOKEN is set.
+API_HOST = os.environ.get("INVENTORY_API_HOST", "127.0.0.1")
+API_PORT = int(os.environ.get("INVENTORY_API_PORT", "8600"))
+API_TOKEN = os.environ.get("INVENTORY_API_TOKEN", "")
+
+# ---------- PERFORMANCE METRICS ----------
+# Timings of data functions and pages (see metrics.py). INVENTORY_PERF_LOG appends one JSON line per
+# timed call; INVENTORY_METRICS_FILE is rewritten in Prometheus text format (e.g. for node_exporter's
+# textfile collector) at most every INVENTORY_METRICS_INTERVAL seconds. `python api.py` also serves /metrics.
+PERF_LOG_FILE = os.environ.get("INVENTORY_PERF_LOG", "")
+METRICS_FILE = os.environ.get("INVENTORY_METRICS_FILE", "")
+METRICS_FILE_INTERVAL = float(os.environ.get("INVENTORY_METRICS_INTERVAL", "15"))
+
+# ---------- TYPED TABLES ----------
+# "pyarrow" parses CSVs with Arrow when pyarrow is installed, "c" forces the pandas parser.
+CSV_ENGINE = os.environ.get("INVENTORY_CSV_ENGINE", "pyarrow").lower()
+# Binary copy of each parsed table ("feather", "parquet" or "off"), reused until its source file changes.
+MIRROR_FORMAT = os.environ.get("INVENTORY_MIRROR", "feather").lower()
+# Smaller tables parse faster than a mirror is written.
+MIRROR_MIN_ROWS = int(os.environ.get("INVENTORY_MIRROR_MIN_ROWS", "20000"))
+
+# ---------- ASSIGNMENT ARCHIVE ----------
+# Returned assignments move out of the hot store (the ledger or the SQLite table) into one gzip-compressed
+# CSV per month under ARCHIVE_FOLDER (`python storage.py archive`, or the Dashboard's archive button).
+ARCHIVE_FOLDER = os.environ.get("INVENTORY_ARCHIVE_FOLDER", "assignment_archive")
+# Only assignments returned at least this many days ago are moved.
+ARCHIVE_AFTER_DAYS = int(os.environ.get("INVENTORY_ARCHIVE_AFTER_DAYS", "0"))
+# Archive months kept parsed in memory for the history viewer.
+ARCHIVE_CACHED_MONTHS = int(os.environ.get("INVENTORY_ARCHIVE_CACHED_MONTHS", "24"))
+
+# ---------- STOCK JOURNAL ----------
+# Every quantity or price change (and every delete) is appended to STOCK_JOURNAL_FILE by either backend.
+# Every JOURNAL_SNAPSHOT_EVERY entries the whole state is saved under JOURNAL_SNAPSHOT_FOLDER, so a past
+# state is rebuilt from the nearest snapshot plus at most that many entries.
+STOCK_JOURNAL_FILE = os.environ.get("INVENTORY_STOCK_JOURNAL", "stock_journal.jsonl")
+JOURNAL_SNAPSHOT_FOLDER = os.environ.get("INVENTORY_JOURNAL_SNAPSHOTS", "stock_snapshots")
+JOURNAL_SNAPSHOT_EVERY = int(os.environ.get("INVENTORY_JOURNAL_SNAPSHOT_EVERY", "5000"))
+
+# ---------- BACKGROUND JOBS ----------
+# Barcodes, image processing, exports and archival run as jobs from a persistent queue (JOB_QUEUE_FILE),
+# so pages return as soon as the stock row is saved. JOB_WORKERS threads in each app/API process run them;
+# with 0, start `python jobs.py work` separately. Staged uploads and finished exports live in JOB_FOLDER.
+JOB_QUEUE_FILE = os.environ.get("INVENTORY_JOB_QUEUE", "jobs.jsonl")
+JOB_FOLDER = os.environ.get("INVENTORY_JOB_FOLDER", "job_files")
+JOB_WORKERS = int(os.environ.get("INVENTORY_JOB_WORKERS", "2"))
+# Finished jobs kept in the queue file for the Jobs page.
+JOB_HISTORY = int(os.environ.get("INVENTORY_JOB_HISTORY", "200"))
+
+# ---------- REORDER FORECAST ----------
+# Assignment and return rates per item are exponentially weighted: an event counts half as much
+# after FORECAST_HALF_LIFE_DAYS. An item is due for reorder when what it will lose over the supplier
+# lead time (plus safety stock for REORDER_SERVICE_Z standard deviations) would empty it; the suggested
+# order then covers REORDER_COVER_DAYS more on top of the lead time.
+FORECAST_HALF_LIFE_DAYS = float(os.environ.get("INVENTORY_FORECAST_HALF_LIFE_DAYS", "30"))
+REORDER_LEAD_DAYS = float(os.environ.get("INVENTORY_REORDER_LEAD_DAYS", "14"))
+REORDER_COVER_DAYS = float(os.environ.get("INVENTORY_REORDER_COVER_DAYS", "30"))
+REORDER_SERVICE_Z = float(os.environ.get("INVENTORY_REORDER_SERVICE_Z", "1.65"))
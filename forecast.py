@@ -0,0 +1,166 @@
+import math
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from config import FORECAST_HALF_LIFE_DAYS, REORDER_COVER_DAYS, REORDER_LEAD_DAYS, REORDER_SERVICE_Z
+from ledger import RETURNED, normalize_id
+from schema import DATE_FORMAT
+
+EPOCH = datetime(1970, 1, 1)
+DAY_NS = 86_400 * 10 ** 9
+# A short history is averaged over at least this many days, so the first few assignments do not read as a flood.
+MIN_SPAN_DAYS = 7
+# Stock-out dates further out than this are left blank (days_left still says how far).
+MAX_FORECAST_DAYS = 3650
+ITEM_COLUMNS = ["id", "name", "company", "category", "quantity", "assigned_per_day", "returned_per_day", "net_per_day",
+                "days_left", "stockout_date", "reorder_point", "reorder", "reorder_qty"]
+CATEGORY_COLUMNS = ["category", "items", "quantity", "assigned_per_day", "returned_per_day", "net_per_day", "days_left",
+                    "to_reorder", "reorder_qty"]
+
+
+def _day(value):
+    # One date (datetime, or DATE_FORMAT text as rows from writes carry it) as days since the epoch; None if unset.
+    if not isinstance(value, datetime):
+        try:
+            value = datetime.strptime(str(value), DATE_FORMAT)
+        except ValueError:
+            return None
+    return (value - EPOCH).total_seconds() / 86_400
+
+
+def _days(values):
+    # A datetime column as days since the epoch, NaN where missing.
+    missing = values.isna().to_numpy()
+    days = values.to_numpy("datetime64[ns]").astype("int64") / DAY_NS
+    days[missing] = np.nan
+    return days
+
+
+# ---------- DEMAND RATES ----------
+# Units assigned and returned per day for each stock ID (normalized like the ledger, so "00123" is "123"),
+# as exponentially weighted sums: an event on day t adds exp((t - origin) / tau) to its item. Reading the
+# rates "now" only rescales the sums, and a new assignment or return is one dict update, so the model is
+# built from the whole history once and then follows the writes (storage._patch_demand).
+class DemandRates:
+    def __init__(self, half_life=FORECAST_HALF_LIFE_DAYS, origin=0.0, start=None):
+        self.tau = half_life / math.log(2)
+        self.origin = origin
+        # First assignment on record: rates are averaged over the history there is, not over all time.
+        self.start = start
+        self.assigned = {}
+        self.returned = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_history(cls, history, half_life=FORECAST_HALF_LIFE_DAYS, now=None):
+        # history: typed assignment frame (stock_id, date, status, return_date), hot store and archive together.
+        given = _days(history['date'])
+        rates = cls(half_life, _day(now or datetime.now()),
+                    float(np.nanmin(given)) if (~np.isnan(given)).any() else None)
+        # Normalized once per distinct stock ID rather than once per row.
+        codes, uniques = pd.factorize(history['stock_id'].astype(str))
+        keys, inverse = np.unique(np.array([normalize_id(value) for value in uniques], dtype=object), return_inverse=True)
+        item = inverse.reshape(-1)[codes] if len(codes) else np.zeros(0, dtype=int)
+        back = np.where((history['status'] == RETURNED).to_numpy(dtype=bool), _days(history['return_date']), np.nan)
+        for target, days in ((rates.assigned, given), (rates.returned, back)):
+            # Dates after now (typos, clock skew) have not happened yet.
+            known = days <= rates.origin
+            sums = np.bincount(item[known], weights=np.exp((days[known] - rates.origin) / rates.tau), minlength=len(keys))
+            target.update((key, weight) for key, weight in zip(keys.tolist(), sums.tolist()) if weight)
+        return rates
+
+    # ----- incremental updates -----
+    def _events(self, row):
+        # (counter, stock key, day) for everything one assignment row contributes.
+        if row is None:
+            return []
+        key = normalize_id(row.get('stock_id', ""))
+        events = []
+        given = _day(row.get('date', ""))
+        if given is not None:
+            events.append((self.assigned, key, given))
+        back = _day(row.get('return_date', "")) if row.get('status') == RETURNED else None
+        if back is not None:
+            events.append((self.returned, key, back))
+        return events
+
+    def assignment_changed(self, before, after):
+        with self._lock:
+            removed, added = self._events(before), self._events(after)
+            if removed == added:
+                return
+            for sign, events in ((-1, removed), (1, added)):
+                for counter, key, day in events:
+                    counter[key] = counter.get(key, 0.0) + sign * math.exp((day - self.origin) / self.tau)
+            for counter, _, day in added:
+                if counter is self.assigned and (self.start is None or day < self.start):
+                    self.start = day
+
+    # ----- reads -----
+    def rates(self, now=None):
+        # Frame indexed by normalized stock ID: assigned_per_day, returned_per_day.
+        now = _day(now or datetime.now())
+        with self._lock:
+            keys = sorted(set(self.assigned) | set(self.returned))
+            assigned = np.array([self.assigned.get(key, 0.0) for key in keys])
+            returned = np.array([self.returned.get(key, 0.0) for key in keys])
+            start = self.start
+        # The total weight a steady one-per-day item would have collected since the first assignment.
+        span = 0.0 if start is None else max(now - start, MIN_SPAN_DAYS)
+        exposure = self.tau * -math.expm1(-span / self.tau)
+        scale = math.exp((self.origin - now) / self.tau) / exposure if exposure > 0 else 0.0
+        return pd.DataFrame({"assigned_per_day": np.clip(assigned * scale, 0, None),
+                             "returned_per_day": np.clip(returned * scale, 0, None)},
+                            index=pd.Index(keys, name="key", dtype=object))
+
+
+# ---------- FORECAST ----------
+def forecast_items(stock_df, rates, lead_days=REORDER_LEAD_DAYS, cover_days=REORDER_COVER_DAYS, z=REORDER_SERVICE_Z,
+                   now=None):
+    # One row per stock ID: how fast it goes, when it runs out at that pace, and what to reorder.
+    # Net use is assigned minus returned; safety stock treats both as Poisson over the lead time.
+    items = stock_df.groupby('id', sort=False, observed=True).agg(
+        name=("name", "first"), company=("company", "first"), category=("category", "first"),
+        quantity=("quantity", "sum")).reset_index()
+    matched = rates.reindex([normalize_id(stock_id) for stock_id in items['id']]).fillna(0.0)
+    assigned = matched['assigned_per_day'].to_numpy()
+    returned = matched['returned_per_day'].to_numpy()
+    quantity = items['quantity'].to_numpy(dtype=float)
+    net = assigned - returned
+    using = np.clip(net, 0, None)
+    days_left = np.divide(np.clip(quantity, 0, None), net, out=np.full(len(items), np.nan), where=net > 0)
+    safety = z * np.sqrt((assigned + returned) * lead_days)
+    reorder_point = using * lead_days + safety
+    due = quantity < reorder_point
+    items['assigned_per_day'] = assigned
+    items['returned_per_day'] = returned
+    items['net_per_day'] = net
+    items['days_left'] = days_left
+    horizon = np.where(days_left <= MAX_FORECAST_DAYS, days_left, np.nan)
+    items['stockout_date'] = pd.Timestamp(now or datetime.now()).floor("min") + pd.to_timedelta(horizon, unit="D")
+    items['reorder_point'] = np.ceil(reorder_point).astype(int)
+    items['reorder'] = due
+    items['reorder_qty'] = np.where(due, np.ceil(using * (lead_days + cover_days) + safety - quantity), 0).astype(int)
+    # Soonest to run out first; items that are not running down keep their catalogue order at the end.
+    return items[ITEM_COLUMNS].sort_values(["days_left", "reorder_qty"], ascending=[True, False], na_position="last",
+                                           kind="stable", ignore_index=True)
+
+
+def forecast_categories(items):
+    grouped = items.groupby("category", observed=True).agg(
+        items=("id", "size"), quantity=("quantity", "sum"), assigned_per_day=("assigned_per_day", "sum"),
+        returned_per_day=("returned_per_day", "sum"), net_per_day=("net_per_day", "sum"), to_reorder=("reorder", "sum"),
+        reorder_qty=("reorder_qty", "sum")).reset_index()
+    net = grouped['net_per_day'].to_numpy()
+    grouped['days_left'] = np.divide(np.clip(grouped['quantity'].to_numpy(dtype=float), 0, None), net,
+                                     out=np.full(len(grouped), np.nan), where=net > 0)
+    return grouped[CATEGORY_COLUMNS].sort_values("days_left", na_position="last", kind="stable", ignore_index=True)
+
+
+def forecast_csv(items, path=None):
+    # The forecast export (text when path is None), dates to the minute as elsewhere in the app.
+    return items.to_csv(path, index=False, date_format=DATE_FORMAT)
+
@@ -0,0 +1,130 @@
+import argparse
+import hashlib
+import io
+import os
+import threading
+from functools import lru_cache
+
+from PIL import Image, ImageOps
+
+from config import IMAGE_FOLDER
+from metrics import count, timed
+
+THUMBNAIL_FOLDER = os.path.join(IMAGE_FOLDER, "thumbs")
+# Longest side of the stored original and of the thumbnail the pages show.
+MAX_IMAGE_SIZE = 1600
+THUMBNAIL_SIZE = 400
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp")
+
+
+# ---------- ENCODING ----------
+def _encode(img, fmt, quality=85):
+    buffer = io.BytesIO()
+    if fmt == "JPEG" and img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    elif fmt == "WEBP" and img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGBA")
+    if fmt == "PNG":
+        img.save(buffer, fmt, optimize=True)
+    else:
+        img.save(buffer, fmt, quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+def _write(path, data):
+    # Written beside the final path and moved into place: the exists() checks never see a truncated file.
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _capped(img, size):
+    img = ImageOps.exif_transpose(img)
+    img.thumbnail((size, size))
+    return img
+
+
+def thumbnail_path(image_path):
+    return os.path.join(THUMBNAIL_FOLDER, os.path.basename(image_path) + ".webp")
+
+
+def make_thumbnail(image_path):
+    thumb = thumbnail_path(image_path)
+    os.makedirs(THUMBNAIL_FOLDER, exist_ok=True)
+    with Image.open(image_path) as img:
+        data = _encode(_capped(img, THUMBNAIL_SIZE), "WEBP", quality=80)
+    _write(thumb, data)
+    return thumb
+
+
+# ---------- UPLOADS ----------
+@timed()
+def save_image(uploaded_file):
+    # Stores a size-capped copy named by content hash (identical uploads share one file)
+    # plus a WebP thumbnail, and returns the path kept in the stock row.
+    if uploaded_file is None:
+        return ""
+    data = uploaded_file.getvalue() if hasattr(uploaded_file, "getvalue") else uploaded_file.read()
+    digest = hashlib.sha256(data).hexdigest()[:20]
+    with Image.open(io.BytesIO(data)) as img:
+        fmt = "PNG" if img.format == "PNG" else "JPEG"
+        img_path = os.path.join(IMAGE_FOLDER, f"{digest}.{'png' if fmt == 'PNG' else 'jpg'}")
+        if not os.path.exists(img_path):
+            os.makedirs(IMAGE_FOLDER, exist_ok=True)
+            count("images_stored")
+            _write(img_path, _encode(_capped(img, MAX_IMAGE_SIZE), fmt))
+    if not os.path.exists(thumbnail_path(img_path)):
+        make_thumbnail(img_path)
+    return img_path
+
+
+# ---------- SERVING ----------
+@lru_cache(maxsize=256)
+def _thumbnail_bytes(image_path, mtime_ns):
+    thumb = thumbnail_path(image_path)
+    if not os.path.exists(thumb) or os.stat(thumb).st_mtime_ns < mtime_ns:
+        make_thumbnail(image_path)
+    with open(thumb, "rb") as f:
+        return f.read()
+
+
+def thumbnail_bytes(image_path):
+    # Thumbnail for st.image; reruns are served from memory until the source file changes.
+    # Returns None when the path is empty or missing.
+    if not isinstance(image_path, str) or not image_path.strip() or not os.path.exists(image_path):
+        return None
+    return _thumbnail_bytes(image_path, os.stat(image_path).st_mtime_ns)
+
+
+# ---------- BACKFILL ----------
+def backfill(folder=IMAGE_FOLDER):
+    # Caps oversized originals in place (same file name, so stock rows stay valid) and builds missing thumbnails.
+    counts = {"images": 0, "resized": 0, "thumbnails": 0}
+    for entry in sorted(os.scandir(folder), key=lambda e: e.name):
+        if not entry.is_file() or not entry.name.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        counts["images"] += 1
+        with Image.open(entry.path) as img:
+            oversized = max(img.size) > MAX_IMAGE_SIZE
+            if oversized:
+                fmt = img.format if img.format in ("PNG", "JPEG", "WEBP") else "PNG"
+                encoded = _encode(_capped(img, MAX_IMAGE_SIZE), fmt)
+        if oversized:
+            _write(entry.path, encoded)
+            counts["resized"] += 1
+        thumb = thumbnail_path(entry.path)
+        if oversized or not os.path.exists(thumb):
+            make_thumbnail(entry.path)
+            counts["thumbnails"] += 1
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cap product images and build their thumbnails")
+    parser.add_argument("--folder", default=IMAGE_FOLDER)
+    args = parser.parse_args()
+    counts = backfill(args.folder)
+    print(f"{counts['images']} images, {counts['resized']} resized, {counts['thumbnails']} thumbnails written")
@@ -0,0 +1,357 @@
+import argparse
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from config import JOB_FOLDER, JOB_HISTORY, JOB_QUEUE_FILE, JOB_WORKERS
+from ledger import locked_log
+from metrics import count, timer
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+AT_FORMAT = "%Y-%m-%d %H:%M:%S"
+# How long an idle worker sleeps before looking for jobs queued by other processes.
+POLL_SECONDS = 1.0
+UPLOAD_FOLDER = os.path.join(JOB_FOLDER, "uploads")
+EXPORT_FOLDER = os.path.join(JOB_FOLDER, "exports")
+# host:pid of this process, recorded on the jobs it runs so a restart can find what it left behind.
+WORKER = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _now():
+    return datetime.now().strftime(AT_FORMAT)
+
+
+def _dead(worker):
+    # Only a process on this host can be checked; os.kill(pid, 0) would terminate it on Windows.
+    host, _, pid = worker.rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit() or os.name == "nt":
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except OSError:
+        return False
+    return False
+
+
+# ---------- HANDLERS ----------
+# kind -> function(**args) returning a JSON-able result. Libraries are imported inside each handler:
+# every page reads the queue (sidebar status), so this module has to stay as light as ledger.py.
+HANDLERS = {}
+
+
+def handler(kind):
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+    return register
+
+
+def stage_upload(data, name):
+    # Keeps an uploaded file on disk until its job has processed it; returns the staged path.
+    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+    path = os.path.join(UPLOAD_FOLDER, f"{uuid.uuid4().hex}-{os.path.basename(name or 'upload')}")
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+@handler("barcode")
+def render_barcode(stock_id):
+    from barcode_service import generate_barcode
+    from storage import update_stock
+
+    path = generate_barcode(stock_id)
+    # An asset-only write: the row version stays, so pages holding it are not refused (storage.ASSET_COLUMNS).
+    update_stock(stock_id, {"barcode": path})
+    return {"barcode": path}
+
+
+@handler("image")
+def process_image(stock_id, upload):
+    # The staged upload is removed only once the stored image is in the stock row, so a failed job can be retried.
+    from image_pipeline import save_image
+    from storage import update_stock
+
+    with open(upload, "rb") as f:
+        path = save_image(f)
+    update_stock(stock_id, {"image": path})
+    os.remove(upload)
+    return {"image": path}
+
+
+@handler("export")
+def export(fmt):
+    from bulk_io import export_stock
+
+    os.makedirs(EXPORT_FOLDER, exist_ok=True)
+    path = os.path.join(EXPORT_FOLDER, f"stock-{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}.{fmt}")
+    # Written under a temporary name: a download never sees half a file.
+    tmp_path = path + ".tmp"
+    rows = export_stock(tmp_path, fmt)
+    os.replace(tmp_path, path)
+    return {"path": path, "rows": rows}
+
+
+@handler("archive")
+def archive(older_than_days):
+    from storage import archive_assignments
+
+    return {"moved": archive_assignments(older_than_days)}
+
+
+def _files(job):
+    # Files on disk that belong to a job: its staged upload and what it wrote under JOB_FOLDER.
+    paths = [job["args"].get("upload")]
+    if isinstance(job["result"], dict):
+        paths.append(job["result"].get("path"))
+    return [path for path in paths if path]
+
+
+# ---------- JOB QUEUE ----------
+# Jobs are kept as an append-only JSON-lines log, replayed the same way as the assignment ledger:
+#   {"op": "submit", "id": 7, "job": {...}}      new job (or a compacted record)
+#   {"op": "update", "id": 7, "fields": {...}}   claimed, finished, failed or put back in the queue
+#   {"op": "meta", "next_id": 12}                first line of a compacted log
+# Any number of processes can submit and work: claiming a job is an append made with the log locked.
+class JobQueue:
+    def __init__(self, path=JOB_QUEUE_FILE, history=JOB_HISTORY):
+        self.path = path
+        self.history = history
+        self._lock = threading.Lock()
+        self._wake = threading.Condition()
+        self._threads = []
+        self._reset()
+        with self._lock:
+            self._sync()
+
+    # ----- replay -----
+    def _reset(self):
+        self._jobs = {}
+        self._next_id = 1
+        self._offset = 0
+        self._inode = None
+
+    def _sync(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            self._reset()
+            return
+        if st.st_ino != self._inode or st.st_size < self._offset:
+            self._reset()
+            self._inode = st.st_ino
+        if st.st_size == self._offset:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            data = f.read()
+        complete = data[:data.rfind(b"\n") + 1]
+        for line in complete.splitlines():
+            if line.strip():
+                self._apply(json.loads(line))
+        self._offset += len(complete)
+
+    def _apply(self, event):
+        op = event["op"]
+        if op == "meta":
+            self._next_id = max(self._next_id, event["next_id"])
+            return
+        job_id = event["id"]
+        if op == "submit":
+            self._jobs[job_id] = {"id": job_id, "status": QUEUED, "submitted": "", "started": "", "finished": "",
+                                  "worker": "", "result": None, "error": "", **event["job"]}
+            self._next_id = max(self._next_id, job_id + 1)
+        elif job_id in self._jobs:
+            self._jobs[job_id].update(event["fields"])
+
+    def _append(self, make_events):
+        # Called with self._lock held; make_events() runs with the log locked and caught up, and may return [].
+        with locked_log(self.path) as f:
+            self._sync()
+            events = make_events()
+            if events:
+                f.write("".join(json.dumps(event, ensure_ascii=False) + "\n" for event in events).encode("utf-8"))
+                f.flush()
+                os.fsync(f.fileno())
+        self._sync()
+        return events
+
+    # ----- writes -----
+    def submit(self, kind, **args):
+        if kind not in HANDLERS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job = {"kind": kind, "args": args, "status": QUEUED, "submitted": _now()}
+        with self._lock:
+            event = self._append(lambda: [{"op": "submit", "id": self._next_id, "job": job}])[0]
+        count("jobs_submitted")
+        with self._wake:
+            self._wake.notify()
+        return event["id"]
+
+    def retry(self, job_id):
+        # A failed job runs again as a new job with the same arguments.
+        job = self.get(job_id)
+        if job is None or job["status"] != FAILED:
+            raise ValueError(f"Job {job_id} has not failed.")
+        return self.submit(job["kind"], **job["args"])
+
+    def claim(self):
+        # The oldest queued job, marked as running here; None when there is nothing to do.
+        def make_events():
+            job_id = next((job_id for job_id, job in self._jobs.items() if job["status"] == QUEUED), None)
+            if job_id is None:
+                return []
+            return [{"op": "update", "id": job_id, "fields": {"status": RUNNING, "worker": WORKER, "started": _now()}}]
+        with self._lock:
+            # Idle polls only read the log; the file lock is taken once there is something to claim.
+            self._sync()
+            if not any(job["status"] == QUEUED for job in self._jobs.values()):
+                return None
+            events = self._append(make_events)
+            return dict(self._jobs[events[0]["id"]]) if events else None
+
+    def finish(self, job_id, result=None, error=""):
+        fields = {"status": FAILED if error else DONE, "finished": _now(), "result": result, "error": error}
+        with self._lock:
+            self._append(lambda: [{"op": "update", "id": job_id, "fields": fields}])
+            finished = sum(job["status"] in (DONE, FAILED) for job in self._jobs.values())
+        if finished > 2 * self.history:
+            self.compact()
+
+    def recover(self):
+        # Jobs left running by a worker process on this host that no longer exists go back in the queue.
+        def make_events():
+            return [{"op": "update", "id": job_id, "fields": {"status": QUEUED, "worker": "", "started": ""}}
+                    for job_id, job in self._jobs.items() if job["status"] == RUNNING and _dead(job["worker"])]
+        with self._lock:
+            return len(self._append(make_events))
+
+    def compact(self):
+        # Keeps every unfinished job and the newest `history` finished ones; ids are never reused.
+        # Files the dropped jobs left behind (exports, staged uploads of failed image jobs) go with them.
+        with self._lock:
+            with locked_log(self.path):
+                self._sync()
+                finished = [job_id for job_id, job in self._jobs.items() if job["status"] in (DONE, FAILED)]
+                dropped = set(finished[:max(len(finished) - self.history, 0)])
+                tmp_path = self.path + ".tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.write(json.dumps({"op": "meta", "next_id": self._next_id}) + "\n")
+                    for job_id, job in self._jobs.items():
+                        if job_id not in dropped:
+                            record = {k: v for k, v in job.items() if k != "id"}
+                            f.write(json.dumps({"op": "submit", "id": job_id, "job": record}, ensure_ascii=False) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+                kept = {path for job_id, job in self._jobs.items() if job_id not in dropped for path in _files(job)}
+                for path in {path for job_id in dropped for path in _files(self._jobs[job_id])} - kept:
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+            self._reset()
+            self._sync()
+
+    # ----- reads -----
+    def get(self, job_id):
+        with self._lock:
+            self._sync()
+            job = self._jobs.get(int(job_id))
+            return None if job is None else dict(job)
+
+    def recent(self, limit=50, kinds=None):
+        # Newest first.
+        with self._lock:
+            self._sync()
+            jobs = [dict(job) for job in reversed(self._jobs.values()) if kinds is None or job["kind"] in kinds]
+        return jobs[:limit]
+
+    def counts(self):
+        with self._lock:
+            self._sync()
+            counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+            for job in self._jobs.values():
+                counts[job["status"]] += 1
+        return counts
+
+    # ----- workers -----
+    def run(self, job):
+        try:
+            with timer(f"job.{job['kind']}"):
+                result = HANDLERS[job["kind"]](**job["args"])
+        except Exception as e:  # recorded on the job; the worker moves on to the next one
+            count("jobs_failed")
+            self.finish(job["id"], error=f"{type(e).__name__}: {e}")
+        else:
+            self.finish(job["id"], result=result)
+
+    def _work(self):
+        while True:
+            job = self.claim()
+            if job is None:
+                with self._wake:
+                    self._wake.wait(POLL_SECONDS)
+                continue
+            self.run(job)
+
+    def start(self, workers=JOB_WORKERS):
+        # Daemon threads, so they never keep a process alive; calling start again does nothing.
+        with self._wake:
+            if self._threads:
+                return
+            self.recover()
+            for number in range(workers):
+                thread = threading.Thread(target=self._work, name=f"job-worker-{number}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    # One queue, and its JOB_WORKERS worker threads, per process (like storage.get_backend()).
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue()
+            if JOB_WORKERS > 0:
+                _queue.start(JOB_WORKERS)
+        return _queue
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Background job queue")
+    sub = parser.add_subparsers(dest="command", required=True)
+    work = sub.add_parser("work", help="Run queued jobs until interrupted")
+    work.add_argument("--workers", type=int, default=max(JOB_WORKERS, 1))
+    listing = sub.add_parser("list", help="Show recent jobs")
+    listing.add_argument("--limit", type=int, default=20)
+    sub.add_parser("compact", help="Drop old finished jobs from the queue file")
+    args = parser.parse_args()
+    queue = JobQueue()
+    if args.command == "work":
+        queue.start(args.workers)
+        print(f"Working with {args.workers} thread(s) on {queue.path}; Ctrl+C to stop")
+        try:
+            while True:
+                time.sleep(60)
+        except KeyboardInterrupt:
+            pass
+    elif args.command == "list":
+        for job in queue.recent(args.limit):
+            print(f"{job['id']:>6}  {job['kind']:<8}{job['status']:<9}{job['submitted']}  {job['error'] or job['result'] or ''}")
+    elif args.command == "compact":
+        queue.compact()
+        print(f"{sum(queue.counts().values())} job(s) kept")
@@ -0,0 +1,344 @@
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, time, timedelta
+
+import pandas as pd
+
+from config import JOURNAL_SNAPSHOT_EVERY, JOURNAL_SNAPSHOT_FOLDER, STOCK_JOURNAL_FILE
+from ledger import locked_log
+from metrics import count, timed
+from schema import file_signature, read_csv, typed
+
+try:
+    import pyarrow as pa
+    import pyarrow.json as pa_json
+except ImportError:  # Entries are parsed one json.loads per line.
+    pa = None
+
+AT_FORMAT = "%Y-%m-%d %H:%M:%S"
+# What the journal knows per stock ID: its rows' summed quantity and the first row's price.
+STATE_SCHEMA = {"id": "text", "name": "text", "company": "category", "category": "category", "quantity": "int",
+                "price": "float"}
+STATE_COLUMNS = list(STATE_SCHEMA)
+ENTRY_COLUMNS = ["seq", "at", *STATE_COLUMNS, "delta", "deleted", "reason"]
+if pa is not None:
+    ENTRY_ARROW_SCHEMA = pa.schema([
+        ("seq", pa.int64()), ("at", pa.string()), ("id", pa.string()), ("name", pa.string()), ("company", pa.string()),
+        ("category", pa.string()), ("quantity", pa.int64()), ("price", pa.float64()), ("delta", pa.int64()),
+        ("deleted", pa.bool_()), ("reason", pa.string()),
+    ])
+SNAPSHOT_MANIFEST = "snapshots.jsonl"
+CACHED_SNAPSHOTS = 4
+# zlib level: see archive.py.
+COMPRESS_LEVEL = 6
+
+
+def _at(when, end=True):
+    # Journal time text for a datetime; a bare date means the end of that day (its start with end=False).
+    if when is None or isinstance(when, str):
+        return when
+    if not isinstance(when, datetime):
+        when = datetime.combine(when, time.max if end else time.min)
+    return when.strftime(AT_FORMAT)
+
+
+def _before(at):
+    # The journal time one second earlier: "up to and including" becomes "strictly before".
+    return (datetime.strptime(at, AT_FORMAT) - timedelta(seconds=1)).strftime(AT_FORMAT)
+
+
+def _empty_state():
+    return typed(pd.DataFrame(columns=STATE_COLUMNS), STATE_SCHEMA)
+
+
+def _empty_entries():
+    return pd.DataFrame(columns=ENTRY_COLUMNS)
+
+
+def state_rows(df):
+    # (id, name, company, category, quantity, price) tuples of a stock frame, the form movements() compares.
+    return zip(*(df[col].tolist() for col in STATE_COLUMNS))
+
+
+def _per_id(rows):
+    # {id: [name, company, category, quantity, price]} with quantities summed over rows sharing an ID.
+    # Plain Python: writes compare a handful of rows, where pandas' per-call overhead would dominate.
+    found = {}
+    for stock_id, name, company, category, quantity, price in rows:
+        item = found.get(stock_id)
+        if item is None:
+            found[stock_id] = [str(name), str(company), str(category), int(quantity), float(price)]
+        else:
+            item[3] += int(quantity)
+    return found
+
+
+def stock_state(df):
+    # A stock frame in journal form: one row per ID.
+    return typed(pd.DataFrame([[stock_id, *item] for stock_id, item in _per_id(state_rows(df)).items()],
+                              columns=STATE_COLUMNS),
+                 STATE_SCHEMA)
+
+
+def movements(before, after):
+    # Journal entries (without seq/at/reason) for every stock ID whose quantity or price differs between two
+    # sets of state_rows, including IDs that appear (added) or disappear (deleted).
+    old, new = _per_id(before), _per_id(after)
+    entries = []
+    for stock_id in [*new, *(stock_id for stock_id in old if stock_id not in new)]:
+        was, now = old.get(stock_id), new.get(stock_id)
+        if now is None:
+            name, company, category, quantity, price = was
+            entries.append({"id": stock_id, "name": name, "company": company, "category": category, "quantity": 0,
+                            "price": price, "delta": -quantity, "deleted": True})
+        elif was is None or was[3:] != now[3:]:
+            name, company, category, quantity, price = now
+            entries.append({"id": stock_id, "name": name, "company": company, "category": category,
+                            "quantity": quantity, "price": price, "delta": quantity - (was[3] if was else 0),
+                            "deleted": False})
+    return entries
+
+
+def _parse(data):
+    # Complete journal lines as a frame; pyarrow's JSON reader is several times faster than a loop of json.loads.
+    if pa is not None and data:
+        options = pa_json.ParseOptions(explicit_schema=ENTRY_ARROW_SCHEMA)
+        return pa_json.read_json(io.BytesIO(data), parse_options=options).to_pandas()[ENTRY_COLUMNS]
+    return pd.DataFrame.from_records([json.loads(line) for line in data.splitlines() if line.strip()],
+                                     columns=ENTRY_COLUMNS)
+
+
+def _replay_onto(state, entries):
+    # The last entry per ID replaces what the state held; deleted IDs drop out.
+    if entries.empty:
+        return state
+    latest = entries.drop_duplicates("id", keep="last")
+    kept = state[~state['id'].isin(latest['id'])]
+    return typed(pd.concat([kept, latest.loc[~latest['deleted'].astype(bool), STATE_COLUMNS]], ignore_index=True),
+                 STATE_SCHEMA)
+
+
+# ---------- STOCK JOURNAL ----------
+# Every change to an item's quantity or price, as one JSON line written by the backends:
+#   {"seq": 41, "at": "2025-03-02 14:05:11", "id": "007", "name": ..., "company": ..., "category": ...,
+#    "quantity": 4, "price": 10.0, "delta": -1, "deleted": false, "reason": "assign"}
+# quantity and price are the values after the change, so an item's state at any moment is its last entry
+# up to then. Every snapshot_every entries the whole state goes to a gzip-compressed snapshot, listed in
+# stock_snapshots/snapshots.jsonl with its seq, time and byte offset in the journal; rebuilding a past state
+# loads the newest snapshot taken before it and replays only the entries between it and the next one.
+# The first snapshot is a baseline of the stock when the journal started: nothing before it can be rebuilt.
+class StockJournal:
+    def __init__(self, path=STOCK_JOURNAL_FILE, snapshot_folder=JOURNAL_SNAPSHOT_FOLDER,
+                 snapshot_every=JOURNAL_SNAPSHOT_EVERY):
+        self.path = path
+        self.snapshot_folder = snapshot_folder
+        self.manifest = os.path.join(snapshot_folder, SNAPSHOT_MANIFEST)
+        self.snapshot_every = max(1, snapshot_every)
+        self._lock = threading.Lock()
+        self._cache_lock = threading.Lock()
+        self._manifest = (None, [])
+        self._states = OrderedDict()
+
+    def start(self, load_stock):
+        # Called by the backends on startup; load_stock() is only read for a journal without snapshots.
+        if self.snapshots():
+            return
+        with self._lock, locked_log(self.path):
+            if not self.snapshots():
+                seq, offset, _ = self._tail()
+                self._write_snapshot({"seq": seq, "offset": offset, "at": datetime.now().strftime(AT_FORMAT)},
+                                     stock_state(load_stock()))
+
+    # ----- writes -----
+    def record(self, entries, reason):
+        # Called while the backend's write lock (or transaction) is held, so entries land in commit order.
+        if not entries:
+            return
+        at = datetime.now().strftime(AT_FORMAT)
+        with self._lock, locked_log(self.path) as f:
+            seq, _, _ = self._tail()
+            lines = [json.dumps({"seq": seq + i, "at": at, **entry, "reason": reason}, ensure_ascii=False)
+                     for i, entry in enumerate(entries, 1)]
+            f.write(("\n".join(lines) + "\n").encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+        count("journal_entries", len(entries))
+        if (seq + len(entries)) // self.snapshot_every > seq // self.snapshot_every:
+            self.snapshot()
+
+    @timed("journal.snapshot")
+    def snapshot(self):
+        # Saves the current state: the newest snapshot plus every entry after it. Appends wait meanwhile.
+        with self._lock, locked_log(self.path):
+            seq, offset, at = self._tail()
+            snapshots = self.snapshots()
+            if not snapshots or snapshots[-1]["seq"] >= seq:
+                return
+            base = snapshots[-1]
+            state = _replay_onto(self._read_snapshot(base), self._read(base["offset"], offset))
+            self._write_snapshot({"seq": seq, "offset": offset, "at": at}, state)
+
+    def _write_snapshot(self, mark, state):
+        os.makedirs(self.snapshot_folder, exist_ok=True)
+        name = f"snapshot-{mark['seq']:012d}.csv.gz"
+        path = os.path.join(self.snapshot_folder, name)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            state.to_csv(f, index=False, compression={"method": "gzip", "compresslevel": COMPRESS_LEVEL})
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        with locked_log(self.manifest) as f:
+            f.write((json.dumps({**mark, "file": name}) + "\n").encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+
+    # ----- reads -----
+    def version(self):
+        # Changes with every append; reads only depend on the journal's contents.
+        return file_signature(self.path)
+
+    def _tail(self):
+        # (seq, end offset, at) of the last complete entry; a journal line is far shorter than the block read.
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            return 0, 0, None
+        start = max(0, size - 65536)
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            data = f.read()
+        end = data.rfind(b"\n")
+        if end < 0:
+            return 0, 0, None
+        entry = json.loads(data[data.rfind(b"\n", 0, end) + 1:end])
+        return entry["seq"], start + end + 1, entry["at"]
+
+    def snapshots(self):
+        # Manifest records oldest first; a snapshot written twice by racing processes is listed once.
+        signature = file_signature(self.manifest)
+        if signature is None:
+            return []
+        if self._manifest[0] != signature:
+            with open(self.manifest, "rb") as f:
+                records = {}
+                for line in f.read().splitlines():
+                    if line.strip():
+                        record = json.loads(line)
+                        records[record["seq"]] = record
+            self._manifest = (signature, [records[seq] for seq in sorted(records)])
+        return self._manifest[1]
+
+    def _read_snapshot(self, mark):
+        if mark is None:
+            return _empty_state()
+        with self._cache_lock:
+            state = self._states.get(mark["seq"])
+            if state is not None:
+                self._states.move_to_end(mark["seq"])
+                return state
+        state = read_csv(os.path.join(self.snapshot_folder, mark["file"]), STATE_SCHEMA)
+        count("journal_snapshots_read")
+        with self._cache_lock:
+            self._states[mark["seq"]] = state
+            while len(self._states) > CACHED_SNAPSHOTS:
+                self._states.popitem(last=False)
+        return state
+
+    def _read(self, offset, stop=None, until=None):
+        # Entries between two byte offsets (stop None = end of file) dated until or earlier.
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                data = f.read() if stop is None else f.read(max(0, stop - offset))
+        except FileNotFoundError:
+            data = b""
+        df = _parse(data[:data.rfind(b"\n") + 1])
+        if until is not None:
+            df = df[df['at'] <= until]
+        count("journal_entries_replayed", len(df))
+        return df
+
+    def _base(self, until):
+        # The newest snapshot taken at or before `until` (None = the latest); None before the baseline.
+        found = [mark for mark in self.snapshots() if until is None or mark["at"] <= until]
+        return found[-1] if found else None
+
+    def _stop(self, until):
+        # Byte offset of the first snapshot taken after `until`: no entry up to `until` lies beyond it.
+        later = [mark for mark in self.snapshots() if until is not None and mark["at"] > until]
+        return later[0]["offset"] if later else None
+
+    @timed("journal.state_at")
+    def state_at(self, when=None):
+        # Every stock ID with its quantity and price as of `when` (a datetime, or a date meaning its end;
+        # None = now). Empty before the baseline.
+        until = _at(when)
+        base = self._base(until)
+        if base is None:
+            return _empty_state()
+        return _replay_onto(self._read_snapshot(base), self._read(base["offset"], self._stop(until), until))
+
+    @timed("journal.entries")
+    def entries(self, start=None, end=None, ids=None):
+        # Journal entries dated start..end (datetimes or dates, inclusive; None leaves that side open),
+        # optionally only those of some stock IDs, with "at" parsed.
+        since, until = _at(start, end=False), _at(end)
+        base = None if since is None else self._base(_before(since))
+        df = self._read(0 if base is None else base["offset"], self._stop(until), until)
+        if since is not None:
+            df = df[df['at'] >= since]
+        if ids is not None:
+            df = df[df['id'].isin([str(stock_id) for stock_id in ids])]
+        return df.assign(at=pd.to_datetime(df['at'], format=AT_FORMAT)).reset_index(drop=True)
+
+    @timed("journal.levels")
+    def levels(self, start, end, freq="D", by="id", ids=None, categories=None):
+        # Quantity on hand at the end of each period (a pandas period frequency: "D", "W", "M") from start (or the
+        # baseline, if later) to end, one column per stock ID (by="id") or per category (by="category"); ids / categories keep only those.
+        # Each entry's change is taken from the quantities recorded, not its "delta", so entries from
+        # different writers (e.g. a migration re-saving the same rows) cannot drift the totals.
+        periods = pd.period_range(pd.Timestamp(start), pd.Timestamp(end), freq=freq)
+        opening_at = _before(periods[0].start_time.strftime(AT_FORMAT))
+        until = periods[-1].end_time.strftime(AT_FORMAT)
+        stop = self._stop(until)
+        base = self._base(opening_at)
+        snapshots = self.snapshots()
+        if base is None:
+            # The range reaches back past the baseline, whose rows count as entries made when it was taken.
+            opening = _empty_state()
+            moves = _empty_entries()
+            if snapshots:
+                baseline = self._read_snapshot(snapshots[0]).assign(at=snapshots[0]["at"], deleted=False)
+                moves = pd.concat([baseline, self._read(snapshots[0]["offset"], stop, until)], ignore_index=True)
+        else:
+            moves = self._read(base["offset"], stop, until)
+            opening = _replay_onto(self._read_snapshot(base), moves[moves['at'] <= opening_at])
+            moves = moves[moves['at'] > opening_at]
+        if ids is not None:
+            ids = [str(stock_id) for stock_id in ids]
+            opening, moves = opening[opening['id'].isin(ids)], moves[moves['id'].isin(ids)]
+        if categories is not None:
+            categories = [str(category) for category in categories]
+            opening = opening[opening['category'].astype(str).isin(categories)]
+            moves = moves[moves['category'].astype(str).isin(categories)]
+
+        quantity = moves['quantity'].astype(int).where(~moves['deleted'].astype(bool), 0)
+        held = opening.set_index('id')['quantity']
+        previous = quantity.groupby(moves['id']).shift().fillna(moves['id'].map(held)).fillna(0)
+        bins = pd.to_datetime(moves['at'], format=AT_FORMAT).dt.to_period(freq)
+        changes = (quantity - previous).groupby([bins, moves[by].astype(str)]).sum().unstack(fill_value=0)
+        start_levels = opening.groupby(opening[by].astype(str))['quantity'].sum()
+        columns = start_levels.index.union(changes.columns)
+        changes = changes.reindex(index=periods, columns=columns, fill_value=0)
+        levels = (changes.cumsum() + start_levels.reindex(columns, fill_value=0)).astype(int)
+        levels.index = periods.end_time.normalize()
+        levels.index.name = "date"
+        levels.columns.name = by
+        # Periods over before the baseline was taken have no known level (not a stock-out): they are left out.
+        baseline = snapshots[0]["at"] if snapshots else None
+        known = [baseline is not None and at >= baseline for at in periods.end_time.strftime(AT_FORMAT)]
+        return levels[known]
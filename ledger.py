@@ -0,0 +1,248 @@
+import csv
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are still serialized within this process.
+    fcntl = None
+
+ASSIGNED = "Assigned"
+RETURNED = "Returned"
+
+
+def normalize_id(stock_id):
+    # Same rule the Return flow has always used: "00123 " and "123" are the same item.
+    return str(stock_id).lstrip("0").strip()
+
+
+@contextmanager
+def locked_log(path):
+    # flock on an append-only log itself. A rewrite swaps in a new file, so a writer that was waiting on
+    # the old one opens the log again instead of appending to a file nobody reads any more.
+    while True:
+        f = open(path, "ab")
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            current = os.fstat(f.fileno()).st_ino == os.stat(path).st_ino
+        except FileNotFoundError:
+            current = False
+        if current:
+            break
+        f.close()
+    try:
+        yield f
+    finally:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        f.close()
+
+
+# ---------- ASSIGNMENT LEDGER ----------
+# Assignments are kept as an append-only JSON-lines log of events:
+#   {"op": "assign", "key": 7, "row": {...}}           new assignment (or a compacted record)
+#   {"op": "return", "key": 7, "return_date": "..."}   assignment returned
+#   {"op": "update", "key": 7, "fields": {...}}        field edit (no longer written; replayed from older logs)
+#   {"op": "meta", "next_key": 12}                     first line of a rewritten log: keys of archived
+#                                                      records are never handed out again
+# Replaying the log gives every record plus an index of open assignments per
+# normalized stock ID, so assign and return are one append and one dict update.
+class AssignmentLedger:
+    def __init__(self, path, seed_file=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._rows = {}
+        self._open = {}
+        self._next_key = 0
+        self._offset = 0
+        self._inode = None
+        if not os.path.exists(path) and seed_file and os.path.exists(seed_file):
+            with open(seed_file, newline="", encoding="utf-8") as f:
+                self.replace(list(csv.DictReader(f)))
+        with self._lock:
+            self._sync()
+
+    # ----- replay -----
+    def _reset(self):
+        self._rows = {}
+        self._open = {}
+        self._next_key = 0
+        self._offset = 0
+        self._inode = None
+
+    def _sync(self):
+        # Pick up events appended by other processes (or start over if the log was compacted).
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            self._reset()
+            return
+        if st.st_ino != self._inode or st.st_size < self._offset:
+            self._reset()
+            self._inode = st.st_ino
+        size = st.st_size
+        if size == self._offset:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            data = f.read()
+        # Ignore a trailing partial line; it is read again once its writer finishes it.
+        complete = data[:data.rfind(b"\n") + 1]
+        for line in complete.splitlines():
+            if line.strip():
+                self._apply(json.loads(line))
+        self._offset += len(complete)
+
+    def _apply(self, event):
+        op = event["op"]
+        if op == "meta":
+            self._next_key = max(self._next_key, event["next_key"])
+            return
+        key = event["key"]
+        if op == "assign":
+            row = dict(event["row"])
+            self._rows[key] = row
+            self._next_key = max(self._next_key, key + 1)
+            if row.get("status") == ASSIGNED:
+                self._open.setdefault(normalize_id(row.get("stock_id", "")), []).append(key)
+            return
+        row = self._rows.get(key)
+        if row is None:
+            return
+        was_open = row.get("status") == ASSIGNED
+        if op == "return":
+            row["status"] = RETURNED
+            row["return_date"] = event.get("return_date", "")
+        else:
+            row.update(event["fields"])
+        if was_open and row.get("status") != ASSIGNED:
+            self._close(key, row)
+        elif not was_open and row.get("status") == ASSIGNED:
+            self._open.setdefault(normalize_id(row.get("stock_id", "")), []).append(key)
+
+    def _close(self, key, row):
+        stock_key = normalize_id(row.get("stock_id", ""))
+        keys = self._open.get(stock_key, [])
+        if key in keys:
+            keys.remove(key)
+        if not keys:
+            self._open.pop(stock_key, None)
+
+    def _append_many(self, make_events):
+        # Called with self._lock held. The file lock keeps keys unique across processes:
+        # catch up on the log, build the events, append them in one write, then replay them like any other line.
+        with locked_log(self.path) as f:
+            self._sync()
+            events = make_events()
+            f.write("".join(json.dumps(event, ensure_ascii=False) + "\n" for event in events).encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+        self._sync()
+        return events
+
+    # ----- writes -----
+    def batch(self, rows=(), returns=()):
+        # Several assignments and returns ((key, return_date) pairs) as one append; returns the new keys.
+        rows = [{k: str(v) for k, v in row.items()} for row in rows]
+        returns = [(int(key), str(return_date)) for key, return_date in returns]
+        if not rows and not returns:
+            return []
+
+        def make_events():
+            events = [{"op": "assign", "key": self._next_key + i, "row": row} for i, row in enumerate(rows)]
+            events += [{"op": "return", "key": key, "return_date": return_date} for key, return_date in returns]
+            return events
+        with self._lock:
+            events = self._append_many(make_events)
+        return [event["key"] for event in events[:len(rows)]]
+
+    def replace(self, rows):
+        self._rewrite(lambda: list(enumerate(rows)))
+
+    def _rewrite(self, make_items):
+        # Write the log as one compacted "assign" record per (key, row) from make_items(), which runs
+        # with the log locked and caught up, so no append lands between the read and the swap.
+        # make_items() returning None leaves the log as it is.
+        with self._lock:
+            with locked_log(self.path):
+                self._sync()
+                items = make_items()
+                if items is None:
+                    return
+                next_key = max([self._next_key] + [key + 1 for key, _ in items])
+                tmp_path = self.path + ".tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.write(json.dumps({"op": "meta", "next_key": next_key}) + "\n")
+                    for key, row in items:
+                        row = {k: "" if v is None else str(v) for k, v in row.items()}
+                        f.write(json.dumps({"op": "assign", "key": key, "row": row}, ensure_ascii=False) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            self._reset()
+            self._sync()
+
+    def compact(self):
+        # Keys are kept so open sessions can still return what they looked up.
+        self._rewrite(lambda: [(key, self._rows[key]) for key in sorted(self._rows)])
+
+    def archive(self, select, store):
+        # Moves the records select(row) picks out of the log: store([(key, row), ...]) files them
+        # elsewhere first, then the log is rewritten without them. Returns how many moved.
+        moved = []
+
+        def keep():
+            moved.extend((key, dict(self._rows[key])) for key in sorted(self._rows) if select(self._rows[key]))
+            if not moved:
+                return None
+            store(moved)
+            return [(key, self._rows[key]) for key in sorted(self._rows) if not select(self._rows[key])]
+        self._rewrite(keep)
+        return len(moved)
+
+    # ----- reads -----
+    def next_key(self):
+        with self._lock:
+            self._sync()
+            return self._next_key
+
+    def version(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def records(self):
+        with self._lock:
+            self._sync()
+            return [(key, dict(self._rows[key])) for key in sorted(self._rows)]
+
+    def get(self, key):
+        with self._lock:
+            self._sync()
+            row = self._rows.get(int(key))
+            return None if row is None else dict(row)
+
+    def open_assignments(self, stock_ids):
+        # {normalized stock ID: [(key, row), ...] oldest first} for every ID that has open assignments.
+        with self._lock:
+            self._sync()
+            found = {}
+            for stock_key in dict.fromkeys(normalize_id(stock_id) for stock_id in stock_ids):
+                keys = self._open.get(stock_key)
+                if keys:
+                    found[stock_key] = [(key, dict(self._rows[key])) for key in keys]
+            return found
+
+    def open_assignment(self, stock_id):
+        # Latest still-open assignment for the (normalized) stock ID, or None.
+        with self._lock:
+            self._sync()
+            keys = self._open.get(normalize_id(stock_id))
+            if not keys:
+                return None
+            return keys[-1], dict(self._rows[keys[-1]])
@@ -0,0 +1,267 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+from config import METRICS_FILE, METRICS_FILE_INTERVAL, PERF_LOG_FILE
+
+# Histogram bucket upper bounds in seconds (Prometheus "le" labels).
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Recent durations kept per operation for percentiles, slowest single calls and recent reruns kept in memory.
+SAMPLES_KEPT = 500
+SLOWEST_KEPT = 25
+RERUNS_KEPT = 50
+
+# One JSON object per timed call and per rerun. Silent unless logging is configured or
+# INVENTORY_PERF_LOG names a file.
+logger = logging.getLogger("inventory.perf")
+if PERF_LOG_FILE:
+    _handler = logging.FileHandler(PERF_LOG_FILE)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+
+
+def _log(event, **fields):
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps({"ts": round(time.time(), 3), "event": event, **fields}, default=str))
+
+
+# ---------- REGISTRY ----------
+# Process-wide, like the frame cache: every session and API request adds to the same numbers.
+class Operation:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.max = 0.0
+        self.buckets = [0] * len(BUCKETS)
+        self.samples = deque(maxlen=SAMPLES_KEPT)
+
+    def observe(self, seconds, failed):
+        self.calls += 1
+        self.errors += failed
+        self.seconds += seconds
+        self.max = max(self.max, seconds)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+        self.samples.append(seconds)
+
+
+def _percentile(values, q):
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))] if values else 0.0
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.operations = {}
+            self.counters = {}
+            self.slowest = []
+            self.reruns = deque(maxlen=RERUNS_KEPT)
+            self.started = time.time()
+
+    def observe(self, name, seconds, failed=False):
+        with self._lock:
+            operation = self.operations.get(name)
+            if operation is None:
+                operation = self.operations[name] = Operation()
+            operation.observe(seconds, failed)
+            if len(self.slowest) < SLOWEST_KEPT or seconds > self.slowest[-1]["seconds"]:
+                self.slowest.append({"operation": name, "seconds": seconds, "failed": failed, "at": time.time()})
+                self.slowest.sort(key=lambda call: call["seconds"], reverse=True)
+                del self.slowest[SLOWEST_KEPT:]
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_rerun(self, rerun):
+        with self._lock:
+            self.reruns.append(rerun)
+
+    def operation_table(self):
+        # One dict per operation, slowest total time first.
+        with self._lock:
+            items = [(name, op.calls, op.errors, op.seconds, op.max, sorted(op.samples))
+                     for name, op in self.operations.items()]
+        rows = [{
+            "operation": name,
+            "calls": calls,
+            "errors": errors,
+            "total_ms": seconds * 1000,
+            "mean_ms": seconds / calls * 1000 if calls else 0.0,
+            "p50_ms": _percentile(samples, 50) * 1000,
+            "p95_ms": _percentile(samples, 95) * 1000,
+            "max_ms": longest * 1000,
+        } for name, calls, errors, seconds, longest, samples in items]
+        return sorted(rows, key=lambda row: row["total_ms"], reverse=True)
+
+    def slowest_calls(self):
+        with self._lock:
+            return [dict(call) for call in self.slowest]
+
+    def recent_reruns(self):
+        # Newest first.
+        with self._lock:
+            return list(reversed(self.reruns))
+
+    def prometheus(self):
+        # Prometheus text exposition format (version 0.0.4).
+        with self._lock:
+            operations = sorted(self.operations.items())
+            counters = sorted(self.counters.items())
+            lines = [
+                "# HELP inventory_operation_seconds Time spent in instrumented operations.",
+                "# TYPE inventory_operation_seconds histogram",
+            ]
+            for name, op in operations:
+                label = f'operation="{_label(name)}"'
+                total = 0
+                for bound, count in zip(BUCKETS, op.buckets):
+                    total += count
+                    lines.append(f'inventory_operation_seconds_bucket{{{label},le="{bound}"}} {total}')
+                lines.append(f'inventory_operation_seconds_bucket{{{label},le="+Inf"}} {op.calls}')
+                lines.append(f"inventory_operation_seconds_sum{{{label}}} {op.seconds:.6f}")
+                lines.append(f"inventory_operation_seconds_count{{{label}}} {op.calls}")
+            lines += ["# HELP inventory_operation_errors_total Instrumented calls that raised.",
+                      "# TYPE inventory_operation_errors_total counter"]
+            lines += [f'inventory_operation_errors_total{{operation="{_label(name)}"}} {op.errors}' for name, op in operations]
+            lines += ["# HELP inventory_events_total Counted events (frame cache hits and misses, barcode renders, stored images).",
+                      "# TYPE inventory_events_total counter"]
+            lines += [f'inventory_events_total{{event="{_label(name)}"}} {value}' for name, value in counters]
+            lines += ["# HELP inventory_process_start_time_seconds When these metrics started counting.",
+                      "# TYPE inventory_process_start_time_seconds gauge",
+                      f"inventory_process_start_time_seconds {self.started:.3f}"]
+        return "\n".join(lines) + "\n"
+
+
+_registry = Registry()
+# The current rerun's trace and nesting depth; Streamlit runs each session's script on its own thread.
+_local = threading.local()
+
+
+# ---------- INSTRUMENTATION ----------
+def observe(name, seconds, failed=False):
+    # For callers that time themselves (e.g. async API handlers, which share one thread).
+    _registry.observe(name, seconds, failed)
+    _log("operation", operation=name, ms=round(seconds * 1000, 3), failed=failed)
+
+
+def count(name, n=1):
+    _registry.count(name, n)
+
+
+@contextmanager
+def timer(name):
+    depth = getattr(_local, "depth", 0)
+    _local.depth = depth + 1
+    started = time.perf_counter()
+    failed = False
+    try:
+        yield
+    except Exception:
+        # Streamlit's rerun/stop signals are BaseExceptions and do not count as failures.
+        failed = True
+        raise
+    finally:
+        seconds = time.perf_counter() - started
+        _local.depth = depth
+        trace = getattr(_local, "trace", None)
+        if trace is not None:
+            trace.append({"operation": name, "depth": depth, "start_ms": (started - _local.rerun_started) * 1000,
+                          "ms": seconds * 1000, "failed": failed})
+        observe(name, seconds, failed)
+
+
+def timed(name=None):
+    # Decorator form of timer(); the operation name defaults to the function name.
+    def wrap(func):
+        label = name or func.__name__
+
+        @wraps(func)
+        def inner(*args, **kwargs):
+            with timer(label):
+                return func(*args, **kwargs)
+        return inner
+    return wrap
+
+
+# ---------- RERUNS ----------
+@contextmanager
+def rerun(page, user=""):
+    # Collects every timed call made while one Streamlit rerun renders `page`.
+    _local.trace = []
+    _local.depth = 0
+    _local.rerun_started = time.perf_counter()
+    at = time.time()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - _local.rerun_started
+        trace = sorted(_local.trace, key=lambda call: call["start_ms"])
+        _local.trace = None
+        _registry.add_rerun({"page": page, "user": user, "at": at, "ms": seconds * 1000, "operations": trace})
+        _registry.observe(f"rerun.{page}", seconds)
+        _log("rerun", page=page, user=user, ms=round(seconds * 1000, 3),
+             operations={call["operation"]: round(call["ms"], 3) for call in trace if call["depth"] == 0})
+        if METRICS_FILE:
+            _maybe_write_file()
+
+
+# ---------- EXPORT ----------
+_file_lock = threading.Lock()
+_file_written = [0.0]
+
+
+def operation_table():
+    return _registry.operation_table()
+
+
+def slowest_calls():
+    return _registry.slowest_calls()
+
+
+def recent_reruns():
+    return _registry.recent_reruns()
+
+
+def prometheus_text():
+    return _registry.prometheus()
+
+
+def reset():
+    _registry.reset()
+
+
+def write_metrics_file(path=METRICS_FILE):
+    # Atomic replace, so a node_exporter textfile collector never reads half a file.
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(prometheus_text())
+    os.replace(tmp, path)
+
+
+def _maybe_write_file():
+    with _file_lock:
+        if time.time() - _file_written[0] < METRICS_FILE_INTERVAL:
+            return
+        _file_written[0] = time.time()
+    try:
+        write_metrics_file()
+    except OSError as e:
+        logger.warning("Could not write %s: %s", METRICS_FILE, e)
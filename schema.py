@@ -0,0 +1,222 @@
+import csv
+import gzip
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from config import CSV_ENGINE, MIRROR_FORMAT, MIRROR_MIN_ROWS
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:  # The pandas C parser and no binary mirror.
+    pa = None
+
+DATE_FORMAT = "%Y-%m-%d %H:%M"
+
+# ---------- SCHEMAS ----------
+# In-memory column types of the two tables:
+#   "text"      Arrow-backed strings (IDs keep their leading zeros, blanks stay "")
+#   "category"  few distinct values repeated on every row: stored once, rows hold small integer codes
+#   "int" / "float"
+#   "datetime"  DATE_FORMAT text on disk, datetime64 in memory (NaT for blanks)
+# Files, the ledger and SQLite keep plain text; as_text() turns a typed frame back into it.
+STOCK_SCHEMA = {
+    "id": "text",
+    "name": "text",
+    "company": "category",
+    "category": "category",
+    "quantity": "int",
+    "price": "float",
+    "barcode": "text",
+    "image": "text",
+    "version": "int",
+}
+ASSIGNMENT_SCHEMA = {
+    "user": "text",
+    "role": "category",
+    "stock_id": "text",
+    "stock_name": "category",
+    "date": "datetime",
+    "remarks": "text",
+    "status": "category",
+    "teacher_id": "text",
+    "department": "category",
+    "return_date": "datetime",
+}
+
+
+def _to_datetime(values):
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    text = values.fillna("").astype(str)
+    parsed = pd.to_datetime(text, format=DATE_FORMAT, errors="coerce")
+    # Hand-edited rows ("2024-01-02", "2024-01-02 10:00:00") take the slower per-value path.
+    odd = parsed.isna() & (text != "")
+    if odd.any():
+        parsed[odd] = pd.to_datetime(text[odd], format="mixed", errors="coerce")
+    return parsed
+
+
+def _format_dates(values):
+    # DATE_FORMAT ("YYYY-MM-DD HH:MM") through NumPy, several times faster than strftime; NaT becomes "".
+    if values.empty:
+        return pd.Series([], index=values.index, dtype=str)
+    text = np.char.replace(np.datetime_as_string(values.to_numpy().astype("datetime64[m]"), unit="m"), "T", " ")
+    return pd.Series(np.where(values.isna().to_numpy(), "", text), index=values.index, dtype=str)
+
+
+def _convert(values, kind):
+    if kind == "int":
+        return pd.to_numeric(values, errors="coerce").fillna(0).astype("int64")
+    if kind == "float":
+        return pd.to_numeric(values, errors="coerce").fillna(0.0).astype("float64")
+    if kind == "datetime":
+        return _to_datetime(values)
+    if kind == "category":
+        if isinstance(values.dtype, pd.CategoricalDtype) and not values.isna().any():
+            return values
+        return values.fillna("").astype(str).astype("category")
+    return values.fillna("").astype(str)
+
+
+def typed(df, schema):
+    # Schema columns in schema order (missing ones blank), each converted to its kind.
+    df = df.copy()
+    for col in schema:
+        if col not in df.columns:
+            df[col] = ""
+    return pd.DataFrame({col: _convert(df[col], kind) for col, kind in schema.items()}, index=df.index)
+
+
+def as_text(df, schema):
+    # The plain-text form files, the ledger and SQLite store.
+    df = df.copy()
+    for col, kind in schema.items():
+        if col not in df.columns:
+            continue
+        if kind == "datetime" and pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = _format_dates(df[col])
+        elif kind in ("text", "category", "datetime"):
+            df[col] = df[col].fillna("").astype(str)
+    return df
+
+
+# ---------- CSV READING ----------
+def _arrow_types(schema, strict):
+    # strict: parse numbers and dates in Arrow; otherwise read them as text and convert in pandas.
+    string = pa.string()
+    types = {
+        "text": string,
+        "category": pa.dictionary(pa.int32(), string),
+        "int": pa.int64() if strict else string,
+        "float": pa.float64() if strict else string,
+        "datetime": pa.timestamp("s") if strict else string,
+    }
+    return {col: types[kind] for col, kind in schema.items()}
+
+
+def _read_arrow(path, schema):
+    # Arrow decompresses .gz files itself; the header is read the same way.
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", newline="", encoding="utf-8") as f:
+        header = next(csv.reader(f), [])
+    present = {col: kind for col, kind in schema.items() if col in header}
+    for strict in (True, False):
+        options = pa_csv.ConvertOptions(
+            column_types=_arrow_types(present, strict),
+            include_columns=list(present),
+            # Blank numbers and dates become nulls (then 0 / NaT); blank text stays "".
+            null_values=[""],
+            strings_can_be_null=False,
+            timestamp_parsers=[DATE_FORMAT, pa_csv.ISO8601],
+        )
+        try:
+            return pa_csv.read_csv(path, convert_options=options).to_pandas()
+        except pa.ArrowInvalid:
+            # A hand-edited value ("n/a" in quantity, an odd date); the text path coerces it.
+            continue
+
+
+def read_csv(path, schema):
+    if pa is not None and CSV_ENGINE != "c":
+        df = _read_arrow(path, schema)
+    else:
+        # Categories are built after parsing; the C parser's own categorical path is slower.
+        df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    return typed(df, schema)
+
+
+# ---------- BINARY MIRROR ----------
+# A Feather (or Parquet) copy of a typed frame next to its source file, tagged with the source's
+# signature (mtime/size). While the signature matches, reloading it skips parsing and typing.
+class FrameMirror:
+    def __init__(self, source_path, fmt=MIRROR_FORMAT, min_rows=MIRROR_MIN_ROWS):
+        self.fmt = fmt if pa is not None and fmt in ("feather", "parquet") else None
+        self.path = f"{source_path}.{self.fmt}"
+        self.min_rows = min_rows
+
+    def load(self, signature):
+        if self.fmt is None or signature is None or not os.path.exists(self.path):
+            return None
+        try:
+            # The tag is checked from the file's schema first, so a stale mirror is never read in full.
+            tag = (self._read_schema().metadata or {}).get(b"inventory_source")
+            if tag is None or json.loads(tag) != list(signature):
+                return None
+            return self._read().to_pandas()
+        except (OSError, pa.ArrowException):
+            return None
+
+    def save(self, df, signature):
+        if self.fmt is None or signature is None:
+            return
+        if len(df) < self.min_rows:
+            # The table shrank (e.g. assignments were archived): drop the mirror it outgrew.
+            if os.path.exists(self.path):
+                try:
+                    os.remove(self.path)
+                except OSError:
+                    pass
+            return
+        table = pa.Table.from_pandas(df)
+        metadata = {**(table.schema.metadata or {}), b"inventory_source": json.dumps(list(signature)).encode()}
+        table = table.replace_schema_metadata(metadata)
+        tmp = f"{self.path}.tmp"
+        try:
+            self._write(table, tmp)
+            os.replace(tmp, self.path)
+        except OSError:
+            # A read-only data folder just means no mirror.
+            pass
+
+    def _read_schema(self):
+        if self.fmt == "parquet":
+            import pyarrow.parquet as pq
+            return pq.read_schema(self.path)
+        return pa.ipc.open_file(self.path).schema
+
+    def _read(self):
+        if self.fmt == "parquet":
+            import pyarrow.parquet as pq
+            return pq.read_table(self.path)
+        import pyarrow.feather as feather
+        return feather.read_table(self.path)
+
+    def _write(self, table, path):
+        if self.fmt == "parquet":
+            import pyarrow.parquet as pq
+            pq.write_table(table, path)
+        else:
+            import pyarrow.feather as feather
+            feather.write_feather(table, path)
+
+
+def file_signature(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
@@ -0,0 +1,350 @@
+from datetime import date, datetime, timedelta
+
+from config import ARCHIVE_AFTER_DAYS
+from jobs import get_queue, stage_upload
+from ledger import ASSIGNED, normalize_id
+from schema import DATE_FORMAT
+from storage import (ConflictError, apply_changes, assign_item, delete_stock, get_stock_index, insert_stock,
+                     open_assignment, open_assignments, return_item, stock_as_of, stock_forecast, stock_levels,
+                     update_stock)
+
+ROLES = ["Teacher", "Student"]
+# Period codes stock_history accepts (day, week, month) and the range it covers by default.
+LEVEL_FREQUENCIES = ["D", "W", "M"]
+LEVEL_DAYS = 90
+# Extra fields each scan action accepts.
+SCAN_FIELDS = {
+    "lookup": set(),
+    "assign": {"user", "role", "teacher_id", "department", "remarks", "expected_version"},
+    "return": {"expected_version"},
+}
+
+
+class NotFoundError(LookupError):
+    pass
+
+
+class ValidationError(ValueError):
+    pass
+
+
+def _now():
+    return datetime.now().strftime(DATE_FORMAT)
+
+
+def product_dict(product):
+    # Stock row (Series) as plain Python values, for JSON responses.
+    return {col: (value.item() if hasattr(value, "item") else value) for col, value in product.items()}
+
+
+# ---------- LOOKUP ----------
+# Inventory operations shared by the Streamlit pages and the HTTP API (api.py). All reads go
+# through the process-wide StockIndex, so a scan is a dict lookup rather than a table scan.
+def _resolve(index, code):
+    # Exact stock ID first, then the scanned Code128 text with leading zeros ignored.
+    product = index.get(str(code).strip())
+    return index.find(str(code).strip()) if product is None else product
+
+
+def find_product(code):
+    product = _resolve(get_stock_index(), code)
+    if product is None:
+        raise NotFoundError(f"Stock ID {code} not found.")
+    return product
+
+
+def lookup(code):
+    product = find_product(code)
+    current = open_assignment(product['id'])
+    return {
+        "product": product_dict(product),
+        "open_assignment": None if current is None else {"key": current[0], **current[1]},
+    }
+
+
+# ---------- STOCK ----------
+def add_stock(product_code, name, company, category, quantity, price, image_file=None):
+    # add_stock's rule: a (name, company, category) match adds to its quantity, anything else is a new row.
+    # image_file is an upload (or None). The row is saved straight away; its barcode and image are rendered
+    # by background jobs that fill them in. Returns ("updated" | "added", the stock row as saved, job ids).
+    if not product_code or not name or company in ["Select...", ""] or category in ["Select...", ""]:
+        raise ValidationError("Please fill out all required fields.")
+    existing = get_stock_index().match(name, company, category)
+    if existing is not None:
+        fields = {"quantity": int(existing['quantity']) + int(quantity), "price": price}
+        update_stock(existing['id'], fields, expected_version=existing['version'])
+        row = product_dict(get_stock_index().get(existing['id']))
+    else:
+        insert_stock({
+            "id": product_code,
+            "name": name,
+            "company": company,
+            "category": category,
+            "quantity": quantity,
+            "price": price,
+            "barcode": "",
+            "image": "",
+        })
+        # The new row is the last one with its ID.
+        row = product_dict(get_stock_index().rows_for_id(product_code)[-1])
+    queue = get_queue()
+    job_ids = [] if existing is not None else [queue.submit("barcode", stock_id=row['id'])]
+    if image_file is not None:
+        data = image_file.getvalue() if hasattr(image_file, "getvalue") else image_file.read()
+        upload = stage_upload(data, getattr(image_file, "name", ""))
+        job_ids.append(queue.submit("image", stock_id=row['id'], upload=upload))
+    return ("added" if existing is None else "updated"), row, job_ids
+
+
+def adjust_stock(stock_id, quantity=None, delta=None, price=None, expected_version=None):
+    # Set the quantity (and/or price), or move it by delta; a delta never takes stock below zero.
+    product = find_product(stock_id)
+    if delta is not None:
+        if quantity is not None or price is not None:
+            raise ValidationError("Give either a delta or a new quantity/price, not both.")
+        apply_changes([(product['id'], int(delta), expected_version)])
+        return
+    if quantity is None and price is None:
+        raise ValidationError("Nothing to change.")
+    fields = {}
+    if quantity is not None:
+        if int(quantity) < 0:
+            raise ValidationError("Quantity cannot be negative.")
+        fields["quantity"] = int(quantity)
+    if price is not None:
+        if float(price) < 0:
+            raise ValidationError("Price cannot be negative.")
+        fields["price"] = float(price)
+    update_stock(product['id'], fields, expected_version=expected_version)
+
+
+def remove_stock(stock_id, expected_version=None):
+    delete_stock(find_product(stock_id)['id'], expected_version=expected_version)
+
+
+# ---------- BACKGROUND JOBS ----------
+# Slow work runs on the job queue (jobs.py); these return the job id to poll with job_status.
+def queue_export(fmt):
+    if fmt not in ("csv", "xlsx", "parquet"):
+        raise ValidationError("Format must be csv, xlsx or parquet.")
+    return get_queue().submit("export", fmt=fmt)
+
+
+def queue_archive(older_than_days=ARCHIVE_AFTER_DAYS):
+    return get_queue().submit("archive", older_than_days=int(older_than_days))
+
+
+def job_status(job_id):
+    job = get_queue().get(job_id)
+    if job is None:
+        raise NotFoundError(f"Job {job_id} not found.")
+    return job
+
+
+# ---------- ASSIGN / RETURN ----------
+def _assignment_row(stock_id, stock_name, user, role="Student", teacher_id="", department="", remarks=""):
+    if not str(user).strip():
+        raise ValidationError("A user name is required.")
+    if role not in ROLES:
+        raise ValidationError(f"Role must be one of {', '.join(ROLES)}.")
+    return {
+        "user": user,
+        "role": role,
+        "stock_id": stock_id,
+        "stock_name": stock_name,
+        "date": _now(),
+        "remarks": remarks,
+        "status": ASSIGNED,
+        "teacher_id": teacher_id if role == "Teacher" else "",
+        "department": department if role == "Teacher" else "",
+        "return_date": "",
+    }
+
+
+def assign(stock_id, user, role="Student", teacher_id="", department="", remarks="", expected_version=None):
+    # Returns the new assignment key; raises OutOfStockError when nothing is left.
+    product = find_product(stock_id)
+    row = _assignment_row(product['id'], product['name'], user, role, teacher_id, department, remarks)
+    return assign_item(product['id'], row, expected_version=expected_version)
+
+
+def return_(stock_id, expected_version=None):
+    # Closes the latest open assignment for the ID and returns its key.
+    product = find_product(stock_id)
+    current = open_assignment(product['id'])
+    if current is None:
+        raise NotFoundError(f"No outstanding assignment found for stock ID {stock_id}.")
+    return_item(current[0], product['id'], _now(), expected_version=expected_version)
+    return current[0]
+
+
+# ---------- SCANS ----------
+def scan(code, action="lookup", **details):
+    if action not in SCAN_FIELDS:
+        raise ValidationError(f"Action must be one of {', '.join(SCAN_FIELDS)}.")
+    unknown = set(details) - SCAN_FIELDS[action]
+    if unknown:
+        raise ValidationError(f"Unknown field(s) for {action}: {', '.join(sorted(unknown))}")
+    if action == "lookup":
+        return lookup(code)
+    if action == "assign":
+        return {"key": assign(code, **details)}
+    return {"key": return_(code, **details)}
+
+
+def batch_scan(scans):
+    # scans: [{"code": ..., "action": "lookup" | "assign" | "return", ...assign details}].
+    # Each scan is applied on its own; one bad scan does not stop the rest.
+    results = []
+    for item in scans:
+        item = dict(item)
+        code = item.pop("code", "")
+        action = item.pop("action", "lookup")
+        try:
+            results.append({"code": code, "action": action, "ok": True, **scan(code, action, **item)})
+        except (LookupError, ValueError, ConflictError) as e:
+            results.append({"code": code, "action": action, "ok": False, "error": str(e)})
+    return results
+
+
+# ---------- BATCH MODE ----------
+# Many scans, one write: preview_batch resolves every scanned ID (and, for returns, its open
+# assignments) in a single pass; commit_batch applies all quantity deltas and assign/return
+# events in one storage write, refused if any previewed item changed in between.
+BATCH_ACTIONS = ["assign", "return"]
+
+
+def parse_scans(text):
+    # One scan per line: "ID" or "ID,quantity". Returns [(code, quantity)].
+    scans = []
+    for line in str(text).splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        code, sep, quantity = line.rpartition(",")
+        if not sep:
+            code, quantity = line, "1"
+        try:
+            scans.append((code.strip(), int(quantity)))
+        except ValueError:
+            raise ValidationError(f"Bad quantity in scan {line!r}; use ID or ID,quantity.") from None
+    return scans
+
+
+def preview_batch(action, scans):
+    # One line per distinct item: requested quantity, stock on hand, open assignments and any problem.
+    if action not in BATCH_ACTIONS:
+        raise ValidationError(f"Batch action must be one of {', '.join(BATCH_ACTIONS)}.")
+    index = get_stock_index()
+    lines = {}
+    for code, quantity in scans:
+        product = _resolve(index, code)
+        key = ("missing", str(code)) if product is None else ("found", product['id'])
+        line = lines.get(key)
+        if line is None:
+            line = lines[key] = {
+                "code": str(code),
+                "stock_id": "" if product is None else product['id'],
+                "name": "" if product is None else product['name'],
+                "quantity": 0,
+                "in_stock": 0 if product is None else int(product['quantity']),
+                "open": 0,
+                "version": None if product is None else int(product['version']),
+                "returns": [],
+                "problem": "" if product is not None else "stock ID not found",
+            }
+        line["quantity"] += int(quantity)
+    found = [line for line in lines.values() if line["stock_id"]]
+    open_by_id = open_assignments([line["stock_id"] for line in found]) if found else {}
+    for line in found:
+        current = open_by_id.get(normalize_id(line["stock_id"]), [])
+        line["open"] = len(current)
+        if line["quantity"] <= 0:
+            line["problem"] = "quantity must be at least 1"
+        elif action == "assign" and line["quantity"] > line["in_stock"]:
+            line["problem"] = f"only {line['in_stock']} in stock"
+        elif action == "return" and line["quantity"] > len(current):
+            line["problem"] = f"only {len(current)} assigned"
+        elif action == "return":
+            # Latest assignments first, like the single Return flow.
+            line["returns"] = [key for key, _ in current[-line["quantity"]:]]
+    return list(lines.values())
+
+
+def commit_batch(action, preview, user="", role="Student", teacher_id="", department="", remarks=""):
+    # Returns the assignment keys created (assign) or closed (return).
+    if action not in BATCH_ACTIONS:
+        raise ValidationError(f"Batch action must be one of {', '.join(BATCH_ACTIONS)}.")
+    problems = [line for line in preview if line["problem"]]
+    if problems:
+        raise ValidationError(f"{len(problems)} scanned item(s) cannot be {action}ed; fix or remove them first.")
+    if not preview:
+        raise ValidationError("Nothing scanned.")
+    sign = -1 if action == "assign" else 1
+    deltas = [(line["stock_id"], sign * line["quantity"], line["version"]) for line in preview]
+    if action == "assign":
+        rows = [_assignment_row(line["stock_id"], line["name"], user, role, teacher_id, department, remarks)
+                for line in preview for _ in range(line["quantity"])]
+        return apply_changes(deltas, new_assignments=rows)
+    now = _now()
+    keys = [key for line in preview for key in line["returns"]]
+    apply_changes(deltas, returns=[(key, now) for key in keys])
+    return keys
+
+
+# ---------- STOCK HISTORY ----------
+def _date(value, default, name):
+    if not value:
+        return default
+    try:
+        return date.fromisoformat(str(value))
+    except ValueError:
+        raise ValidationError(f"{name} must be a date (YYYY-MM-DD).") from None
+
+
+def stock_history(code="", category="", start="", end="", freq="D"):
+    # Quantity on hand at the end of each period from start to end (ISO dates, default the last LEVEL_DAYS days):
+    # for one item when code is given (a deleted item by its exact stock ID), else per category.
+    if freq not in LEVEL_FREQUENCIES:
+        raise ValidationError(f"freq must be one of {', '.join(LEVEL_FREQUENCIES)}.")
+    end = _date(end, date.today(), "end")
+    start = _date(start, end - timedelta(days=LEVEL_DAYS), "start")
+    if start > end:
+        raise ValidationError("start must not be after end.")
+    if code:
+        product = _resolve(get_stock_index(), code)
+        levels = stock_levels(start, end, freq, ids=[str(code).strip() if product is None else product['id']])
+    else:
+        levels = stock_levels(start, end, freq, by="category", categories=[category] if category else None)
+    return {
+        "dates": [f"{day:%Y-%m-%d}" for day in levels.index],
+        "levels": {str(col): levels[col].tolist() for col in levels.columns},
+    }
+
+
+def stock_on(day=""):
+    # Every item with its quantity and price as they stood at the end of `day` (ISO date, default today).
+    day = _date(day, date.today(), "date")
+    past = stock_as_of(day)
+    return {"date": f"{day:%Y-%m-%d}", "items": past.astype({"company": str, "category": str}).to_dict("records")}
+
+
+# ---------- REORDER FORECAST ----------
+def _records(df):
+    # JSON-safe rows: dates as text, missing values (no stock-out in sight) as None.
+    df = df.astype({col: str for col in ("category",) if col in df})
+    if "stockout_date" in df:
+        df = df.assign(stockout_date=df['stockout_date'].dt.strftime(DATE_FORMAT))
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+
+def reorder_forecast(category="", due_only=False):
+    # Per-item and per-category rates, days until stock-out and suggested reorder quantities.
+    items, categories = stock_forecast()
+    if category:
+        items = items[items['category'] == category]
+        categories = categories[categories['category'] == category]
+    if due_only:
+        items = items[items['reorder']]
+    return {"items": _records(items), "categories": _records(categories)}
+
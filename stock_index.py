@@ -0,0 +1,94 @@
+import re
+from bisect import bisect_left
+
+from ledger import normalize_id
+
+_TOKEN = re.compile(r"[0-9a-z]+")
+
+
+def _tokens(text):
+    return _TOKEN.findall(str(text).lower())
+
+
+# ---------- STOCK INDEX ----------
+# Hash lookups over one version of the stock frame. Built once per data version by
+# storage.get_stock_index() and shared read-only between reruns and sessions.
+class StockIndex:
+    def __init__(self, df):
+        self.df = df
+        self._by_id = {}
+        self._labels_by_id = {}
+        self._by_normalized_id = {}
+        self._ids_by_name = {}
+        self._by_product_key = {}
+        self._by_token = {}
+        positions = {}
+        for position, (label, stock_id, name, company, category) in enumerate(zip(df.index, df['id'], df['name'], df['company'], df['category'])):
+            self._by_id.setdefault(stock_id, label)
+            self._labels_by_id.setdefault(stock_id, []).append(label)
+            self._by_normalized_id.setdefault(normalize_id(stock_id), label)
+            self._ids_by_name.setdefault(name, []).append(stock_id)
+            self._by_product_key.setdefault((name, company, category), label)
+            positions[label] = position
+            for token in set(_tokens(name) + _tokens(stock_id) + _tokens(normalize_id(stock_id))):
+                self._by_token.setdefault(token, []).append(label)
+        self._positions = positions
+        self._sorted_tokens = sorted(self._by_token)
+        self._values = {}
+
+    def __len__(self):
+        return len(self.df)
+
+    def names(self):
+        return list(self._ids_by_name)
+
+    def values(self, column):
+        # Sorted distinct values of a column (filter options), computed once per index.
+        if column not in self._values:
+            self._values[column] = sorted(self.df[column].unique())
+        return self._values[column]
+
+    def ids_for_name(self, name):
+        return list(self._ids_by_name.get(name, []))
+
+    def get(self, stock_id):
+        label = self._by_id.get(str(stock_id))
+        return None if label is None else self.df.loc[label]
+
+    def labels_for_id(self, stock_id):
+        return list(self._labels_by_id.get(str(stock_id), []))
+
+    def rows_for_id(self, stock_id):
+        return [self.df.loc[label].to_dict() for label in self._labels_by_id.get(str(stock_id), [])]
+
+    def find(self, stock_id):
+        # Lookup by scanned/typed ID, ignoring leading zeros.
+        label = self._by_normalized_id.get(normalize_id(stock_id))
+        return None if label is None else self.df.loc[label]
+
+    def search(self, text, limit=None):
+        # Row labels whose name/ID contains every query word as a word prefix, in table order.
+        words = _tokens(text)
+        if not words:
+            return list(self.df.index[:limit])
+        matches = None
+        for word in words:
+            labels = set()
+            start = bisect_left(self._sorted_tokens, word)
+            for token in self._sorted_tokens[start:]:
+                if not token.startswith(word):
+                    break
+                labels.update(self._by_token[token])
+            matches = labels if matches is None else matches & labels
+            if not matches:
+                return []
+        return sorted(matches, key=self._positions.__getitem__)[:limit]
+
+    def search_names(self, text, limit=None):
+        names = dict.fromkeys(self.df.loc[self.search(text), 'name'])
+        return list(names)[:limit]
+
+    def match(self, name, company, category):
+        # Existing row for add_stock's (name, company, category) duplicate rule.
+        label = self._by_product_key.get((name, company, category))
+        return None if label is None else self.df.loc[label]
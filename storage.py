@@ -0,0 +1,976 @@
+import argparse
+import os
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are still serialized within this process.
+    fcntl = None
+
+from aggregates import InventoryAggregates
+from archive import AssignmentArchive
+from config import (ARCHIVE_AFTER_DAYS, ARCHIVE_FOLDER, ASSIGNMENT_FILE, ASSIGNMENT_LOG_FILE, DB_FILE, LOW_STOCK_THRESHOLD,
+                    STOCK_FILE, STOCK_JOURNAL_FILE, STORAGE_BACKEND)
+from forecast import DemandRates, forecast_categories, forecast_csv, forecast_items
+from journal import STATE_COLUMNS, StockJournal, movements, state_rows
+from ledger import ASSIGNED, RETURNED, AssignmentLedger, normalize_id
+from metrics import count, timed, timer
+from schema import ASSIGNMENT_SCHEMA, DATE_FORMAT, STOCK_SCHEMA, FrameMirror, as_text, file_signature, read_csv, typed
+from stock_index import StockIndex
+
+# Column types live in schema.py. "version" is bumped on every row write; pages send back the
+# version they read (compare-and-swap).
+STOCK_COLUMNS = list(STOCK_SCHEMA)
+ASSIGNMENT_COLUMNS = list(ASSIGNMENT_SCHEMA)
+# Asset paths filled in by background jobs (jobs.py). Writing only these leaves the row version alone,
+# so a page that read the row before its barcode or image arrived can still save it.
+ASSET_COLUMNS = {"barcode", "image"}
+# Columns computed by load_data / page functions that are never persisted.
+DERIVED_STOCK_COLUMNS = ["low_stock", "id_stripped"]
+
+
+def _typed_stock(df):
+    return typed(df, STOCK_SCHEMA)
+
+
+def _typed_assignments(df):
+    return typed(df, ASSIGNMENT_SCHEMA)
+
+
+def _bumps_version(fields):
+    return not fields or bool(set(fields) - ASSET_COLUMNS)
+
+
+def _change_reason(new_assignments, returns):
+    # Journal reason for an apply_changes write.
+    return "assign" if new_assignments else "return" if returns else "adjust"
+
+
+def _with_history(hot, archived):
+    # Archived rows plus the hot store's, by key. A key in both (left by an interrupted archive run) keeps the hot row.
+    df = pd.concat([archived, hot])
+    return _typed_assignments(df[~df.index.duplicated(keep="last")].sort_index())
+
+
+# ---------- CONFLICTS ----------
+class ConflictError(RuntimeError):
+    pass
+
+
+class OutOfStockError(ConflictError):
+    pass
+
+
+def _stale(stock_id):
+    return ConflictError(f"Stock {stock_id} was changed by someone else. Reload the page and try again.")
+
+
+class FileLock:
+    # Re-entrant within a thread; across processes uses flock on a side file (in-process only on Windows).
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def __enter__(self):
+        self._lock.acquire()
+        if self._depth == 0:
+            self._file = open(self.path, "a+b")
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self._depth -= 1
+        if self._depth == 0:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+        self._lock.release()
+
+
+def atomic_write_csv(df, path):
+    # A crash mid-write leaves the previous file intact instead of a truncated one.
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+        df.to_csv(f, index=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+# ---------- CSV BACKEND ----------
+# Original stock.csv layout, rewritten atomically under a lock file; assignments live in an
+# append-only ledger seeded from assignments.csv, which `python storage.py compact` re-exports.
+# Returned assignments are moved from the ledger to the monthly archive by archive_assignments.
+# Quantity and price changes are appended to the stock journal while the lock is held.
+class CSVBackend:
+    name = "csv"
+
+    def __init__(self, stock_file=STOCK_FILE, assignment_file=ASSIGNMENT_FILE, ledger_file=ASSIGNMENT_LOG_FILE,
+                 archive_folder=ARCHIVE_FOLDER, journal_file=STOCK_JOURNAL_FILE):
+        self.stock_file = stock_file
+        self.assignment_file = assignment_file
+        self.ledger = AssignmentLedger(ledger_file, seed_file=assignment_file)
+        self.archive = AssignmentArchive(archive_folder)
+        self.lock = FileLock(stock_file + ".lock")
+        self.stock_mirror = FrameMirror(stock_file)
+        self.assignment_mirror = FrameMirror(ledger_file)
+        self._writes = {"stock": 0, "assignments": 0}
+        self.journal = StockJournal(journal_file)
+        self.journal.start(self.load_stock)
+
+    def version(self, table):
+        # In-process write counter plus the file's mtime/size, so edits from other processes are seen too.
+        if table == "assignments":
+            return (self._writes[table], self.ledger.version())
+        try:
+            st = os.stat(self.stock_file)
+        except FileNotFoundError:
+            return (self._writes[table], None)
+        return (self._writes[table], st.st_mtime_ns, st.st_size)
+
+    def load_stock(self):
+        # The signature is taken before reading, so a mirror never claims a newer file than it holds.
+        signature = file_signature(self.stock_file)
+        if signature is None:
+            return _typed_stock(pd.DataFrame(columns=STOCK_COLUMNS))
+        df = self.stock_mirror.load(signature)
+        if df is None:
+            df = read_csv(self.stock_file, STOCK_SCHEMA)
+            self.stock_mirror.save(df, signature)
+        return df
+
+    def _write_stock(self, df):
+        atomic_write_csv(df.drop(columns=DERIVED_STOCK_COLUMNS, errors="ignore"), self.stock_file)
+        self._writes["stock"] += 1
+
+    def save_stock(self, df, expected_version=None, reason="import"):
+        with self.lock:
+            if expected_version is not None and self.version("stock") != expected_version:
+                raise ConflictError("Stock was changed by someone else while this update was prepared. Try again.")
+            before = self.load_stock()
+            self._write_stock(df)
+            self.journal.record(movements(state_rows(before), state_rows(df)), reason)
+
+    def load_assignments(self):
+        signature = self.ledger.version()
+        df = self.assignment_mirror.load(signature)
+        if df is None:
+            records = self.ledger.records()
+            df = pd.DataFrame([row for _, row in records], index=[key for key, _ in records], columns=ASSIGNMENT_COLUMNS)
+            df = _typed_assignments(df)
+            self.assignment_mirror.save(df, signature)
+        return df
+
+    def save_assignments(self, df):
+        self.ledger.replace(as_text(_typed_assignments(df), ASSIGNMENT_SCHEMA).to_dict("records"))
+        self._writes["assignments"] += 1
+
+    def export_assignments(self, path=None):
+        # The whole history, archived months included, for spreadsheet users.
+        history = _with_history(self.load_assignments(), self.archive.load())
+        as_text(history, ASSIGNMENT_SCHEMA).to_csv(path or self.assignment_file, index=False)
+
+    def archive_assignments(self, before):
+        # Assignments returned at or before `before` (DATE_FORMAT text) leave the ledger for the archive.
+        def select(row):
+            return row.get("status") == RETURNED and row.get("return_date", "") <= before
+
+        def store(items):
+            self.archive.add(_typed_assignments(pd.DataFrame([row for _, row in items], index=[key for key, _ in items],
+                                                             columns=ASSIGNMENT_COLUMNS)))
+        moved = self.ledger.archive(select, store)
+        if moved:
+            self._writes["assignments"] += 1
+        return moved
+
+    def _rows(self, df, stock_id, expected_version):
+        mask = df['id'] == str(stock_id)
+        if not mask.any():
+            raise ConflictError(f"Stock {stock_id} no longer exists.")
+        if expected_version is not None and (df.loc[mask, 'version'] != int(expected_version)).any():
+            raise _stale(stock_id)
+        return mask
+
+    def insert_stock(self, row):
+        with self.lock:
+            df = self.load_stock()
+            new = pd.concat([df, _typed_stock(pd.DataFrame([row]))], ignore_index=True)
+            self._write_stock(new)
+            self.journal.record(movements(state_rows(df[df['id'] == str(row['id'])]),
+                                          state_rows(new[new['id'] == str(row['id'])])), "add")
+
+    def update_stock(self, stock_id, fields, expected_version=None):
+        with self.lock:
+            df = self.load_stock()
+            mask = self._rows(df, stock_id, expected_version)
+            before = state_rows(df[mask])
+            for col, value in fields.items():
+                df.loc[mask, col] = value
+            if _bumps_version(fields):
+                df.loc[mask, 'version'] += 1
+            self._write_stock(df)
+            if {"quantity", "price"} & set(fields):
+                self.journal.record(movements(before, state_rows(df[mask])), "edit")
+
+    def delete_stock(self, stock_id, expected_version=None):
+        with self.lock:
+            df = self.load_stock()
+            mask = self._rows(df, stock_id, expected_version)
+            self._write_stock(df[~mask])
+            self.journal.record(movements(state_rows(df[mask]), []), "delete")
+
+    def apply_changes(self, quantity_deltas=(), new_assignments=(), returns=()):
+        # quantity_deltas: (stock_id, delta, expected_version or None); returns: (key, return_date).
+        # Everything is checked before anything is written. The stock file is replaced in one
+        # step and the ledger events follow while the lock is still held.
+        with self.lock:
+            df = self.load_stock()
+            touched = df['id'].isin([str(stock_id) for stock_id, _, _ in quantity_deltas])
+            before = state_rows(df[touched])
+            for stock_id, delta, expected_version in quantity_deltas:
+                mask = self._rows(df, stock_id, expected_version)
+                if (df.loc[mask, 'quantity'] + int(delta) < 0).any():
+                    raise OutOfStockError(f"Not enough stock left for {stock_id}.")
+                df.loc[mask, 'quantity'] += int(delta)
+                df.loc[mask, 'version'] += 1
+            for key, _ in returns:
+                current = self.ledger.get(key)
+                if current is None or current['status'] != ASSIGNED:
+                    raise ConflictError("This assignment was already returned by someone else.")
+            if len({int(key) for key, _ in returns}) != len(returns):
+                raise ConflictError("The same assignment is returned twice.")
+            if quantity_deltas:
+                self._write_stock(df)
+            rows = [{col: row.get(col, "") for col in ASSIGNMENT_COLUMNS} for row in new_assignments]
+            keys = self.ledger.batch(rows, returns)
+            if rows or returns:
+                self._writes["assignments"] += 1
+            if quantity_deltas:
+                self.journal.record(movements(before, state_rows(df[touched])), _change_reason(new_assignments, returns))
+            return keys
+
+    def open_assignment(self, stock_id):
+        return self.ledger.open_assignment(stock_id)
+
+    def open_assignments(self, stock_ids):
+        return self.ledger.open_assignments(stock_ids)
+
+    def get_assignment(self, key):
+        return self.ledger.get(key)
+
+
+# ---------- SQLITE BACKEND ----------
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS stock (
+    pk INTEGER PRIMARY KEY,
+    id TEXT NOT NULL,
+    name TEXT NOT NULL DEFAULT '',
+    company TEXT NOT NULL DEFAULT '',
+    category TEXT NOT NULL DEFAULT '',
+    quantity INTEGER NOT NULL DEFAULT 0,
+    price REAL NOT NULL DEFAULT 0,
+    barcode TEXT NOT NULL DEFAULT '',
+    image TEXT NOT NULL DEFAULT '',
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_stock_id ON stock(id);
+CREATE INDEX IF NOT EXISTS idx_stock_name ON stock(name);
+CREATE TABLE IF NOT EXISTS assignments (
+    pk INTEGER PRIMARY KEY,
+    "user" TEXT NOT NULL DEFAULT '',
+    role TEXT NOT NULL DEFAULT '',
+    stock_id TEXT NOT NULL DEFAULT '',
+    stock_name TEXT NOT NULL DEFAULT '',
+    date TEXT NOT NULL DEFAULT '',
+    remarks TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL DEFAULT '',
+    teacher_id TEXT NOT NULL DEFAULT '',
+    department TEXT NOT NULL DEFAULT '',
+    return_date TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_assignments_stock_status ON assignments(stock_id, status);
+-- Matches the normalized-ID lookup in open_assignment (ledger.normalize_id in SQL).
+CREATE INDEX IF NOT EXISTS idx_assignments_open ON assignments(trim(ltrim(stock_id, '0')), status);
+CREATE TABLE IF NOT EXISTS versions (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+);
+-- 'assignment_keys' is the lowest key a new assignment may take: keys of archived rows are not reused.
+INSERT OR IGNORE INTO versions (name, version) VALUES ('stock', 0), ('assignments', 0), ('assignment_keys', 0);
+"""
+_NEXT_ASSIGNMENT_KEY = ("max(coalesce((SELECT max(pk) FROM assignments), 0) + 1, "
+                        "(SELECT version FROM versions WHERE name = 'assignment_keys'))")
+
+
+def _quoted(columns):
+    return ", ".join(f'"{col}"' for col in columns)
+
+
+def _placeholders(columns):
+    return ", ".join("?" * len(columns))
+
+
+def _set_clause(columns):
+    return ", ".join(f'"{col}" = ?' for col in columns)
+
+
+def _sql_value(value):
+    # numpy scalars (e.g. values read back with df.at) are not accepted by sqlite3.
+    return value.item() if hasattr(value, "item") else value
+
+
+# Indexed single-file store (WAL); mutations touch only the affected rows. Journal entries are
+# appended inside the write transaction, just before it commits.
+class SQLiteBackend:
+    name = "sqlite"
+
+    def __init__(self, db_file=DB_FILE, archive_folder=ARCHIVE_FOLDER, journal_file=STOCK_JOURNAL_FILE):
+        self.db_file = db_file
+        self.archive = AssignmentArchive(archive_folder)
+        self.journal = StockJournal(journal_file)
+        self._local = threading.local()
+        conn = self._connect()
+        if conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'stock'").fetchone():
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(stock)")]
+            if "version" not in columns:
+                conn.execute("ALTER TABLE stock ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+                conn.commit()
+        conn.executescript(_SQLITE_SCHEMA)
+        self.journal.start(self.load_stock)
+
+    def _connect(self):
+        # Streamlit serves each session from its own thread, so keep one connection per thread.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def version(self, table):
+        # Bumped inside every write transaction, so it is shared by all processes using the file.
+        row = self._connect().execute("SELECT version FROM versions WHERE name = ?", (table,)).fetchone()
+        return row[0] if row else 0
+
+    def _bump(self, conn, table):
+        conn.execute("UPDATE versions SET version = version + 1 WHERE name = ?", (table,))
+
+    def load_stock(self):
+        df = pd.read_sql_query(f"SELECT {_quoted(STOCK_COLUMNS)} FROM stock ORDER BY pk", self._connect())
+        return _typed_stock(df)
+
+    def _stock_rows(self, conn, stock_ids):
+        # state_rows() of some IDs as the open transaction sees them, 500 IDs per query.
+        stock_ids = list(dict.fromkeys(str(stock_id) for stock_id in stock_ids))
+        rows = []
+        for start in range(0, len(stock_ids), 500):
+            chunk = stock_ids[start:start + 500]
+            rows += conn.execute(f"SELECT {_quoted(STATE_COLUMNS)} FROM stock WHERE id IN ({_placeholders(chunk)})",
+                                 chunk).fetchall()
+        return rows
+
+    def save_stock(self, df, expected_version=None, reason="import"):
+        df = _typed_stock(df.drop(columns=DERIVED_STOCK_COLUMNS, errors="ignore"))
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if expected_version is not None and self.version("stock") != expected_version:
+                raise ConflictError("Stock was changed by someone else while this update was prepared. Try again.")
+            before = self.load_stock()
+            conn.execute("DELETE FROM stock")
+            conn.executemany(
+                f"INSERT INTO stock ({_quoted(STOCK_COLUMNS)}) VALUES ({_placeholders(STOCK_COLUMNS)})",
+                df.itertuples(index=False, name=None),
+            )
+            self._bump(conn, "stock")
+            self.journal.record(movements(state_rows(before), state_rows(df)), reason)
+
+    def load_assignments(self):
+        df = pd.read_sql_query(f"SELECT pk, {_quoted(ASSIGNMENT_COLUMNS)} FROM assignments ORDER BY pk", self._connect(), index_col="pk")
+        df.index.name = None
+        return _typed_assignments(df)
+
+    def save_assignments(self, df):
+        # The frame's index becomes the key, so rows migrated from the ledger keep the keys the archive knows them by.
+        df = as_text(_typed_assignments(df), ASSIGNMENT_SCHEMA)
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM assignments")
+            conn.executemany(
+                f"INSERT INTO assignments (pk, {_quoted(ASSIGNMENT_COLUMNS)}) VALUES (?, {_placeholders(ASSIGNMENT_COLUMNS)})",
+                df.itertuples(index=True, name=None),
+            )
+            self._bump(conn, "assignments")
+
+    def reserve_keys(self, next_key):
+        conn = self._connect()
+        with conn:
+            conn.execute("UPDATE versions SET version = max(version, ?) WHERE name = 'assignment_keys'", (int(next_key),))
+
+    def archive_assignments(self, before):
+        # Same contract as CSVBackend.archive_assignments; the rows are filed before they are deleted.
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            where = "WHERE status = ? AND return_date <= ?"
+            df = pd.read_sql_query(f"SELECT pk, {_quoted(ASSIGNMENT_COLUMNS)} FROM assignments {where} ORDER BY pk",
+                                   conn, params=(RETURNED, before), index_col="pk")
+            if df.empty:
+                return 0
+            df.index.name = None
+            self.archive.add(_typed_assignments(df))
+            conn.execute(f"DELETE FROM assignments {where}", (RETURNED, before))
+            conn.execute("UPDATE versions SET version = max(version, ?) WHERE name = 'assignment_keys'",
+                         (int(df.index.max()) + 1,))
+            self._bump(conn, "assignments")
+        return len(df)
+
+    def insert_stock(self, row):
+        cols = [col for col in STOCK_COLUMNS if col in row]
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            before = self._stock_rows(conn, [row['id']])
+            conn.execute(
+                f"INSERT INTO stock ({_quoted(cols)}) VALUES ({_placeholders(cols)})",
+                [_sql_value(row[col]) for col in cols],
+            )
+            self._bump(conn, "stock")
+            self.journal.record(movements(before, self._stock_rows(conn, [row['id']])), "add")
+
+    def _check_updated(self, conn, cursor, stock_id):
+        if cursor.rowcount == 0:
+            if conn.execute("SELECT 1 FROM stock WHERE id = ?", (str(stock_id),)).fetchone() is None:
+                raise ConflictError(f"Stock {stock_id} no longer exists.")
+            raise _stale(stock_id)
+
+    def _version_clause(self, expected_version):
+        # Appended to "WHERE id = ?" so the row only changes if nobody else changed it first.
+        if expected_version is None:
+            return "", []
+        return " AND version = ?", [int(expected_version)]
+
+    def update_stock(self, stock_id, fields, expected_version=None):
+        cols = [col for col in fields if col in STOCK_COLUMNS and col != "version"]
+        clause, params = self._version_clause(expected_version)
+        journaled = bool({"quantity", "price"} & set(cols))
+        bump = "version = version + 1" if _bumps_version(cols) else ""
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            before = self._stock_rows(conn, [stock_id]) if journaled else None
+            cur = conn.execute(
+                f"UPDATE stock SET {', '.join(filter(None, [_set_clause(cols), bump]))} WHERE id = ?{clause}",
+                [_sql_value(fields[col]) for col in cols] + [str(stock_id)] + params,
+            )
+            self._check_updated(conn, cur, stock_id)
+            self._bump(conn, "stock")
+            if journaled:
+                self.journal.record(movements(before, self._stock_rows(conn, [stock_id])), "edit")
+
+    def delete_stock(self, stock_id, expected_version=None):
+        clause, params = self._version_clause(expected_version)
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            before = self._stock_rows(conn, [stock_id])
+            cur = conn.execute(f"DELETE FROM stock WHERE id = ?{clause}", [str(stock_id)] + params)
+            self._check_updated(conn, cur, stock_id)
+            self._bump(conn, "stock")
+            self.journal.record(movements(before, []), "delete")
+
+    def _insert_assignment(self, conn, row):
+        cols = [col for col in ASSIGNMENT_COLUMNS if col in row]
+        cur = conn.execute(
+            f"INSERT INTO assignments (pk, {_quoted(cols)}) VALUES ({_NEXT_ASSIGNMENT_KEY}, {_placeholders(cols)})",
+            [_sql_value(row[col]) for col in cols],
+        )
+        return cur.lastrowid
+
+    def apply_changes(self, quantity_deltas=(), new_assignments=(), returns=()):
+        # Same contract as CSVBackend.apply_changes, in a single transaction.
+        stock_ids = [stock_id for stock_id, _, _ in quantity_deltas]
+        conn = self._connect()
+        with conn:
+            # Taking the write lock first keeps the rows read for the journal current until the commit.
+            conn.execute("BEGIN IMMEDIATE")
+            before = self._stock_rows(conn, stock_ids)
+            for stock_id, delta, expected_version in quantity_deltas:
+                clause, params = self._version_clause(expected_version)
+                cur = conn.execute(
+                    f"UPDATE stock SET quantity = quantity + ?, version = version + 1 "
+                    f"WHERE id = ?{clause} AND quantity + ? >= 0",
+                    [int(delta), str(stock_id)] + params + [int(delta)],
+                )
+                if cur.rowcount == 0:
+                    if conn.execute(f"SELECT 1 FROM stock WHERE id = ?{clause}", [str(stock_id)] + params).fetchone():
+                        raise OutOfStockError(f"Not enough stock left for {stock_id}.")
+                    self._check_updated(conn, cur, stock_id)
+            keys = [self._insert_assignment(conn, row) for row in new_assignments]
+            for key, return_date in returns:
+                cur = conn.execute(
+                    "UPDATE assignments SET status = ?, return_date = ? WHERE pk = ? AND status = ?",
+                    (RETURNED, str(return_date), int(key), ASSIGNED),
+                )
+                if cur.rowcount == 0:
+                    raise ConflictError("This assignment was already returned by someone else.")
+            if quantity_deltas:
+                self._bump(conn, "stock")
+                self.journal.record(movements(before, self._stock_rows(conn, stock_ids)),
+                                    _change_reason(new_assignments, returns))
+            if new_assignments or returns:
+                self._bump(conn, "assignments")
+        return keys
+
+    def open_assignment(self, stock_id):
+        conn = self._connect()
+        row = conn.execute(
+            f"SELECT pk, {_quoted(ASSIGNMENT_COLUMNS)} FROM assignments "
+            "WHERE trim(ltrim(stock_id, '0')) = ? AND status = ? ORDER BY pk DESC LIMIT 1",
+            (normalize_id(stock_id), ASSIGNED),
+        ).fetchone()
+        if row is None:
+            return None
+        return row[0], dict(zip(ASSIGNMENT_COLUMNS, row[1:]))
+
+    def open_assignments(self, stock_ids):
+        # Same shape as AssignmentLedger.open_assignments, in one indexed query per 500 IDs.
+        stock_keys = list(dict.fromkeys(normalize_id(stock_id) for stock_id in stock_ids))
+        found = {}
+        conn = self._connect()
+        for start in range(0, len(stock_keys), 500):
+            chunk = stock_keys[start:start + 500]
+            rows = conn.execute(
+                f"SELECT pk, {_quoted(ASSIGNMENT_COLUMNS)} FROM assignments "
+                f"WHERE trim(ltrim(stock_id, '0')) IN ({_placeholders(chunk)}) AND status = ? ORDER BY pk",
+                chunk + [ASSIGNED],
+            ).fetchall()
+            for row in rows:
+                found.setdefault(normalize_id(row[3]), []).append((row[0], dict(zip(ASSIGNMENT_COLUMNS, row[1:]))))
+        return found
+
+    def get_assignment(self, key):
+        row = self._connect().execute(
+            f"SELECT {_quoted(ASSIGNMENT_COLUMNS)} FROM assignments WHERE pk = ?", (int(key),)
+        ).fetchone()
+        return None if row is None else dict(zip(ASSIGNMENT_COLUMNS, row))
+
+
+# ---------- BACKEND SELECTION ----------
+BACKENDS = {"csv": CSVBackend, "sqlite": SQLiteBackend}
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    # Imported modules survive Streamlit reruns, so the backend (and its connections) is built once per process.
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if STORAGE_BACKEND not in BACKENDS:
+                raise ValueError(f"Unknown storage backend {STORAGE_BACKEND!r}; expected one of {sorted(BACKENDS)}")
+            _backend = BACKENDS[STORAGE_BACKEND]()
+        return _backend
+
+
+# ---------- CACHE ----------
+# Frames parsed once per data version and shared by every session/rerun in this process.
+class FrameCache:
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, token, loader, current=None):
+        # current() re-reads the version after loading; if a write landed meanwhile the frame may
+        # already include it, so it is returned but not cached under the older token.
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == token:
+                self.hits += 1
+                count("frame_cache_hits")
+                return entry[1]
+            self.misses += 1
+        count("frame_cache_misses")
+        with timer(f"build.{key}"):
+            frame = loader()
+        if current is None or current() == token:
+            self.put(key, token, frame)
+        return frame
+
+    def put(self, key, token, frame):
+        with self._lock:
+            self._entries[key] = (token, frame)
+
+    def peek(self, key):
+        with self._lock:
+            return self._entries.get(key)
+
+    def retag(self, keys, old_token, new_token):
+        # Re-stamp entries that were patched in place to reflect a write, instead of reloading them.
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] == old_token:
+                    self._entries[key] = (new_token, entry[1])
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+_cache = FrameCache()
+
+
+def cache_stats():
+    return _cache.stats()
+
+
+# ---------- DATA FUNCTIONS ----------
+def _with_low_stock(df):
+    df['low_stock'] = df['quantity'] < LOW_STOCK_THRESHOLD
+    return df
+
+
+def _stock_frame():
+    backend = get_backend()
+    token = backend.version("stock")
+    return token, _cache.get("stock", token, lambda: _with_low_stock(backend.load_stock()), lambda: backend.version("stock"))
+
+
+@timed()
+def load_data():
+    # Callers add helper columns and edit cells, so never hand out the shared frame.
+    return _stock_frame()[1].copy()
+
+
+@timed()
+def load_data_versioned():
+    # (version token, copy) for read-modify-save callers that pass the token back to save_data.
+    token, df = _stock_frame()
+    return token, df.copy()
+
+
+def get_stock_index():
+    token, df = _stock_frame()
+    return _cache.get("stock_index", token, lambda: StockIndex(df), lambda: get_backend().version("stock"))
+
+
+@timed()
+def save_data(df, expected_version=None):
+    # expected_version: the _stock_frame() token df was built from; ConflictError if stock changed since.
+    backend = get_backend()
+    backend.save_stock(df, expected_version)
+    typed = _with_low_stock(_typed_stock(df.drop(columns=DERIVED_STOCK_COLUMNS, errors="ignore")))
+    _cache.put("stock", backend.version("stock"), typed)
+
+
+def _assignments_frame():
+    backend = get_backend()
+    token = backend.version("assignments")
+    return token, _cache.get("assignments", token, backend.load_assignments, lambda: backend.version("assignments"))
+
+
+@timed()
+def load_assignments():
+    return _assignments_frame()[1].copy()
+
+
+# ---------- HISTORY ----------
+# load_assignments() is the hot store: open assignments and those returned since the last archive run.
+def get_archive():
+    return get_backend().archive
+
+
+@timed()
+def load_assignment_history(start=None, end=None):
+    # Every assignment dated start..end (datetime.date, inclusive; None leaves that side open), reading only
+    # the archive months the range covers. Undated rows are only part of the unbounded history.
+    df = _with_history(_assignments_frame()[1], get_archive().load(start, end))
+    if start is not None:
+        df = df[df['date'] >= pd.Timestamp(start)]
+    if end is not None:
+        df = df[df['date'] < pd.Timestamp(end + timedelta(days=1))]
+    return df
+
+
+# ---------- STOCK JOURNAL ----------
+# Both backends journal every quantity or price change (see journal.py), so past stock can be rebuilt.
+def get_journal():
+    return get_backend().journal
+
+
+# Pages ask again on every rerun, so the latest answer of each query is cached (shared: do not modify)
+# until the journal grows.
+@timed()
+def stock_as_of(when=None):
+    # One row per stock ID (id, name, company, category, quantity, price) as it stood at `when`
+    # (a datetime, or a date meaning the end of that day).
+    journal = get_journal()
+    return _cache.get("stock_as_of", (journal.version(), when), lambda: journal.state_at(when))
+
+
+@timed()
+def stock_levels(start, end, freq="D", by="id", ids=None, categories=None):
+    # Quantity on hand at the end of each day ("D"), week ("W") or month ("M") from start to end, one column
+    # per stock ID (by="id") or category (by="category"). Pass ids for per-item levels of a large catalogue.
+    journal = get_journal()
+    token = (journal.version(), start, end, freq, by, None if ids is None else tuple(ids),
+             None if categories is None else tuple(categories))
+    return _cache.get("stock_levels", token, lambda: journal.levels(start, end, freq, by, ids, categories))
+
+
+@timed()
+def stock_movements(start=None, end=None, ids=None):
+    return get_journal().entries(start, end, ids)
+
+
+# ---------- REORDER FORECAST ----------
+def get_demand_rates():
+    # Built from the whole assignment history (archive included) when the assignments changed behind our
+    # back; this process's own assign/return writes update it in place (_patch_demand).
+    backend = get_backend()
+    return _cache.get("demand_rates", backend.version("assignments"),
+                      lambda: DemandRates.from_history(load_assignment_history()), lambda: backend.version("assignments"))
+
+
+@timed()
+def stock_forecast():
+    # (per item, per category) frames from forecast.py; shared, do not modify. Recomputed when stock or
+    # assignments change, and once a day as older events weigh less.
+    backend = get_backend()
+    token = (backend.version("stock"), backend.version("assignments"), date.today())
+
+    def build():
+        items = forecast_items(_stock_frame()[1], get_demand_rates().rates())
+        return items, forecast_categories(items)
+    return _cache.get("stock_forecast", token, build)
+
+
+# ---------- ROW WRITES ----------
+# Single-row mutations used by the pages. Each one applies its delta to the dashboard
+# aggregates, so they stay current without regrouping the tables.
+_write_lock = threading.Lock()
+
+
+def _versions():
+    backend = get_backend()
+    return (backend.version("stock"), backend.version("assignments"))
+
+
+def get_aggregates():
+    # Rebuilt from the cached frames only when the data changed behind our back (another process, full saves).
+    def build():
+        return InventoryAggregates.from_frames(_stock_frame()[1], _assignments_frame()[1], LOW_STOCK_THRESHOLD)
+    return _cache.get("aggregates", _versions(), build, _versions)
+
+
+def _apply(change):
+    with _write_lock:
+        aggregates = get_aggregates()
+        result = change(aggregates)
+        _cache.put("aggregates", _versions(), aggregates)
+        return result
+
+
+# Columns a row write may patch in the cached frame; anything else (IDs, names) changes the index.
+_PATCHABLE = {"quantity": int, "price": float, "barcode": str, "image": str}
+
+
+def _patch_stock(old_token, updates):
+    # updates: (stock_id, fields) already written to the backend. Applying them to the shared frame
+    # and index in place keeps scans at O(1) per write instead of reloading the table; when the
+    # cache is not at old_token (or an indexed column changed) the next read simply reloads.
+    frame = _cache.peek("stock")
+    index = _cache.peek("stock_index")
+    if frame is None or index is None or frame[0] != old_token or index[0] != old_token:
+        return
+    df, index = frame[1], index[1]
+    if index.df is not df or any(set(fields) - set(_PATCHABLE) for _, fields in updates):
+        return
+    for stock_id, fields in updates:
+        labels = index.labels_for_id(stock_id)
+        for col, value in fields.items():
+            df.loc[labels, col] = _PATCHABLE[col](value)
+        if _bumps_version(fields):
+            df.loc[labels, 'version'] += 1
+        df.loc[labels, 'low_stock'] = df.loc[labels, 'quantity'] < LOW_STOCK_THRESHOLD
+    _cache.retag(["stock", "stock_index"], old_token, get_backend().version("stock"))
+
+
+def _patch_demand(old_token, changes):
+    # changes: (before, after) assignment rows already written. Same rule as _patch_stock: only a model
+    # that was current before the write is updated and re-stamped; otherwise the next read rebuilds it.
+    entry = _cache.peek("demand_rates")
+    if entry is None or entry[0] != old_token:
+        return
+    for before, after in changes:
+        entry[1].assignment_changed(before, after)
+    _cache.retag(["demand_rates"], old_token, get_backend().version("assignments"))
+
+
+@timed()
+def insert_stock(row):
+    def change(aggregates):
+        get_backend().insert_stock(row)
+        aggregates.stock_changed([], [_typed_stock(pd.DataFrame([row])).iloc[0].to_dict()])
+    _apply(change)
+
+
+@timed()
+def update_stock(stock_id, fields, expected_version=None):
+    # With expected_version, the write only happens if the row is still at that version (else ConflictError).
+    def change(aggregates):
+        before = get_stock_index().rows_for_id(stock_id)
+        token = get_backend().version("stock")
+        get_backend().update_stock(stock_id, fields, expected_version)
+        aggregates.stock_changed(before, [{**row, **fields} for row in before])
+        _patch_stock(token, [(stock_id, fields)])
+    _apply(change)
+
+
+@timed()
+def delete_stock(stock_id, expected_version=None):
+    def change(aggregates):
+        before = get_stock_index().rows_for_id(stock_id)
+        get_backend().delete_stock(stock_id, expected_version)
+        aggregates.stock_changed(before, [])
+    _apply(change)
+
+
+def open_assignment(stock_id):
+    return get_backend().open_assignment(stock_id)
+
+
+def open_assignments(stock_ids):
+    return get_backend().open_assignments(stock_ids)
+
+
+@timed()
+def apply_changes(quantity_deltas=(), new_assignments=(), returns=()):
+    # quantity_deltas: (stock_id, delta, expected_version or None); returns: (assignment key, return_date).
+    # Applied together or not at all; raises ConflictError / OutOfStockError. Returns the new assignment keys.
+    if len({str(stock_id) for stock_id, _, _ in quantity_deltas}) != len(quantity_deltas):
+        raise ValueError("Each stock ID may appear only once in quantity_deltas.")
+
+    def change(aggregates):
+        backend = get_backend()
+        index = get_stock_index()
+        stock_before = [(index.rows_for_id(stock_id), delta) for stock_id, delta, _ in quantity_deltas]
+        returns_before = [(key, return_date, backend.get_assignment(key)) for key, return_date in returns]
+        token = backend.version("stock")
+        assignments_token = backend.version("assignments")
+        keys = backend.apply_changes(quantity_deltas, new_assignments, returns)
+        changes = []
+        for rows, delta in stock_before:
+            aggregates.stock_changed(rows, [{**row, "quantity": int(row['quantity']) + int(delta)} for row in rows])
+        if all(len(rows) == 1 for rows, _ in stock_before):
+            _patch_stock(token, [(stock_id, {"quantity": rows[0]['quantity'] + int(delta)})
+                                 for (stock_id, _, _), (rows, delta) in zip(quantity_deltas, stock_before)])
+        for key, row in zip(keys, new_assignments):
+            after = {col: str(row.get(col, "")) for col in ASSIGNMENT_COLUMNS}
+            aggregates.assignment_changed(key, None, after)
+            changes.append((None, after))
+        for key, return_date, before in returns_before:
+            after = None if before is None else {**before, "status": RETURNED, "return_date": str(return_date)}
+            aggregates.assignment_changed(key, before, after)
+            changes.append((before, after))
+        _patch_demand(assignments_token, changes)
+        return keys
+    return _apply(change)
+
+
+def assign_item(stock_id, row, expected_version=None):
+    # Takes one unit out of stock and records the assignment in the same write.
+    return apply_changes([(stock_id, -1, expected_version)], new_assignments=[row])[0]
+
+
+def return_item(key, stock_id, return_date, expected_version=None):
+    apply_changes([(stock_id, 1, expected_version)], returns=[(key, return_date)])
+
+
+@timed()
+def archive_assignments(older_than_days=ARCHIVE_AFTER_DAYS):
+    # Moves assignments returned at least older_than_days ago to the monthly archive; returns how many.
+    # Only returned rows move, so the dashboard aggregates and demand rates stay valid and are re-stamped, not rebuilt.
+    before = (datetime.now() - timedelta(days=older_than_days)).strftime(DATE_FORMAT)
+
+    def change(aggregates):
+        token = get_backend().version("assignments")
+        moved = get_backend().archive_assignments(before)
+        _patch_demand(token, [])
+        return moved
+    return _apply(change)
+
+
+# ---------- MIGRATION ----------
+def migrate_csv_to_sqlite(stock_file=STOCK_FILE, assignment_file=ASSIGNMENT_FILE, db_file=DB_FILE):
+    source = CSVBackend(stock_file, assignment_file)
+    target = SQLiteBackend(db_file)
+    stock = source.load_stock()
+    assignments = source.load_assignments()
+    target.save_stock(stock, reason="migrate")
+    target.save_assignments(assignments)
+    # The archive folder is shared, so new SQLite keys continue after the ledger's.
+    target.reserve_keys(source.ledger.next_key())
+    return len(stock), len(assignments)
+
+
+def compact_assignment_log(stock_file=STOCK_FILE, assignment_file=ASSIGNMENT_FILE, ledger_file=ASSIGNMENT_LOG_FILE):
+    # Fold assign/return pairs into single records and refresh assignments.csv for spreadsheet users.
+    backend = CSVBackend(stock_file, assignment_file, ledger_file)
+    backend.ledger.compact()
+    backend.export_assignments()
+    return len(backend.ledger.records())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inventory storage utilities")
+    sub = parser.add_subparsers(dest="command", required=True)
+    compact = sub.add_parser("compact", help="Compact the assignment event log and re-export assignments.csv")
+    compact.add_argument("--assignments", default=ASSIGNMENT_FILE)
+    compact.add_argument("--log", default=ASSIGNMENT_LOG_FILE)
+    migrate = sub.add_parser("migrate", help="Copy stock.csv / assignments.csv into the SQLite store")
+    migrate.add_argument("--stock", default=STOCK_FILE)
+    migrate.add_argument("--assignments", default=ASSIGNMENT_FILE)
+    migrate.add_argument("--db", default=DB_FILE)
+    archive = sub.add_parser("archive", help="Move returned assignments to the monthly archive")
+    archive.add_argument("--older-than", type=int, default=ARCHIVE_AFTER_DAYS, metavar="DAYS",
+                         help="only assignments returned at least this many days ago")
+    forecast = sub.add_parser("forecast", help="Write the reorder forecast (one row per stock ID) to a CSV file")
+    forecast.add_argument("path", nargs="?", default="reorder_forecast.csv")
+    forecast.add_argument("--due", action="store_true", help="only items due for reorder")
+    args = parser.parse_args()
+    if args.command == "migrate":
+        n_stock, n_assign = migrate_csv_to_sqlite(args.stock, args.assignments, args.db)
+        print(f"Migrated {n_stock} stock rows and {n_assign} assignments into {args.db}")
+    elif args.command == "compact":
+        n_assign = compact_assignment_log(assignment_file=args.assignments, ledger_file=args.log)
+        print(f"Compacted {args.log} to {n_assign} assignments and exported {args.assignments}")
+    elif args.command == "archive":
+        moved = archive_assignments(args.older_than)
+        print(f"Archived {moved} returned assignments into {get_archive().folder}")
+    elif args.command == "forecast":
+        items = stock_forecast()[0]
+        if args.due:
+            items = items[items['reorder']]
+        forecast_csv(items, args.path)
+        print(f"Wrote {len(items)} items ({int(items['reorder'].sum())} due for reorder) to {args.path}")
@@ -0,0 +1,109 @@
+from datetime import timedelta
+
+import pandas as pd
+import streamlit as st
+
+from metrics import timer
+
+PAGE_SIZES = [25, 50, 100, 250]
+STOCK_TABLE_COLUMNS = ["id", "name", "company", "category", "quantity", "price", "low_stock"]
+PICKER_LIMIT = 200
+
+
+def highlight_low_stock(s):
+    return ['background-color: #ffe5e5' if v else '' for v in s]
+
+
+# ---------- FILTERING ----------
+def filter_stock(index, search="", companies=(), categories=(), low_stock_only=False):
+    df = index.df
+    if search.strip():
+        df = df.loc[index.search(search)]
+    if companies:
+        df = df[df['company'].isin(companies)]
+    if categories:
+        df = df[df['category'].isin(categories)]
+    if low_stock_only:
+        df = df[df['low_stock']]
+    return df
+
+
+def filter_assignments(df, search="", statuses=(), date_range=(), departments=(), roles=()):
+    if statuses:
+        df = df[df['status'].isin(statuses)]
+    if departments:
+        df = df[df['department'].isin(departments)]
+    if roles:
+        df = df[df['role'].isin(roles)]
+    if len(date_range) == 2:
+        # 'date' is parsed to datetime64 on load (schema.py).
+        start, end = date_range
+        df = df[(df['date'] >= pd.Timestamp(start)) & (df['date'] < pd.Timestamp(end + timedelta(days=1)))]
+    if search.strip():
+        text = search.strip().lower()
+        df = df[df['user'].str.lower().str.contains(text, regex=False) | df['stock_id'].str.lower().str.contains(text, regex=False)]
+    return df
+
+
+def paginate(df, page, page_size):
+    pages = max(1, -(-len(df) // page_size))
+    page = min(max(1, page), pages)
+    start = (page - 1) * page_size
+    return df.iloc[start:start + page_size], page, pages
+
+
+# ---------- WIDGETS ----------
+def paged_table(df, key, style_low_stock=False):
+    # Only the visible page is styled and sent to the browser.
+    size_col, page_col, info_col = st.columns([1, 1, 2])
+    with size_col:
+        page_size = st.selectbox("Rows per page", PAGE_SIZES, key=f"{key}_page_size")
+    pages = max(1, -(-len(df) // page_size))
+    with page_col:
+        page = st.number_input("Page", min_value=1, max_value=pages, value=1, step=1, key=f"{key}_page")
+    page_df, page, pages = paginate(df, int(page), page_size)
+    with info_col:
+        st.caption(f"{len(df)} rows · page {page} of {pages}")
+    # Styling and serialising the page for the browser happen inside st.dataframe.
+    with timer("render_table"):
+        if style_low_stock and not page_df.empty:
+            st.dataframe(page_df.style.apply(highlight_low_stock, subset=['low_stock']), use_container_width=True)
+        else:
+            st.dataframe(page_df, use_container_width=True)
+
+
+def stock_filters(index, key):
+    search = st.text_input("Search name or ID", key=f"{key}_search")
+    company_col, category_col, low_col = st.columns([2, 2, 1])
+    with company_col:
+        companies = st.multiselect("Company", index.values('company'), key=f"{key}_companies")
+    with category_col:
+        categories = st.multiselect("Category", index.values('category'), key=f"{key}_categories")
+    with low_col:
+        low_stock_only = st.checkbox("Low stock only", key=f"{key}_low")
+    return {"search": search, "companies": companies, "categories": categories, "low_stock_only": low_stock_only}
+
+
+def assignment_filters(df, key, dates=True):
+    # dates=False when the caller already narrowed the rows to a date range (the history viewer).
+    search = st.text_input("Search user or stock ID", key=f"{key}_search")
+    status_col, date_col = st.columns(2)
+    with status_col:
+        statuses = st.multiselect("Status", sorted(df['status'].unique()), key=f"{key}_statuses")
+    date_range = ()
+    if dates:
+        with date_col:
+            date_range = st.date_input("Date range", value=(), key=f"{key}_dates")
+    return {"search": search, "statuses": statuses, "date_range": date_range}
+
+
+def product_picker(index, label, key):
+    # Deduplicated product names, narrowed through the search index for large catalogues.
+    names = index.names()
+    if len(names) > PICKER_LIMIT:
+        query = st.text_input(f"Search {label.lower()}", key=f"{key}_query")
+        names = index.search_names(query, limit=PICKER_LIMIT) if query.strip() else names[:PICKER_LIMIT]
+        if not names:
+            st.info("No products match your search.")
+            return None
+    return st.selectbox(label, names, key=key)
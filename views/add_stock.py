@@ -0,0 +1,98 @@
+import os
+
+import streamlit as st
+
+from image_pipeline import thumbnail_bytes
+from jobs import DONE, FAILED, QUEUED, RUNNING
+import metrics
+import services
+from storage import ConflictError, get_stock_index
+
+
+@metrics.timed("page.add_stock")
+def add_stock():
+    st.markdown("""
+        <div style='text-align:center;'>
+            <span style='font-size:3rem;'>➕</span>
+            <h1 style='display:inline; color:#1565c0; font-weight:800;'>Add New Stock</h1>
+        </div>
+        <div style='color:#1976d2; text-align:center; font-size:1.1em; margin-bottom:2em;'>
+            Fill in the details to add a new product to your inventory.
+        </div>
+    """, unsafe_allow_html=True)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        product_code = st.text_input("Product Code (Stock ID)", placeholder="e.g. LAP12345")
+        name = st.text_input("Product Name", placeholder="e.g. HP Laptop")
+        company = st.selectbox("Company", ["Select...", "HP", "Dell", "Apple", "Lenovo", "Samsung", "Other"])
+        if company == "Other":
+            company = st.text_input("Enter Company Name")
+        category = st.selectbox("Category", ["Select...", "Laptop", "Monitor", "Printer", "Accessory", "Furniture", "Other"])
+        if category == "Other":
+            category = st.text_input("Enter Category")
+    with col2:
+        price = st.number_input("Price", min_value=0.0, step=0.01)
+        quantity = st.number_input("Quantity", min_value=1, value=1)
+        uploaded_file = st.file_uploader("Upload Product Image", type=["png", "jpg", "jpeg"])
+        st.markdown("<br>", unsafe_allow_html=True)
+        add_btn = st.button("Add Stock", use_container_width=True)
+
+    if add_btn:
+        try:
+            action, row, job_ids = services.add_stock(product_code, name, company, category, quantity, price, uploaded_file)
+        except services.ValidationError as e:
+            st.warning(str(e))
+            return
+        except ConflictError as e:
+            st.error(str(e))
+            return
+        if action == "updated":
+            st.success(f"✅ Stock updated: {name} ({company}, {category}) - New Quantity: {row['quantity']}")
+        else:
+            st.success(f"✅ Stock added: {name} ({company}, {category}) - ID: {product_code}")
+        st.session_state.added_stock = {"row": row, "jobs": job_ids}
+    added = st.session_state.get("added_stock")
+    if added and added["jobs"]:
+        pending = any(job["status"] in (QUEUED, RUNNING) for job in _jobs(added["jobs"]))
+        # Polls while the barcode and image jobs run, then one full rerun shows the finished assets.
+        st.fragment(asset_status, run_every=1 if pending else None)(added, pending)
+    elif added:
+        # A merge without a new image queues nothing: the row's saved image and barcode are shown.
+        asset_status(added, False)
+
+
+def _jobs(job_ids):
+    return [services.job_status(job_id) for job_id in job_ids]
+
+
+def _viewable(kind, path):
+    if kind == "image":
+        return thumbnail_bytes(path)
+    return path if isinstance(path, str) and path and os.path.exists(path) else None
+
+
+def asset_status(added, pending):
+    jobs = _jobs(added["jobs"])
+    if pending and not any(job["status"] in (QUEUED, RUNNING) for job in jobs):
+        st.rerun()
+    if jobs:
+        st.caption(f"Stock ID {added['row']['id']}: " + " · ".join(f"{job['kind']} {job['status']}" for job in jobs))
+    results = {job["kind"]: job for job in jobs}
+    saved = get_stock_index().get(added["row"]['id'])
+    img_col, bar_col = st.columns(2)
+    for kind, col, caption in (("image", img_col, "Product Image"), ("barcode", bar_col, "Barcode")):
+        job = results.get(kind)
+        with col:
+            if job is None:
+                image = None if saved is None else _viewable(kind, saved[kind])
+                if image is not None:
+                    st.image(image, width=180, caption=caption)
+            elif job["status"] == FAILED:
+                st.error(f"{caption} failed: {job['error']}")
+            elif job["status"] == DONE:
+                image = _viewable(kind, job["result"][kind])
+                if image is not None:
+                    st.image(image, width=180, caption=caption)
+            else:
+                st.info(f"⏳ {caption}: {job['status']}")
@@ -0,0 +1,133 @@
+import os
+
+import streamlit as st
+
+from image_pipeline import thumbnail_bytes
+import metrics
+import services
+from storage import ConflictError, OutOfStockError, get_stock_index, open_assignment
+from table_views import product_picker
+
+
+@metrics.timed("page.assign_product")
+def assign_product():
+    st.title("👥 Assign/Return Product")
+    index = get_stock_index()
+    if len(index) == 0:
+        st.warning("No stock available.")
+        return
+    action = st.radio("Action", ["Assign", "Return", "Batch Scan"])
+    if action == "Batch Scan":
+        batch_scan()
+    elif action == "Return":
+        product_id = st.text_input("Enter Stock ID to Return")
+        product = index.find(product_id)
+        current = open_assignment(product_id)
+        if product is not None and current is not None:
+            latest_idx, assignment = current
+            st.markdown(f"""
+                <div class='assign-detail'>
+                <b>Assignment Details:</b><br>
+                <b>User:</b> {assignment['user']}<br>
+                <b>Role:</b> {assignment['role']}<br>
+                <b>Stock ID:</b> {assignment['stock_id']}<br>
+                <b>Stock Name:</b> {assignment['stock_name']}<br>
+                <b>Date:</b> {assignment['date']}<br>
+                <b>Remarks:</b> {assignment['remarks']}<br>
+                <b>Status:</b> {assignment['status']}
+                </div>
+            """, unsafe_allow_html=True)
+            img_col, bar_col = st.columns(2)
+            thumbnail = thumbnail_bytes(product.get('image', ''))
+            if thumbnail is not None:
+                with img_col:
+                    st.image(thumbnail, width=180, caption="Product Image")
+            barcode_path = product.get('barcode', '')
+            if isinstance(barcode_path, str) and barcode_path.strip() and os.path.exists(barcode_path):
+                with bar_col:
+                    st.image(barcode_path, width=180, caption="Barcode")
+            if st.button("Return Product"):
+                try:
+                    services.return_(product['id'], expected_version=product['version'])
+                except (services.NotFoundError, ConflictError) as e:
+                    st.error(str(e))
+                    return
+                st.success("Product returned successfully.")
+        elif product is not None:
+            st.warning("No outstanding assignment found for this stock ID.")
+        else:
+            st.warning("Stock ID not found.")
+    else:
+        product_name = product_picker(index, "Select Product Name", key="assign_product")
+        if product_name is None:
+            return
+        selected_id = st.selectbox("Select Stock ID", index.ids_for_name(product_name))
+        user = st.text_input("Enter User Name:")
+        role = st.selectbox("Select Role", ["Teacher", "Student"])
+        teacher_id = department = ""
+        if role == "Teacher":
+            teacher_id = st.text_input("Teacher ID")
+            department = st.text_input("Department")
+        remarks = st.text_area("Remarks")
+        if st.button("Assign Product"):
+            product = index.get(selected_id)
+            current_qty = product['quantity']
+            if int(current_qty) <= 0:
+                st.warning("No stock available to assign.")
+                return
+            try:
+                services.assign(selected_id, user, role, teacher_id, department, remarks,
+                                expected_version=product['version'])
+            except OutOfStockError:
+                st.warning("No stock available to assign.")
+                return
+            except services.ValidationError as e:
+                st.warning(str(e))
+                return
+            except ConflictError as e:
+                st.error(str(e))
+                return
+            st.success("Product assigned successfully.")
+
+
+@metrics.timed("page.batch_scan")
+def batch_scan():
+    # Scanners type the ID followed by Enter, so every scan lands on its own line.
+    batch_action = st.radio("Batch action", ["Assign", "Return"], horizontal=True, key="batch_action")
+    scanned = st.text_area("Scanned stock IDs (one per line, or ID,quantity)", height=200, key="batch_scans")
+    details = {}
+    if batch_action == "Assign":
+        details["user"] = st.text_input("Assign to (user name)", key="batch_user")
+        details["role"] = st.selectbox("Role", ["Teacher", "Student"], key="batch_role")
+        if details["role"] == "Teacher":
+            details["teacher_id"] = st.text_input("Teacher ID", key="batch_teacher_id")
+            details["department"] = st.text_input("Department", key="batch_department")
+        details["remarks"] = st.text_area("Remarks", key="batch_remarks")
+    action = batch_action.lower()
+    if st.button("Preview Batch"):
+        try:
+            st.session_state.batch_preview = (action, scanned, services.preview_batch(action, services.parse_scans(scanned)))
+        except services.ValidationError as e:
+            st.warning(str(e))
+            return
+    preview = st.session_state.get("batch_preview")
+    if preview is None or preview[:2] != (action, scanned):
+        return
+    lines = preview[2]
+    st.dataframe([{k: line[k] for k in ("code", "stock_id", "name", "quantity", "in_stock", "open", "problem")} for line in lines],
+                 use_container_width=True)
+    problems = sum(1 for line in lines if line["problem"])
+    if problems:
+        st.warning(f"⚠️ {problems} line(s) need attention before the batch can be saved.")
+    units = sum(line["quantity"] for line in lines)
+    if st.button(f"{batch_action} {units} item(s)", disabled=bool(problems) or not lines):
+        try:
+            keys = services.commit_batch(action, lines, **details)
+        except services.ValidationError as e:
+            st.warning(str(e))
+            return
+        except ConflictError as e:
+            st.error(f"{e} Preview the batch again.")
+            return
+        del st.session_state.batch_preview
+        st.success(f"✅ {len(keys)} item(s) {action}ed across {len(lines)} product(s).")
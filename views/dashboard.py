@@ -0,0 +1,154 @@
+import streamlit as st
+from datetime import date, timedelta
+
+from config import ARCHIVE_AFTER_DAYS, FORECAST_HALF_LIFE_DAYS, OVERDUE_DAYS, REORDER_COVER_DAYS, REORDER_LEAD_DAYS
+from forecast import forecast_csv
+import metrics
+import services
+from storage import (cache_stats, get_aggregates, get_archive, get_stock_index, load_assignment_history, stock_as_of,
+                     stock_forecast, stock_levels)
+from table_views import (STOCK_TABLE_COLUMNS, assignment_filters, filter_assignments, filter_stock, paged_table,
+                         product_picker, stock_filters)
+
+# Days of assignment history the viewer opens with.
+HISTORY_DAYS = 90
+LEVEL_PERIODS = {"Day": "D", "Week": "W", "Month": "M"}
+
+
+@metrics.timed("page.dashboard")
+def dashboard():
+    st.title("📊 Dashboard Overview")
+    aggregates = get_aggregates()
+    summary = aggregates.summary()
+    ages = aggregates.open_ages()
+    m1, m2, m3, m4, m5 = st.columns(5)
+    m1.metric("Products", summary['products'])
+    m2.metric("Units in Stock", summary['units'])
+    m3.metric("Stock Value", f"{summary['value']:,.2f}")
+    m4.metric("Assigned", summary['assigned'])
+    m5.metric("Overdue", ages['overdue'], help=f"Open longer than {OVERDUE_DAYS} days")
+
+    st.subheader("📦 Stock Summary")
+    cat_col, comp_col = st.columns(2)
+    with cat_col:
+        st.caption("Stock value by category")
+        st.bar_chart(aggregates.group_table("category")['value'])
+    with comp_col:
+        st.caption("Stock value by company")
+        st.bar_chart(aggregates.group_table("company")['value'])
+    low_stock_df = aggregates.low_stock_table()
+    if not low_stock_df.empty:
+        st.warning(f"⚠️ Low stock detected (below {summary['threshold']}):")
+        paged_table(low_stock_df, key="dashboard_low")
+    else:
+        st.success("All stock levels are sufficient.")
+
+    st.subheader("👥 Currently Assigned")
+    dept_col, role_col = st.columns(2)
+    with dept_col:
+        st.caption("By department")
+        st.bar_chart(aggregates.assigned_table("department"))
+    with role_col:
+        st.caption("By role")
+        st.bar_chart(aggregates.assigned_table("role"))
+    if ages['open']:
+        st.caption(f"Open assignments: median {ages['median_days']:.0f} days out, oldest {ages['max_days']} days")
+
+    st.subheader("📋 Stock")
+    index = get_stock_index()
+    filtered = filter_stock(index, **stock_filters(index, key="dashboard_stock"))
+    paged_table(filtered[STOCK_TABLE_COLUMNS], key="dashboard_stock")
+    assignment_history()
+    stock_history()
+    reorder_forecast()
+    stats = cache_stats()
+    st.caption(f"Data cache: {stats['hits']} hits / {stats['misses']} misses")
+
+
+@metrics.timed("page.assignment_history")
+def assignment_history():
+    # Only the archive months the chosen range covers are read from disk.
+    st.subheader("👥 Assignment History")
+    archive = get_archive()
+    start = end = None
+    if not st.checkbox("Whole history", key="dashboard_history_all"):
+        today = date.today()
+        picked = st.date_input("Assigned between", value=(today - timedelta(days=HISTORY_DAYS), today),
+                               key="dashboard_history_dates")
+        # Half-open while the second date is still being picked.
+        start, end = (tuple(picked) + (None, None))[:2]
+    history = load_assignment_history(start, end)
+    st.caption(f"{len(history):,} assignments · {len(archive.partitions(start, end))} of "
+               f"{len(archive.months())} archived months read")
+    paged_table(filter_assignments(history, **assignment_filters(history, key="dashboard_assign", dates=False)),
+                key="dashboard_assign")
+    with st.expander("🗄 Archive returned assignments"):
+        st.caption(f"Moves assignments returned at least {ARCHIVE_AFTER_DAYS} day(s) ago out of the working set "
+                   f"into monthly compressed files in {archive.folder}/. They stay visible here.")
+        if st.button("Archive now"):
+            job_id = services.queue_archive()
+            st.success(f"✅ Archiving queued as job {job_id}; see the Jobs page for how many moved.")
+
+
+@metrics.timed("page.stock_history")
+def stock_history():
+    # Rebuilt from the stock journal: the nearest snapshot plus the entries after it.
+    st.subheader("📈 Stock Over Time")
+    today = date.today()
+    range_col, period_col, by_col = st.columns([2, 1, 1])
+    with range_col:
+        picked = st.date_input("Between", value=(today - timedelta(days=HISTORY_DAYS), today), key="dashboard_levels_dates")
+    with period_col:
+        period = st.selectbox("Per", list(LEVEL_PERIODS), key="dashboard_levels_period")
+    with by_col:
+        by = st.radio("By", ["Category", "Item"], horizontal=True, key="dashboard_levels_by")
+    if len(picked) == 2:
+        index = get_stock_index()
+        if by == "Category":
+            categories = st.multiselect("Category", index.values('category'), key="dashboard_levels_categories")
+            levels = stock_levels(*picked, LEVEL_PERIODS[period], by="category", categories=categories or None)
+        else:
+            product_name = product_picker(index, "Product", key="dashboard_levels_product")
+            stock_ids = index.ids_for_name(product_name)
+            stock_id = st.selectbox("Stock ID", stock_ids, key="dashboard_levels_id") if stock_ids else None
+            levels = stock_levels(*picked, LEVEL_PERIODS[period], ids=[stock_id] if stock_id else [])
+        if levels.empty or levels.columns.empty:
+            st.info("No stock recorded for this selection.")
+        else:
+            st.line_chart(levels)
+
+    on_date = st.date_input("Stock on hand at the end of", value=today, max_value=today, key="dashboard_as_of")
+    past = stock_as_of(on_date)
+    st.caption(f"{len(past):,} products · {int(past['quantity'].sum()):,} units · "
+               f"value {float((past['quantity'] * past['price']).sum()):,.2f}")
+    paged_table(past, key="dashboard_as_of_table")
+
+
+@metrics.timed("page.reorder_forecast")
+def reorder_forecast():
+    # Rates come from the whole assignment history and follow each assign/return as it is saved (forecast.py).
+    st.subheader("🔮 Reorder Forecast")
+    items, categories = stock_forecast()
+    due = items[items['reorder']]
+    stockouts = items['stockout_date'].dropna()
+    f1, f2, f3 = st.columns(3)
+    f1.metric("Items to Reorder", len(due))
+    f2.metric("Units to Order", int(due['reorder_qty'].sum()))
+    f3.metric("Next Stock-out", f"{stockouts.min():%Y-%m-%d}" if len(stockouts) else "-")
+    st.caption(f"Net use is units assigned minus units returned per day, weighted so an assignment counts half as much "
+               f"after {FORECAST_HALF_LIFE_DAYS:g} days. Items are due when they would run out within the "
+               f"{REORDER_LEAD_DAYS:g}-day lead time (with safety stock); orders cover {REORDER_COVER_DAYS:g} days more.")
+    st.dataframe(categories.round(3), use_container_width=True, hide_index=True)
+    filter_col, category_col = st.columns([1, 2])
+    with filter_col:
+        due_only = st.checkbox("Only items to reorder", value=True, key="dashboard_forecast_due")
+    with category_col:
+        picked = st.multiselect("Category", categories['category'].astype(str).tolist(), key="dashboard_forecast_categories")
+    view = due if due_only else items
+    if picked:
+        view = view[view['category'].astype(str).isin(picked)]
+    paged_table(view.round({"assigned_per_day": 3, "returned_per_day": 3, "net_per_day": 3, "days_left": 1}),
+                key="dashboard_forecast")
+    # Built only when clicked.
+    st.download_button("Download forecast CSV", lambda: forecast_csv(view), "reorder_forecast.csv", "text/csv")
+
@@ -0,0 +1,47 @@
+import streamlit as st
+from datetime import datetime
+
+from assets import logo_bytes
+import metrics
+
+
+@metrics.timed("page.home_page")
+def home_page():
+    st.markdown("""
+        <div style="text-align: center; margin-top: 2em;">
+            <h1 style="font-size: 2.8rem; color: #2c3e50;">🏫 Smart University Inventory Management</h1>
+            <p style="font-size: 1.1rem; color: #34495e;">Digitally manage university assets — track, assign, return, and monitor your stock with ease.</p>
+        </div>
+        <br>
+    """, unsafe_allow_html=True)
+
+    # Columns layout: content + static logo
+    col1, col2 = st.columns([2, 1])
+
+    with col1:
+        st.markdown("""
+            <h3 style="color: #1a237e;">📋 Key Features</h3>
+            <ul>
+                <li>Barcode-based Inventory Tracking</li>
+                <li>Assign & Return Assets</li>
+                <li>Teacher/Student Management</li>
+                <li>Excel Integration</li>
+                <li>Real-time Dashboard</li>
+            </ul>
+        """, unsafe_allow_html=True)
+
+    with col2:
+        st.image(logo_bytes(), caption="Website Logo", use_container_width=True)
+
+    st.markdown("<hr>", unsafe_allow_html=True)
+
+    # Footer with username and date
+    st.markdown("""
+        <div style="text-align: center;">
+            <h4 style="color:#1565c0;">Logged in as: <span style="color:#2e7d32;">{}</span></h4>
+            <p style="color:#546e7a;">Today's Date: {}</p>
+        </div>
+    """.format(
+        st.session_state.get("username", "Unknown"),
+        datetime.today().strftime('%B %d, %Y')
+    ), unsafe_allow_html=True)
@@ -0,0 +1,60 @@
+import os
+
+import streamlit as st
+
+from bulk_io import import_stock
+from jobs import DONE, FAILED, QUEUED, RUNNING, get_queue
+import metrics
+import services
+from storage import ConflictError
+
+# Most recent export jobs offered for download.
+EXPORTS_LISTED = 5
+
+
+@metrics.timed("page.import_export")
+def import_export():
+    st.title("📥 Import / Export Stock")
+    st.subheader("Bulk Import")
+    st.caption("Columns: id, name, company, category, quantity (+ optional price, image). "
+               "Rows matching an existing name, company and category add to its quantity; the rest are inserted.")
+    uploaded_file = st.file_uploader("Upload CSV, Excel or Parquet", type=["csv", "xlsx", "parquet"])
+    dry_run = st.checkbox("Validate only (don't save)")
+    if uploaded_file is not None and st.button("Import Stock"):
+        try:
+            report = import_stock(uploaded_file, dry_run=dry_run)
+        except (ValueError, ImportError, ConflictError) as e:
+            st.error(f"Import failed: {e}")
+            return
+        st.success(f"✅ Inserted {report['inserted']}, merged {report['merged']}, rejected {report['rejected']}"
+                   + (" (dry run, nothing saved)" if dry_run else ""))
+        st.dataframe(report["batches"], use_container_width=True)
+        if report["rejected"]:
+            st.warning("⚠️ Rejected rows:")
+            st.dataframe(report["rejected_rows"], use_container_width=True)
+            st.download_button("Download rejected rows", report["rejected_rows"].to_csv(index=False), "rejected_rows.csv", "text/csv")
+
+    st.subheader("Export")
+    fmt = st.selectbox("Format", ["csv", "xlsx", "parquet"])
+    if st.button("Prepare Export"):
+        job_id = services.queue_export(fmt)
+        st.success(f"✅ Export queued (job {job_id}); it appears below when written.")
+    queue = get_queue()
+    exports = queue.recent(EXPORTS_LISTED, kinds={"export"})
+    if exports:
+        pending = any(job["status"] in (QUEUED, RUNNING) for job in exports)
+        st.fragment(export_list, run_every=1 if pending else None)()
+
+
+def export_list():
+    for job in get_queue().recent(EXPORTS_LISTED, kinds={"export"}):
+        fmt = job["args"]["fmt"]
+        label = f"Job {job['id']} · stock.{fmt} · {job['submitted']}"
+        if job["status"] == DONE and os.path.exists(job["result"]["path"]):
+            with open(job["result"]["path"], "rb") as f:
+                st.download_button(f"Download {label} ({job['result']['rows']:,} rows)", f.read(), f"stock.{fmt}",
+                                   key=f"export_{job['id']}")
+        elif job["status"] == FAILED:
+            st.error(f"{label}: {job['error']}")
+        elif job["status"] != DONE:
+            st.info(f"⏳ {label}: {job['status']}")
@@ -0,0 +1,50 @@
+import json
+
+import streamlit as st
+
+from jobs import FAILED, QUEUED, RUNNING, get_queue
+import metrics
+
+RECENT_JOBS = 100
+
+
+@metrics.timed("page.jobs")
+def jobs_page():
+    st.title("⚙️ Background Jobs")
+    st.caption("Barcodes, product images, exports and archiving run here after the page that asked for them has returned.")
+    counts = get_queue().counts()
+    # Refreshes itself while anything is waiting or running.
+    st.fragment(job_table, run_every=2 if counts[QUEUED] or counts[RUNNING] else None)()
+
+
+def _details(job):
+    if job["error"]:
+        return job["error"]
+    return json.dumps(job["result"] if job["result"] is not None else job["args"], ensure_ascii=False)
+
+
+def job_table():
+    queue = get_queue()
+    counts = queue.counts()
+    for col, (status, n) in zip(st.columns(len(counts)), counts.items()):
+        col.metric(status.title(), n)
+    jobs = queue.recent(RECENT_JOBS)
+    if not jobs:
+        st.info("No jobs yet.")
+        return
+    st.dataframe([{
+        "id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "submitted": job["submitted"],
+        "finished": job["finished"],
+        "details": _details(job),
+    } for job in jobs], use_container_width=True, hide_index=True)
+    failed = [job["id"] for job in jobs if job["status"] == FAILED]
+    if failed:
+        retry_col, button_col = st.columns([3, 1])
+        with retry_col:
+            job_id = st.selectbox("Failed job", failed, key="jobs_retry")
+        with button_col:
+            if st.button("Retry", use_container_width=True):
+                st.success(f"✅ Queued again as job {queue.retry(job_id)}.")
@@ -0,0 +1,62 @@
+import streamlit as st
+
+import metrics
+import services
+from storage import ConflictError, get_stock_index
+from table_views import product_picker
+
+
+@metrics.timed("page.manage_stock")
+def manage_stock():
+    st.title("🛠 Manage Stock")
+    index = get_stock_index()
+    if len(index) == 0:
+        st.warning("No stock available.")
+        return
+    product_name = product_picker(index, "Select Product Name to Manage", key="manage_product")
+    if product_name is None:
+        return
+    selected_id = st.selectbox("Select Stock ID", index.ids_for_name(product_name))
+    product = index.get(selected_id)
+    # The row the form was filled from; the write is refused if the row changed since. A change made
+    # elsewhere before the user has edited anything just fills the form again from the new row.
+    seen_key = f"manage_seen_{selected_id}"
+    quantity_key = f"manage_quantity_{selected_id}"
+    price_key = f"manage_price_{selected_id}"
+    current = _form_values(product)
+    seen = st.session_state.get(seen_key)
+    untouched = seen is not None and (st.session_state.get(quantity_key), st.session_state.get(price_key)) == (
+        seen['quantity'], seen['price'])
+    if seen is None or quantity_key not in st.session_state or (seen['version'] != current['version'] and untouched):
+        st.session_state[seen_key] = current
+        st.session_state[quantity_key] = current['quantity']
+        st.session_state[price_key] = current['price']
+    quantity = st.number_input("New Quantity", min_value=0, key=quantity_key)
+    price = st.number_input("New Price", min_value=0.0, step=0.01, key=price_key)
+    action = st.radio("Action", ["Update", "Delete"])
+    if st.button(f"{action} Stock"):
+        expected_version = st.session_state[seen_key]['version']
+        try:
+            if action == "Update":
+                services.adjust_stock(selected_id, quantity=quantity, price=price, expected_version=expected_version)
+                # The form now shows the saved row.
+                st.session_state[seen_key] = _form_values(get_stock_index().get(selected_id))
+                st.success(f"Stock Updated: {product_name} (ID: {selected_id})")
+            elif action == "Delete":
+                services.remove_stock(selected_id, expected_version=expected_version)
+                st.session_state.pop(seen_key, None)
+                st.success(f"Stock Deleted: {product_name} (ID: {selected_id})")
+        except services.ValidationError as e:
+            st.warning(str(e))
+        except ConflictError as e:
+            # Fill the form again from the current row, and say why.
+            st.session_state.pop(seen_key, None)
+            st.session_state.manage_conflict = str(e)
+            st.rerun()
+    conflict = st.session_state.pop("manage_conflict", None)
+    if conflict:
+        st.error(conflict)
+
+
+def _form_values(product):
+    return {"version": int(product['version']), "quantity": int(product['quantity']), "price": float(product['price'])}
@@ -0,0 +1,58 @@
+import streamlit as st
+from datetime import datetime
+
+import metrics
+from storage import cache_stats
+
+
+@metrics.timed("page.performance")
+def performance():
+    st.title("⏱ Performance")
+    st.caption("Timings collected by this server process since it started (or since the last reset). "
+               "Nested calls are included in their parent's time.")
+    reruns = metrics.recent_reruns()
+    st.subheader("🔁 Recent Reruns")
+    if not reruns:
+        st.info("No page reruns recorded yet.")
+    else:
+        st.dataframe([{
+            "time": datetime.fromtimestamp(r['at']).strftime("%H:%M:%S"),
+            "page": r['page'],
+            "user": r['user'],
+            "total ms": round(r['ms'], 1),
+            "slowest step": max((c for c in r['operations'] if not c['operation'].startswith("page.")), key=lambda c: c['ms'],
+                                default={"operation": ""})['operation'],
+        } for r in reruns], use_container_width=True)
+        labels = [f"{datetime.fromtimestamp(r['at']):%H:%M:%S} · {r['page']} · {r['ms']:.0f} ms" for r in reruns]
+        choice = st.selectbox("Breakdown of rerun", range(len(reruns)), format_func=labels.__getitem__)
+        st.dataframe([{
+            "operation": "· " * c['depth'] + c['operation'],
+            "starts at ms": round(c['start_ms'], 1),
+            "ms": round(c['ms'], 2),
+            "failed": c['failed'],
+        } for c in reruns[choice]['operations']], use_container_width=True)
+
+    st.subheader("📈 Operations")
+    table = metrics.operation_table()
+    if table:
+        st.dataframe([{key: round(value, 2) if isinstance(value, float) else value for key, value in row.items()}
+                      for row in table], use_container_width=True)
+    st.subheader("🐢 Slowest Calls")
+    slowest = metrics.slowest_calls()
+    if slowest:
+        st.dataframe([{
+            "operation": c['operation'],
+            "ms": round(c['seconds'] * 1000, 2),
+            "failed": c['failed'],
+            "when": datetime.fromtimestamp(c['at']).strftime("%Y-%m-%d %H:%M:%S"),
+        } for c in slowest], use_container_width=True)
+
+    stats = cache_stats()
+    st.caption(f"Data cache: {stats['hits']} hits / {stats['misses']} misses / {stats['entries']} entries")
+    export_col, reset_col = st.columns(2)
+    with export_col:
+        st.download_button("Download Prometheus metrics", metrics.prometheus_text(), "inventory_metrics.prom")
+    with reset_col:
+        if st.button("Reset timings"):
+            metrics.reset()
+            st.rerun()
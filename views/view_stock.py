@@ -0,0 +1,47 @@
+import os
+
+import streamlit as st
+
+from image_pipeline import thumbnail_bytes
+import metrics
+from storage import get_stock_index
+from table_views import PICKER_LIMIT, STOCK_TABLE_COLUMNS, filter_stock, paged_table, product_picker, stock_filters
+
+
+@metrics.timed("page.view_stock")
+def view_stock():
+    st.title("🔍 View Stock")
+    index = get_stock_index()
+    df = index.df
+    if df.empty:
+        st.warning("No stock available.")
+        return
+    filtered = filter_stock(index, **stock_filters(index, key="view_stock"))
+    paged_table(filtered[STOCK_TABLE_COLUMNS], key="view_stock", style_low_stock=True)
+    product_name = product_picker(index, "Select Product Name to View", key="view_product")
+    stock_ids = index.ids_for_name(product_name)
+    if stock_ids:
+        selected_id = st.selectbox("Select Stock ID", stock_ids)
+        product = index.get(selected_id)
+        st.write(f"**Product Name**: {product['name']}")
+        st.write(f"**Company**: {product['company']}")
+        st.write(f"**Category**: {product['category']}")
+        st.write(f"**Quantity**: {product['quantity']}")
+        st.write(f"**Price**: {product['price']}")
+        img_col, bar_col = st.columns(2)
+        thumbnail = thumbnail_bytes(product.get('image', ''))
+        if thumbnail is not None:
+            with img_col:
+                st.image(thumbnail, width=200, caption="Product Image")
+        barcode_path = product.get('barcode', '')
+        if isinstance(barcode_path, str) and barcode_path.strip() and os.path.exists(barcode_path):
+            with bar_col:
+                st.image(barcode_path, width=200, caption="Barcode")
+
+    st.subheader("🏷 Print Labels")
+    label_ids = st.multiselect("Stock IDs (from the filtered table)", filtered['id'].head(PICKER_LIMIT).tolist())
+    sheet_format = st.radio("Sheet format", ["pdf", "png"], horizontal=True)
+    if label_ids and st.button("Build Label Sheet"):
+        from barcode_service import label_sheet
+        labels = [(stock_id, f"{stock_id} - {index.get(stock_id)['name']}") for stock_id in label_ids]
+        st.download_button("Download labels", label_sheet(labels, sheet_format), f"labels.{sheet_format}")